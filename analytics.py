@@ -0,0 +1,498 @@
+"""
+This module mirrors the results of the championships into a local DuckDB file, and
+contains the analytical queries (pace trends, circuit records, consistency) which are
+run against it instead of the production database.
+
+The mirror is enabled by setting ANALYTICS_DB_PATH to the path of the file, and is
+refreshed, one round at a time, whenever results are saved or penalties change them.
+DuckDB doesn't let a process open the file while another one is writing to it: a
+refresh which can't open it is logged and skipped, and the rounds it had to mirror are
+kept in the pending_analytics_rounds table until a later refresh mirrors them.
+"""
+
+from __future__ import annotations
+
+import datetime
+import enum
+import logging
+import os
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Collection, Iterable, Iterator, Sequence
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as DBSession
+
+from models import (
+    Category,
+    Circuit,
+    Driver,
+    Penalty,
+    PendingAnalyticsRound,
+    QualifyingResult,
+    RaceResult,
+    Round,
+    Session,
+)
+
+try:
+    import duckdb
+
+    _DUCKDB_ERRORS: tuple[type[Exception], ...] = (duckdb.Error,)
+except ImportError:  # pragma: no cover
+    duckdb = None
+    _DUCKDB_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DB_PATH = os.environ.get("ANALYTICS_DB_PATH")
+INSERT_BATCH_SIZE = 5000
+
+# Mirrored tables, with the name, DuckDB type and source column of each of their
+# columns. The first column is the table's key.
+_LOOKUP_TABLES: dict[str, tuple[tuple[str, str, Any], ...]] = {
+    "categories": (
+        ("category_id", "SMALLINT", Category.id),
+        ("name", "VARCHAR", Category.name),
+        ("championship_id", "SMALLINT", Category.championship_id),
+        ("game_id", "SMALLINT", Category.game_id),
+    ),
+    "circuits": (
+        ("circuit_id", "SMALLINT", Circuit.id),
+        ("name", "VARCHAR", Circuit.name),
+        ("game_id", "SMALLINT", Circuit.game_id),
+    ),
+    "drivers": (
+        ("driver_id", "SMALLINT", Driver.id),
+        ("name", "VARCHAR", Driver.name),
+        ("surname", "VARCHAR", Driver.surname),
+        ("psn_id", "VARCHAR", Driver.psn_id),
+    ),
+}
+# Tables whose rows belong to a round, and are replaced together with it.
+_ROUND_TABLES: dict[str, tuple[tuple[str, str, Any], ...]] = {
+    "rounds": (
+        ("round_id", "SMALLINT", Round.id),
+        ("number", "SMALLINT", Round.number),
+        ("date", "DATE", Round.date),
+        ("category_id", "SMALLINT", Round.category_id),
+        ("championship_id", "SMALLINT", Round.championship_id),
+        ("circuit_id", "SMALLINT", Round.circuit_id),
+    ),
+    "sessions": (
+        ("session_id", "SMALLINT", Session.id),
+        ("round_id", "SMALLINT", Session.round_id),
+        ("name", "VARCHAR", Session.name),
+        ("is_quali", "BOOLEAN", Session.name.ilike("%quali%")),
+    ),
+    "race_results": (
+        ("result_id", "INTEGER", RaceResult.id),
+        ("round_id", "SMALLINT", RaceResult.round_id),
+        ("session_id", "SMALLINT", RaceResult.session_id),
+        ("category_id", "SMALLINT", RaceResult.category_id),
+        ("driver_id", "SMALLINT", RaceResult.driver_id),
+        ("position", "SMALLINT", RaceResult.position),
+        ("status", "VARCHAR", RaceResult.status),
+        ("fastest_lap", "BOOLEAN", RaceResult.fastest_lap),
+        ("total_racetime", "INTEGER", RaceResult.total_racetime),
+        ("gap_to_first", "INTEGER", RaceResult.gap_to_first),
+    ),
+    "qualifying_results": (
+        ("result_id", "INTEGER", QualifyingResult.id),
+        ("round_id", "SMALLINT", QualifyingResult.round_id),
+        ("session_id", "SMALLINT", QualifyingResult.session_id),
+        ("category_id", "SMALLINT", QualifyingResult.category_id),
+        ("driver_id", "SMALLINT", QualifyingResult.driver_id),
+        ("position", "SMALLINT", QualifyingResult.position),
+        ("status", "VARCHAR", QualifyingResult.status),
+        ("laptime", "INTEGER", QualifyingResult.laptime),
+        ("gap_to_first", "INTEGER", QualifyingResult.gap_to_first),
+    ),
+    "penalties": (
+        ("penalty_id", "INTEGER", Penalty.id),
+        ("round_id", "SMALLINT", Penalty.round_id),
+        ("session_id", "SMALLINT", Penalty.session_id),
+        ("category_id", "SMALLINT", Penalty.category_id),
+        ("driver_id", "SMALLINT", Penalty.driver_id),
+        ("time_penalty", "SMALLINT", Penalty.time_penalty),
+        ("licence_points", "SMALLINT", Penalty.licence_points),
+        ("warnings", "SMALLINT", Penalty.warnings),
+        ("points", "DOUBLE", Penalty.points),
+    ),
+}
+
+
+class AnalyticsUnavailableError(RuntimeError):
+    """Raised when analytics are queried while the mirror isn't enabled or can't be
+    read."""
+
+
+def analytics_enabled() -> bool:
+    """Is True if duckdb is installed and ANALYTICS_DB_PATH is set."""
+    return duckdb is not None and bool(ANALYTICS_DB_PATH)
+
+
+def _connect(read_only: bool = False) -> Any:
+    if not analytics_enabled():
+        raise AnalyticsUnavailableError(
+            "Analytics require duckdb and ANALYTICS_DB_PATH to be set."
+        )
+    if read_only and not os.path.exists(ANALYTICS_DB_PATH):  # type: ignore
+        raise AnalyticsUnavailableError("The analytics file hasn't been exported yet.")
+    return duckdb.connect(ANALYTICS_DB_PATH, read_only=read_only)  # type: ignore
+
+
+@contextmanager
+def _read() -> Iterator[Any]:
+    """Opens the analytics file for reading. DuckDB errors, such as the one raised while
+    a refresh in another process holds the file, become AnalyticsUnavailableError."""
+    try:
+        with _connect(read_only=True) as con:
+            yield con
+    except _DUCKDB_ERRORS as e:
+        logger.warning("Couldn't read the analytics file: %s", e)
+        raise AnalyticsUnavailableError(
+            "The analytics file can't be read right now, try again later."
+        ) from e
+
+
+def _create_tables(con: Any) -> None:
+    for table, columns in (_LOOKUP_TABLES | _ROUND_TABLES).items():
+        definition = ", ".join(f"{name} {kind}" for name, kind, _ in columns)
+        con.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+
+
+def _value(value: Any) -> Any:
+    """Converts values DuckDB can't bind as parameters."""
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _insert(con: Any, table: str, rows: Sequence[Sequence[Any]]) -> None:
+    if not rows:
+        return
+    placeholders = ", ".join("?" * len(rows[0]))
+    statement = f"INSERT INTO {table} VALUES ({placeholders})"
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        con.executemany(
+            statement,
+            [
+                [_value(value) for value in row]
+                for row in rows[start : start + INSERT_BATCH_SIZE]
+            ],
+        )
+
+
+def _replace(
+    con: Any,
+    db: DBSession,
+    table: str,
+    columns: tuple[tuple[str, str, Any], ...],
+    key: str,
+    source_key: Any,
+    keys: Iterable[int],
+) -> list[Any]:
+    """Replaces the rows of the mirrored table whose key is in keys with the ones
+    currently in the database, and returns them."""
+    keys = sorted(set(keys))
+    if not keys:
+        return []
+    con.execute(f"DELETE FROM {table} WHERE list_contains(?, {key})", [keys])
+    rows = list(
+        db.execute(
+            select(*(column.label(name) for name, _, column in columns)).where(
+                source_key.in_(keys)
+            )
+        ).all()
+    )
+    _insert(con, table, rows)
+    return rows
+
+
+def _mirror(con: Any, db: DBSession, round_ids: Collection[int]) -> None:
+    """Mirrors the given rounds together with their sessions, results and penalties,
+    then the drivers, categories and circuits they refer to."""
+    mirrored: dict[str, list[Any]] = {}
+    for table, columns in _ROUND_TABLES.items():
+        source_key = next(column for name, _, column in columns if name == "round_id")
+        mirrored[table] = _replace(
+            con, db, table, columns, "round_id", source_key, round_ids
+        )
+
+    referenced = {
+        "categories": {row.category_id for row in mirrored["rounds"]},
+        "circuits": {row.circuit_id for row in mirrored["rounds"]},
+        "drivers": {
+            row.driver_id
+            for table in ("race_results", "qualifying_results", "penalties")
+            for row in mirrored[table]
+        },
+    }
+    for table, columns in _LOOKUP_TABLES.items():
+        _replace(
+            con, db, table, columns, columns[0][0], columns[0][2], referenced[table]
+        )
+
+
+def _completed_rounds(db: DBSession) -> set[int]:
+    return set(db.execute(select(Round.id).where(Round.is_completed)).scalars())
+
+
+def _mark_pending(db: DBSession, round_ids: set[int]) -> None:
+    """Records that the given rounds have to be mirrored, and commits."""
+    pending = set(
+        db.execute(
+            select(PendingAnalyticsRound.round_id).where(
+                PendingAnalyticsRound.round_id.in_(round_ids)
+            )
+        ).scalars()
+    )
+    if missing := round_ids - pending:
+        try:
+            db.execute(
+                insert(PendingAnalyticsRound),
+                [{"round_id": round_id} for round_id in missing],
+            )
+            db.commit()
+        except IntegrityError:
+            # Another process marked the same rounds in the meantime.
+            db.rollback()
+
+
+def refresh_analytics(db: DBSession, round_ids: Iterable[int] = ()) -> None:
+    """Mirrors the given rounds, the ones previous refreshes failed to mirror and any
+    completed round which isn't mirrored yet into the analytics file. Does nothing if
+    analytics aren't enabled.
+
+    Must be called after the changes to the rounds have been committed. Failures are
+    logged and don't propagate, since the mirror is not the source of truth: the rounds
+    stay pending and are retried by the next refresh.
+
+    Args:
+        db (DBSession): Session to read the rounds with.
+        round_ids (Iterable[int]): IDs of the rounds whose results changed.
+    """
+    if not analytics_enabled():
+        return
+
+    if round_ids := set(round_ids):
+        _mark_pending(db, round_ids)
+    pending = set(db.execute(select(PendingAnalyticsRound.round_id)).scalars())
+
+    try:
+        with _connect() as con:
+            _create_tables(con)
+            mirrored = {
+                row[0] for row in con.execute("SELECT round_id FROM rounds").fetchall()
+            }
+            rounds = pending | (_completed_rounds(db) - mirrored)
+            if not rounds:
+                return
+            con.begin()
+            _mirror(con, db, rounds)
+            con.commit()
+    except (duckdb.Error, OSError):
+        logger.exception("Couldn't refresh the analytics file.")
+        return
+
+    if pending:
+        db.execute(
+            delete(PendingAnalyticsRound).where(
+                PendingAnalyticsRound.round_id.in_(pending)
+            )
+        )
+        db.commit()
+
+
+def export_analytics(db: DBSession) -> None:
+    """Rebuilds the analytics file from scratch, mirroring every completed round, and
+    clears the pending rounds.
+
+    Raises:
+        AnalyticsUnavailableError: If analytics aren't enabled.
+    """
+    with _connect() as con:
+        con.begin()
+        for table in _LOOKUP_TABLES | _ROUND_TABLES:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+        _create_tables(con)
+        _mirror(con, db, _completed_rounds(db))
+        con.commit()
+
+    db.execute(delete(PendingAnalyticsRound))
+    db.commit()
+
+
+def _gap_percentage(time: str, gap: str) -> str:
+    """SQL expression for the gap to the fastest driver as a percentage of their time,
+    NULL if either is missing."""
+    return f"100.0 * {gap} / nullif({time} - {gap}, 0)"
+
+
+def fetch_pace_trend(
+    driver_id: int, window: int = 5
+) -> list[tuple[int, datetime.date, int, float | None, float | None, float | None]]:
+    """Returns the pace of the driver in each round they took part in, oldest first.
+
+    Pace is measured as the gap to the winner of the race (or the fastest driver in
+    qualifying) as a percentage of their time, averaged over the sessions of the round.
+
+    Args:
+        driver_id (int): ID of the driver.
+        window (int): Number of rounds the rolling race pace is averaged over.
+
+    Raises:
+        AnalyticsUnavailableError: If analytics aren't enabled or the file can't be
+            read.
+
+    Returns:
+        list[tuple]: round_id, date, category_id, race pace, qualifying pace and
+            rolling race pace of each round. (Paces are None if the driver didn't
+            finish a race or set a laptime in the round)
+    """
+    race_gap = _gap_percentage("total_racetime", "gap_to_first")
+    quali_gap = _gap_percentage("laptime", "gap_to_first")
+    with _read() as con:
+        return con.execute(
+            f"""
+            WITH race AS (
+                SELECT round_id, avg({race_gap}) AS pace
+                FROM race_results
+                WHERE driver_id = ? AND status = 'finished'
+                GROUP BY round_id
+            ), quali AS (
+                SELECT round_id, avg({quali_gap}) AS pace
+                FROM qualifying_results
+                WHERE driver_id = ? AND laptime IS NOT NULL
+                GROUP BY round_id
+            )
+            SELECT
+                rounds.round_id,
+                rounds.date,
+                rounds.category_id,
+                race.pace,
+                quali.pace,
+                avg(race.pace) OVER (
+                    ORDER BY rounds.date, rounds.round_id
+                    ROWS BETWEEN {max(int(window), 1) - 1} PRECEDING AND CURRENT ROW
+                )
+            FROM rounds
+            LEFT JOIN race USING (round_id)
+            LEFT JOIN quali USING (round_id)
+            WHERE race.pace IS NOT NULL OR quali.pace IS NOT NULL
+            ORDER BY rounds.date, rounds.round_id
+            """,
+            [driver_id, driver_id],
+        ).fetchall()
+
+
+def fetch_circuit_records(
+    circuit_id: int | None = None, game_id: int | None = None
+) -> list[tuple[int, str, int, int, int, str | None, int, datetime.date]]:
+    """Returns the fastest qualifying laptime ever set on each circuit.
+
+    Args:
+        circuit_id (int | None): Only returns the record of this circuit.
+        game_id (int | None): Only returns the records of this game's circuits.
+
+    Raises:
+        AnalyticsUnavailableError: If analytics aren't enabled or the file can't be
+            read.
+
+    Returns:
+        list[tuple]: circuit_id, circuit name, game_id, laptime (ms), driver_id,
+            driver's psn_id, round_id and date of each record, by circuit name.
+    """
+    filters, parameters = ["q.laptime IS NOT NULL"], []
+    if circuit_id is not None:
+        filters.append("c.circuit_id = ?")
+        parameters.append(circuit_id)
+    if game_id is not None:
+        filters.append("c.game_id = ?")
+        parameters.append(game_id)
+
+    with _read() as con:
+        return con.execute(
+            f"""
+            SELECT
+                c.circuit_id, c.name, c.game_id, q.laptime,
+                d.driver_id, d.psn_id, r.round_id, r.date
+            FROM qualifying_results q
+            JOIN rounds r USING (round_id)
+            JOIN circuits c USING (circuit_id)
+            JOIN drivers d USING (driver_id)
+            WHERE {" AND ".join(filters)}
+            QUALIFY row_number() OVER (
+                PARTITION BY c.circuit_id ORDER BY q.laptime, r.date
+            ) = 1
+            ORDER BY c.name
+            """,
+            parameters,
+        ).fetchall()
+
+
+def fetch_consistency(
+    championship_id: int | None = None,
+    category_id: int | None = None,
+    min_races: int = 3,
+) -> list[tuple[int, int, int, float | None, float | None, float | None, int, int]]:
+    """Returns how consistent each driver has been in races, most consistent first.
+
+    Args:
+        championship_id (int | None): Only considers the races of this championship.
+        category_id (int | None): Only considers the races of this category.
+        min_races (int): Drivers who finished fewer races are left out.
+
+    Raises:
+        AnalyticsUnavailableError: If analytics aren't enabled or the file can't be
+            read.
+
+    Returns:
+        list[tuple]: driver_id, races started, races finished, average finishing
+            position, standard deviation of the finishing position and of the gap to
+            the winner (as a percentage of their time), penalties received and
+            seconds of time penalties received by each driver.
+    """
+    filters, parameters = ["TRUE"], []
+    if championship_id is not None:
+        filters.append("c.championship_id = ?")
+        parameters.append(championship_id)
+    if category_id is not None:
+        filters.append("c.category_id = ?")
+        parameters.append(category_id)
+    where = " AND ".join(filters)
+    gap = _gap_percentage("r.total_racetime", "r.gap_to_first")
+
+    with _read() as con:
+        return con.execute(
+            f"""
+            WITH penalised AS (
+                SELECT p.driver_id, count(*) AS penalties, sum(p.time_penalty) AS seconds
+                FROM penalties p
+                JOIN categories c USING (category_id)
+                WHERE {where}
+                GROUP BY p.driver_id
+            )
+            SELECT
+                r.driver_id,
+                count(*) FILTER (WHERE r.status <> 'dns'),
+                count(*) FILTER (WHERE r.status = 'finished'),
+                avg(r.position) FILTER (WHERE r.status = 'finished'),
+                stddev_samp(r.position) FILTER (WHERE r.status = 'finished'),
+                stddev_samp({gap}) FILTER (WHERE r.status = 'finished'),
+                coalesce(any_value(penalised.penalties), 0),
+                coalesce(any_value(penalised.seconds), 0)
+            FROM race_results r
+            JOIN categories c USING (category_id)
+            LEFT JOIN penalised USING (driver_id)
+            WHERE {where}
+            GROUP BY r.driver_id
+            HAVING count(*) FILTER (WHERE r.status = 'finished') >= ?
+            ORDER BY 6 NULLS LAST, 5 NULLS LAST
+            """,
+            parameters * 2 + [min_races],
+        ).fetchall()
@@ -7,6 +7,37 @@ from typing import Any, cast
 from fastapi import HTTPException
 from sqlalchemy.orm import Session as DBSession
 
+from app.components.schemas.analytics import (
+    CircuitRecordSchema,
+    ConsistencySchema,
+    PaceSchema,
+)
+from app.components.schemas.circuitrecord import (
+    CircuitRecordsSchema,
+    LapRecordSchema,
+    SeasonRecordsSchema,
+)
+from app.components.schemas.driver import (
+    DriverRatingSchema,
+    DriverStatsSchema,
+    RatingHistorySchema,
+    RatingPointSchema,
+)
+from app.components.schemas.forecast import (
+    ChampionshipForecastSchema,
+    DriverForecastSchema,
+    TeamForecastSchema,
+)
+from app.components.schemas.headtohead import HeadToHeadSchema
+from app.components.schemas.lobby import (
+    LobbiesSchema,
+    LobbyDriverSchema,
+    LobbySchema,
+)
+from app.components.schemas.prediction import (
+    PredictedPositionSchema,
+    RacePredictionSchema,
+)
 from app.components.schemas.team import TeamStandingsSchema
 from app.components.schemas.category import CategorySchema
 from app.components.schemas.calendar import (
@@ -21,25 +52,54 @@ from app.components.schemas.resultsfile import (
     RaceRoomResultsSchema,
 )
 from app.components.schemas.protest import CreateProtestSchema
+from app.components.schemas.whatif import (
+    StandingsChangeSchema,
+    WhatIfChangeSchema,
+    WhatIfOutcomeSchema,
+)
 from models import (
     Category,
+    CircuitRecord,
     Driver,
     Protest,
     QualifyingResult,
     RaceResult,
     Session,
     SessionCompletionStatus,
+    Team,
 )
 from queries import (
     fetch_category,
+    fetch_category_results,
     fetch_championship,
+    fetch_championship_forecast,
+    fetch_circuit_lap_records,
     fetch_driver_by_discord_id,
     fetch_driver_by_rre_id,
+    fetch_drivers_by_id,
+    fetch_drivers_stats,
+    fetch_head_to_head,
     fetch_last_protest_number,
+    fetch_points_per_round,
+    fetch_points_table,
+    fetch_race_prediction,
+    fetch_rating_history,
+    fetch_round_lobbies,
+    fetch_round_prediction,
+    fetch_standings_table,
+    fetch_team_standings_table,
     fetch_teams,
+    fetch_top_drivers,
     save_results,
 )
+from analytics import (
+    AnalyticsUnavailableError,
+    fetch_circuit_records,
+    fetch_consistency,
+    fetch_pace_trend,
+)
 from documents import ProtestDocument
+from ratings import RacePrediction, rating_delta
 
 
 RRE_GAME_ID = 3
@@ -59,7 +119,7 @@ def get_categories(
     elif isinstance(championship_id, str):
         championship_id = int(championship_id)
 
-    championship = fetch_championship(db, championship_id)
+    championship = fetch_championship(db, championship_id, load_graph=True)
 
     if not championship:
         return []
@@ -137,6 +197,7 @@ def get_calendar(db: DBSession, category_id: int) -> list[RoundInfoSchema] | Non
 
 def _create_driver_result_list(
     race_results: list[RaceResult],
+    quali_points: dict[tuple[int, int], float],
 ) -> list[DriverStandingsResultInfo]:
     driver_results: list[DriverStandingsResultInfo] = []
     for race_result in race_results:
@@ -144,17 +205,14 @@ def _create_driver_result_list(
             info_gp = f"SR{race_result.round_id}"
 
             extra_points: int | float = race_result.fastest_lap_points
-            quali_results = race_result.round.qualifying_results
-            for quali_result in quali_results:
-                if quali_result.driver_id == race_result.driver_id:
-                    extra_points += quali_result.points_earned
-                    break
+            extra_points += quali_points.get(
+                (race_result.round_id, race_result.driver_id), 0
+            )
         else:
             info_gp = f"LR{race_result.round_id}"
             extra_points = race_result.fastest_lap_points
 
         position = race_result.position if race_result.position else "/"
-        race_result.points_earned
         driver_results.append(
             DriverStandingsResultInfo(
                 info_gp=info_gp, position=position, extra_points=extra_points
@@ -172,10 +230,10 @@ def get_standings_with_results(
     if not category:
         return
 
-    results = category.standings_with_results()
+    standings_table = fetch_standings_table(db, category)
 
     standings: list[DriverSummary] = []
-    if not results:
+    if not category.race_results:
         for driver in category.active_drivers():
             team = driver.driver.current_team()
 
@@ -193,8 +251,25 @@ def get_standings_with_results(
             )
         return standings
 
-    for driver_results, points_tally in results:
-        driver = cast(Driver, driver_results[0].driver)
+    points_table = fetch_points_table(db, category_id=category_id)
+    quali_points = {
+        (round_id, driver_id): points
+        for round_id, driver_id, points, is_quali in zip(
+            points_table.round_ids.tolist(),
+            points_table.driver_ids.tolist(),
+            points_table.points.tolist(),
+            points_table.is_quali.tolist(),
+        )
+        if is_quali
+    }
+
+    results: defaultdict[int, list[RaceResult]] = defaultdict(list)
+    for race_result in category.race_results:
+        results[race_result.driver_id].append(race_result)
+    drivers = {driver.driver_id: driver.driver for driver in category.drivers}
+
+    for driver_id, points_tally, _ in standings_table.standings():
+        driver = drivers.get(driver_id) or cast(Driver, db.get(Driver, driver_id))
         team = driver.current_team()
 
         if not team:
@@ -205,7 +280,7 @@ def get_standings_with_results(
             driver_name=driver.abbreviated_name,
             points=points_tally,
             team=team.name,
-            info=_create_driver_result_list(driver_results),
+            info=_create_driver_result_list(results[driver_id], quali_points),
         )
         standings.append(driver_summary)
 
@@ -214,33 +289,383 @@ def get_standings_with_results(
 
 def get_drivers_points(db: DBSession, championship_id: int):
 
-    result: dict[int, list[list[float]]] = {}
     championship = fetch_championship(db, championship_id=championship_id)
 
     if not championship:
         return
 
-    for category in championship.categories:
-        result[category.id] = category.points_per_round()
-
-    return result
+    return fetch_points_per_round(db, championship_id)
 
 
 def get_teams_list(db: DBSession, championship_id: int) -> list[TeamStandingsSchema]:
-    """Returns the teams participating to the championship ordered by position."""
-    team_objs = fetch_teams(db, championship_id)
+    """Returns the teams participating to the championship ordered by position, with
+    the number of positions each one lost (negative if gained) in the last round."""
+    teams = {team.id: team for team in fetch_teams(db, championship_id)}
+    standings = fetch_team_standings_table(db, championship_id).standings()
+
+    return [
+        TeamStandingsSchema(
+            points=points,
+            logo=teams[team_id].logo_url,
+            name=teams[team_id].name,
+            delta=delta,
+        )
+        for team_id, points, delta in standings
+    ]
+
+
+def get_teams_points(db: DBSession, championship_id: int) -> list[list[Any]] | None:
+    """Returns the points tally of each team after every round of the championship.
+    The first row contains "Tappa" followed by the teams' names, following rows contain
+    the round number followed by the teams' tallies."""
+
+    championship = fetch_championship(db, championship_id=championship_id)
+
+    if not championship:
+        return None
 
-    teams: list[TeamStandingsSchema] = []
-    for team in team_objs:
+    teams = {team.team_id: team.team.name for team in championship.teams}
+    standings_table = fetch_team_standings_table(db, championship_id)
+
+    return [["Tappa"] + [teams[team_id] for team_id in standings_table.driver_ids]] + [
+        [number] + tallies
+        for number, tallies in zip(
+            standings_table.round_ids.tolist(), standings_table.cumulative.tolist()
+        )
+    ]
+
+
+def get_leaderboard(
+    db: DBSession, page: int, page_size: int, game_id: int | None = None
+) -> list[DriverRatingSchema]:
+    """Returns the given page of the drivers leaderboard, ordered by rating, in the
+    given game if any."""
+    offset = (page - 1) * page_size
+    drivers = fetch_top_drivers(db, limit=page_size, offset=offset, game_id=game_id)
+
+    return [
+        DriverRatingSchema(
+            position=offset + i,
+            driver_id=driver.id,
+            driver_name=driver.abbreviated_name,
+            psn_id=driver.psn_id,
+            rating=float(rating),
+            mu=float(mu),
+            sigma=float(sigma),
+        )
+        for i, (driver, mu, sigma, rating) in enumerate(drivers, start=1)
+    ]
+
+
+def get_drivers_stats(
+    db: DBSession,
+    championship_id: int | None = None,
+    category_id: int | None = None,
+    game_id: int | None = None,
+) -> list[DriverStatsSchema]:
+    """Returns the stats of every driver, from the results obtained in the given
+    championship, category and game if any."""
+    stats = fetch_drivers_stats(db, championship_id, category_id, game_id)
+    drivers = fetch_drivers_by_id(db, stats)
+
+    return [
+        DriverStatsSchema(
+            driver_id=driver_id,
+            driver_name=drivers[driver_id].abbreviated_name,
+            psn_id=drivers[driver_id].psn_id,
+            **driver_stats,
+        )
+        for driver_id, driver_stats in stats.items()
+    ]
+
+
+def get_rating_history(
+    db: DBSession, driver_id: int, game_id: int | None = None
+) -> RatingHistorySchema:
+    """Returns the rating the driver had after each race they finished, in the given
+    game if any, with the change in their last one."""
+    history = fetch_rating_history(db, driver_id, game_id)
+
+    return RatingHistorySchema(
+        driver_id=driver_id,
+        delta=rating_delta(history),
+        history=[
+            RatingPointSchema(
+                date=point.date,
+                round_id=point.round_id,
+                session_id=point.session_id,
+                session_name=point.session_name,
+                game_id=point.game_id,
+                rating=point.rating,
+                mu=point.mu,
+                sigma=point.sigma,
+            )
+            for point in history
+        ],
+    )
+
+
+def _race_prediction_schema(prediction: RacePrediction) -> RacePredictionSchema:
+    return RacePredictionSchema(
+        driver_ids=list(prediction.driver_ids),
+        win_probabilities=prediction.win_probabilities.tolist(),
+        expected_order=[
+            PredictedPositionSchema(
+                driver_id=driver_id,
+                driver_name=driver_name,
+                expected_position=expected_position,
+            )
+            for driver_id, driver_name, expected_position in prediction.expected_order()
+        ],
+    )
+
+
+def get_round_prediction(db: DBSession, round_id: int) -> RacePredictionSchema:
+    """Returns the predicted outcome of the races of the round, from the ratings of the
+    drivers in its category."""
+    prediction = fetch_round_prediction(db, round_id)
+    if not prediction:
+        raise HTTPException(404, "Round not found.")
+    return _race_prediction_schema(prediction)
+
+
+def get_race_prediction(
+    db: DBSession, driver_ids: list[int], game_id: int
+) -> RacePredictionSchema:
+    """Returns the predicted outcome of a race between the given drivers."""
+    return _race_prediction_schema(fetch_race_prediction(db, driver_ids, game_id))
+
+
+def get_head_to_head(
+    db: DBSession, category_id: int, driver_id: int, opponent_id: int
+) -> HeadToHeadSchema:
+    """Returns the head-to-head record of a driver against an opponent in the
+    category's races and qualifying sessions."""
+    head_to_head = fetch_head_to_head(db, category_id)
+    if head_to_head is None:
+        raise HTTPException(404, "Category not found.")
+
+    record = head_to_head.record(driver_id, opponent_id)
+    if not record:
+        raise HTTPException(404, "Head-to-head record not found.")
+
+    driver = cast(Driver, db.get(Driver, driver_id))
+    opponent = cast(Driver, db.get(Driver, opponent_id))
+    return HeadToHeadSchema(
+        driver_name=driver.abbreviated_name,
+        opponent_name=opponent.abbreviated_name,
+        **record.__dict__,
+    )
+
+
+def get_pace_trend(driver_id: int, window: int) -> list[PaceSchema]:
+    """Returns the driver's race and qualifying pace in each round they took part in."""
+    try:
+        rows = fetch_pace_trend(driver_id, window)
+    except AnalyticsUnavailableError as e:
+        raise HTTPException(503, str(e)) from e
+
+    return [PaceSchema(**dict(zip(PaceSchema.model_fields, row))) for row in rows]
+
+
+def get_circuit_records(
+    circuit_id: int | None, game_id: int | None
+) -> list[CircuitRecordSchema]:
+    """Returns the fastest qualifying laptime ever set on each circuit."""
+    try:
+        rows = fetch_circuit_records(circuit_id, game_id)
+    except AnalyticsUnavailableError as e:
+        raise HTTPException(503, str(e)) from e
+
+    return [
+        CircuitRecordSchema(**dict(zip(CircuitRecordSchema.model_fields, row)))
+        for row in rows
+    ]
+
+
+def get_consistency(
+    championship_id: int | None, category_id: int | None, min_races: int
+) -> list[ConsistencySchema]:
+    """Returns how consistent each driver has been in races, most consistent first."""
+    try:
+        rows = fetch_consistency(championship_id, category_id, min_races)
+    except AnalyticsUnavailableError as e:
+        raise HTTPException(503, str(e)) from e
+
+    return [
+        ConsistencySchema(**dict(zip(ConsistencySchema.model_fields, row)))
+        for row in rows
+    ]
+
+
+def _lap_record(record: CircuitRecord | None, kind: str) -> LapRecordSchema | None:
+    if not record:
+        return None
+    driver = cast(Driver, getattr(record, f"{kind}_driver"))
+    return LapRecordSchema(
+        laptime=getattr(record, f"{kind}_laptime"),
+        driver_id=driver.id,
+        driver_name=driver.abbreviated_name,
+        round_id=getattr(record, f"{kind}_round_id"),
+    )
+
+
+def get_circuit_lap_records(
+    db: DBSession, circuit_id: int, configuration_id: int | None
+) -> list[CircuitRecordsSchema]:
+    """Returns the all-time records of each configuration of the circuit, together
+    with the records set in each championship."""
+    configurations: defaultdict[int, list[CircuitRecord]] = defaultdict(list)
+    for record in fetch_circuit_lap_records(db, circuit_id, configuration_id):
+        configurations[record.configuration_id].append(record)
+
+    return [
+        CircuitRecordsSchema(
+            configuration_id=configuration,
+            quali=_lap_record(CircuitRecord.best(records, "quali"), "quali"),
+            race=_lap_record(CircuitRecord.best(records, "race"), "race"),
+            seasons=[
+                SeasonRecordsSchema(
+                    championship_id=record.championship_id,
+                    championship_name=record.championship.name,
+                    quali=_lap_record(
+                        record if record.quali_laptime else None, "quali"
+                    ),
+                    race=_lap_record(record if record.race_laptime else None, "race"),
+                )
+                for record in records
+            ],
+        )
+        for configuration, records in configurations.items()
+    ]
+
+
+def get_round_lobbies(
+    db: DBSession,
+    round_id: int,
+    capacity: int,
+    keep_teams: bool,
+    include_unconfirmed: bool,
+) -> LobbiesSchema:
+    """Returns the drivers taking part in the round, split into lobbies of similar
+    strength."""
+    try:
+        lobbies = fetch_round_lobbies(
+            db, round_id, capacity, keep_teams, include_unconfirmed
+        )
+    except ValueError as e:
+        raise HTTPException(422, str(e)) from e
+    if not lobbies:
+        raise HTTPException(404, "Round not found.")
+
+    return LobbiesSchema(
+        spread=lobbies.spread,
+        lobbies=[
+            LobbySchema(
+                mean_skill=mean_skill,
+                drivers=[
+                    LobbyDriverSchema(
+                        driver_id=driver.id, driver_name=driver.abbreviated_name
+                    )
+                    for driver in (
+                        cast(Driver, db.get(Driver, driver_id))
+                        for driver_id in driver_ids.tolist()
+                    )
+                ],
+            )
+            for driver_ids, mean_skill in zip(
+                lobbies.driver_ids, lobbies.mean_skills.tolist()
+            )
+        ],
+    )
+
+
+def get_championship_forecast(
+    db: DBSession, category_id: int
+) -> ChampionshipForecastSchema:
+    """Returns the probability of each driver in the category and of each team in its
+    championship winning the title, estimated by simulating the remaining rounds."""
+    forecast = fetch_championship_forecast(db, category_id)
+    if not forecast:
+        raise HTTPException(404, "Category not found.")
+
+    drivers: list[DriverForecastSchema] = []
+    for i in forecast.driver_order():
+        driver = cast(Driver, db.get(Driver, int(forecast.driver_ids[i])))
+        drivers.append(
+            DriverForecastSchema(
+                driver_id=driver.id,
+                driver_name=driver.abbreviated_name,
+                points=forecast.points[i],
+                title_probability=forecast.title[i],
+                podium_probability=forecast.podium[i],
+                expected_points=forecast.expected_points[i],
+                expected_position=forecast.expected_position[i],
+            )
+        )
+
+    teams: list[TeamForecastSchema] = []
+    for i in forecast.team_order():
+        team = cast(Team, db.get(Team, int(forecast.team_ids[i])))
         teams.append(
-            TeamStandingsSchema(
-                points=team.get_championship(championship_id).points,  # type: ignore
-                logo=team.logo_url,
-                name=team.name,
+            TeamForecastSchema(
+                team_id=team.id,
+                team_name=team.name,
+                points=forecast.team_points[i],
+                title_probability=forecast.team_title[i],
+                expected_points=forecast.team_expected_points[i],
             )
         )
 
-    return teams
+    return ChampionshipForecastSchema(
+        simulations=forecast.simulations, drivers=drivers, teams=teams
+    )
+
+
+def simulate_what_if(
+    db: DBSession, category_id: int, changes: list[WhatIfChangeSchema]
+) -> WhatIfOutcomeSchema:
+    """Returns the drivers' and teams' standings resulting from the hypothetical changes,
+    without modifying the database."""
+
+    category = fetch_category(db, category_id=category_id)
+    if not category:
+        raise HTTPException(404, "Category not found.")
+
+    scenario = fetch_category_results(db, category).scenario()
+    for change in changes:
+        if change.kind == "points_deduction":
+            if change.round_id is None:
+                raise HTTPException(422, "round_id is required to deduct points.")
+            scenario.deduct_points(change.driver_id, change.round_id, change.points)
+            continue
+
+        if change.session_id is None:
+            raise HTTPException(422, f"session_id is required for {change.kind}.")
+        if change.kind == "time_penalty":
+            scenario.add_time_penalty(
+                change.driver_id, change.session_id, change.time_penalty
+            )
+        else:
+            scenario.disqualify(change.driver_id, change.session_id)
+
+    outcome = scenario.outcome()
+
+    drivers: list[StandingsChangeSchema] = []
+    for driver_change in outcome.drivers:
+        driver = cast(Driver, db.get(Driver, driver_change.id))
+        drivers.append(
+            StandingsChangeSchema(
+                name=driver.abbreviated_name, **driver_change.__dict__
+            )
+        )
+
+    teams: list[StandingsChangeSchema] = []
+    for team_change in outcome.teams:
+        team = cast(Team, db.get(Team, team_change.id))
+        teams.append(StandingsChangeSchema(name=team.name, **team_change.__dict__))
+
+    return WhatIfOutcomeSchema(drivers=drivers, teams=teams)
 
 
 def detect_category(db: DBSession, results: RaceRoomResultsSchema):
@@ -452,6 +877,9 @@ async def save_rre_results(db: DBSession, results: RaceRoomResultsSchema) -> Non
                 category=category,
                 category_id=category.id,
                 fastest_lap=player.rre_id == driver_with_fastest_lap,
+                best_laptime=(
+                    player.best_lap_time if player.best_lap_time > 0 else None
+                ),
             )
             races[session].append(race_result)
 
@@ -506,6 +934,15 @@ def fastest_lap_scorer(race_data: dict[str, Any]) -> int:
     return driver_with_fastest_lap
 
 
+def best_lap_time(player: dict[str, Any]) -> int | None:
+    """Returns the fastest valid lap the player set in the race, None if they didn't
+    complete one."""
+    return min(
+        (lap["Time"] for lap in player["RaceSessionLaps"] if lap["Time"] > 0),
+        default=None,
+    )
+
+
 async def save_rre_results_old(db: DBSession, json_str: bytes) -> None:
     logger.info("Loading data from json file...")
     data = json.loads(json_str)
@@ -680,6 +1117,7 @@ async def save_rre_results_old(db: DBSession, json_str: bytes) -> None:
                 session=session,
                 category_id=category.id,
                 fastest_lap=rre_id == driver_with_fastest_lap,
+                best_laptime=best_lap_time(player),
             )
 
             races[session].append(race_result)
@@ -0,0 +1,34 @@
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class PaceSchema(BaseModel):
+    round_id: int
+    date: date
+    category_id: int
+    race_pace: float | None
+    quali_pace: float | None
+    rolling_race_pace: float | None
+
+
+class CircuitRecordSchema(BaseModel):
+    circuit_id: int
+    circuit_name: str
+    game_id: int
+    laptime: int
+    driver_id: int
+    psn_id: str | None
+    round_id: int
+    date: date
+
+
+class ConsistencySchema(BaseModel):
+    driver_id: int
+    races: int
+    finishes: int
+    average_position: float | None
+    position_deviation: float | None
+    gap_deviation: float | None
+    penalties: int
+    time_penalties: int
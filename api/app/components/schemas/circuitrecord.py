@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class LapRecordSchema(BaseModel):
+    laptime: int
+    driver_id: int
+    driver_name: str
+    round_id: int
+
+
+class SeasonRecordsSchema(BaseModel):
+    championship_id: int
+    championship_name: str
+    quali: LapRecordSchema | None
+    race: LapRecordSchema | None
+
+
+class CircuitRecordsSchema(BaseModel):
+    configuration_id: int
+    quali: LapRecordSchema | None
+    race: LapRecordSchema | None
+    seasons: list[SeasonRecordsSchema]
@@ -1,3 +1,5 @@
+from datetime import date
+
 from pydantic import BaseModel
 
 
@@ -7,3 +9,45 @@ class DriverSchema(BaseModel):
     hashed_password: str
     psn_id: str
     rre_id: int
+
+
+class DriverRatingSchema(BaseModel):
+    position: int
+    driver_id: int
+    driver_name: str
+    psn_id: str | None
+    rating: float
+    mu: float
+    sigma: float
+
+
+class DriverStatsSchema(BaseModel):
+    driver_id: int
+    driver_name: str
+    psn_id: str | None
+    wins: int
+    podiums: int
+    fastest_laps: int
+    poles: int
+    races_completed: int
+    avg_race_position: float
+    avg_quali_position: float
+    race_avg_gap_perc: float
+    quali_avg_gap_perc: float
+
+
+class RatingPointSchema(BaseModel):
+    date: date
+    round_id: int
+    session_id: int
+    session_name: str
+    game_id: int
+    rating: float
+    mu: float
+    sigma: float
+
+
+class RatingHistorySchema(BaseModel):
+    driver_id: int
+    delta: float | None
+    history: list[RatingPointSchema]
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+
+
+class DriverForecastSchema(BaseModel):
+    driver_id: int
+    driver_name: str
+    points: float
+    title_probability: float
+    podium_probability: float
+    expected_points: float
+    expected_position: float
+
+
+class TeamForecastSchema(BaseModel):
+    team_id: int
+    team_name: str
+    points: float
+    title_probability: float
+    expected_points: float
+
+
+class ChampionshipForecastSchema(BaseModel):
+    simulations: int
+    drivers: list[DriverForecastSchema]
+    teams: list[TeamForecastSchema]
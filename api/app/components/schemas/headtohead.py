@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class HeadToHeadSchema(BaseModel):
+    driver_id: int
+    driver_name: str
+    opponent_id: int
+    opponent_name: str
+    races: int
+    race_wins: int
+    race_losses: int
+    average_gap: float | None
+    qualis: int
+    quali_wins: int
+    quali_losses: int
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+
+class LobbyDriverSchema(BaseModel):
+    driver_id: int
+    driver_name: str
+
+
+class LobbySchema(BaseModel):
+    mean_skill: float
+    drivers: list[LobbyDriverSchema]
+
+
+class LobbiesSchema(BaseModel):
+    spread: float
+    lobbies: list[LobbySchema]
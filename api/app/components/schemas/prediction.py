@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class PredictionRequestSchema(BaseModel):
+    driver_ids: list[int]
+    game_id: int
+
+
+class PredictedPositionSchema(BaseModel):
+    driver_id: int
+    driver_name: str
+    expected_position: float
+
+
+class RacePredictionSchema(BaseModel):
+    driver_ids: list[int]
+    win_probabilities: list[list[float]]
+    expected_order: list[PredictedPositionSchema]
@@ -13,3 +13,4 @@ class TeamStandingsSchema(BaseModel):
     points: int | float
     logo: str
     name: str
+    delta: int = 0
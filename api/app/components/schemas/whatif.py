@@ -0,0 +1,29 @@
+from typing import Literal
+from pydantic import BaseModel
+
+
+class WhatIfChangeSchema(BaseModel):
+    kind: Literal["time_penalty", "points_deduction", "disqualification"]
+    driver_id: int
+    session_id: int | None = None
+    round_id: int | None = None
+    time_penalty: int = 0
+    points: float | int = 0
+
+
+class WhatIfSchema(BaseModel):
+    changes: list[WhatIfChangeSchema]
+
+
+class StandingsChangeSchema(BaseModel):
+    id: int
+    name: str
+    position_before: int | None
+    position_after: int | None
+    points_before: float | int
+    points_after: float | int
+
+
+class WhatIfOutcomeSchema(BaseModel):
+    drivers: list[StandingsChangeSchema]
+    teams: list[StandingsChangeSchema]
@@ -15,8 +15,26 @@ from queries import (
 from starlette.middleware.base import BaseHTTPMiddleware
 from app.components.schemas.category import CategorySchema
 from app.components.schemas.championship import ChampionshipSchema
-from app.components.schemas.driver import DriverSchema
+from app.components.schemas.driver import (
+    DriverRatingSchema,
+    DriverSchema,
+    DriverStatsSchema,
+    RatingHistorySchema,
+)
+from app.components.schemas.forecast import ChampionshipForecastSchema
+from app.components.schemas.headtohead import HeadToHeadSchema
+from app.components.schemas.lobby import LobbiesSchema
+from app.components.schemas.circuitrecord import CircuitRecordsSchema
+from app.components.schemas.analytics import (
+    CircuitRecordSchema,
+    ConsistencySchema,
+    PaceSchema,
+)
 from app.components.schemas.penalty import PenaltySchema
+from app.components.schemas.prediction import (
+    PredictionRequestSchema,
+    RacePredictionSchema,
+)
 from app.components.schemas.protest import ProtestSchema, CreateProtestSchema
 from app.components.schemas.qualifyingresult import QualifyingResultSchema
 from app.components.schemas.raceresult import RaceResultSchema
@@ -25,6 +43,7 @@ from app.components.schemas.team import EditTeamSchema, TeamSchema, TeamStanding
 from app.components.schemas.session import SessionSchema
 from app.components.schemas.round import RoundSchema
 from app.components.schemas.token import TokenSchema
+from app.components.schemas.whatif import WhatIfOutcomeSchema, WhatIfSchema
 from app.components.auth import (
     authenticate_user,
     create_access_token,
@@ -37,11 +56,25 @@ from app.components.handlers import (
     generate_protest_document_old,
     get_calendar,
     get_categories,
+    get_championship_forecast,
+    get_circuit_lap_records,
     get_drivers_points,
+    get_drivers_stats,
+    get_head_to_head,
+    get_leaderboard,
+    get_race_prediction,
+    get_rating_history,
+    get_round_lobbies,
+    get_pace_trend,
+    get_circuit_records,
+    get_consistency,
+    get_round_prediction,
     get_standings_with_results,
     get_teams_list,
+    get_teams_points,
     save_rre_results,
     save_rre_results_old,
+    simulate_what_if,
 )
 from fastapi import (
     Depends,
@@ -49,6 +82,7 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Query,
     Request,
     Response,
     UploadFile,
@@ -515,6 +549,113 @@ async def delete_penalty(
     return
 
 
+@app.get(
+    "/api-v2/rounds/{round_id}/prediction",
+    response_model=RacePredictionSchema,
+)
+async def read_round_prediction(round_id: int, db: DBSession = Depends(get_db)):
+    return get_round_prediction(db, round_id)
+
+
+@app.get(
+    "/api-v2/rounds/{round_id}/lobbies",
+    response_model=LobbiesSchema,
+)
+async def read_round_lobbies(
+    round_id: int,
+    capacity: int = Query(16, ge=1),
+    keep_teams: bool = True,
+    include_unconfirmed: bool = False,
+    db: DBSession = Depends(get_db),
+):
+    return get_round_lobbies(db, round_id, capacity, keep_teams, include_unconfirmed)
+
+
+@app.get(
+    "/api-v2/circuits/{circuit_id}/records",
+    response_model=list[CircuitRecordsSchema],
+)
+async def read_circuit_lap_records(
+    circuit_id: int,
+    configuration_id: int | None = None,
+    db: DBSession = Depends(get_db),
+):
+    return get_circuit_lap_records(db, circuit_id, configuration_id)
+
+
+@app.get(
+    "/api-v2/analytics/drivers/{driver_id}/pace",
+    response_model=list[PaceSchema],
+)
+async def read_pace_trend(driver_id: int, window: int = Query(5, ge=1)):
+    return get_pace_trend(driver_id, window)
+
+
+@app.get(
+    "/api-v2/analytics/circuit-records",
+    response_model=list[CircuitRecordSchema],
+)
+async def read_circuit_records(
+    circuit_id: int | None = None, game_id: int | None = None
+):
+    return get_circuit_records(circuit_id, game_id)
+
+
+@app.get(
+    "/api-v2/analytics/consistency",
+    response_model=list[ConsistencySchema],
+)
+async def read_consistency(
+    championship_id: int | None = None,
+    category_id: int | None = None,
+    min_races: int = Query(3, ge=1),
+):
+    return get_consistency(championship_id, category_id, min_races)
+
+
+@app.post("/api-v2/predictions", response_model=RacePredictionSchema)
+async def predict_race(
+    prediction: PredictionRequestSchema, db: DBSession = Depends(get_db)
+):
+    return get_race_prediction(db, prediction.driver_ids, prediction.game_id)
+
+
+@app.get(
+    "/api-v2/categories/{category_id}/forecast",
+    response_model=ChampionshipForecastSchema,
+)
+async def read_championship_forecast(
+    category_id: int, db: DBSession = Depends(get_db)
+):
+    return get_championship_forecast(db, category_id)
+
+
+@app.get(
+    "/api-v2/categories/{category_id}/head-to-head/{driver_id}/{opponent_id}",
+    response_model=HeadToHeadSchema,
+)
+async def read_head_to_head(
+    category_id: int,
+    driver_id: int,
+    opponent_id: int,
+    db: DBSession = Depends(get_db),
+):
+    return get_head_to_head(db, category_id, driver_id, opponent_id)
+
+
+@app.post(
+    "/api-v2/categories/{category_id}/what-if",
+    response_model=WhatIfOutcomeSchema,
+)
+async def what_if(
+    category_id: int,
+    what_if: WhatIfSchema,
+    current_user: Annotated[DriverSchema, Depends(get_current_user)],
+    db: DBSession = Depends(get_db),
+):
+    return simulate_what_if(db, category_id, what_if.changes)
+
+
 @app.get(
     "/api-v2/teams/",
     response_model=list[TeamSchema],
@@ -559,6 +700,19 @@ async def delete_team(
     return
 
 
+@app.get(
+    "/api-v2/drivers/leaderboard",
+    response_model=list[DriverRatingSchema],
+)
+async def read_leaderboard(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    game_id: int | None = None,
+    db: DBSession = Depends(get_db),
+):
+    return get_leaderboard(db, page, page_size, game_id)
+
+
 @app.get(
     "/api-v2/drivers/",
     response_model=list[DriverSchema],
@@ -567,6 +721,19 @@ async def read_drivers(active: bool = True, db: DBSession = Depends(get_db)):
     return
 
 
+@app.get(
+    "/api-v2/drivers/stats",
+    response_model=list[DriverStatsSchema],
+)
+async def read_drivers_stats(
+    championship_id: int | None = None,
+    category_id: int | None = None,
+    game_id: int | None = None,
+    db: DBSession = Depends(get_db),
+):
+    return get_drivers_stats(db, championship_id, category_id, game_id)
+
+
 @app.get(
     "/api-v2/drivers/{driver_id}",
     response_model=DriverSchema,
@@ -575,6 +742,16 @@ async def read_driver(driver_id: int, db: DBSession = Depends(get_db)):
     return
 
 
+@app.get(
+    "/api-v2/drivers/{driver_id}/ratings",
+    response_model=RatingHistorySchema,
+)
+async def read_rating_history(
+    driver_id: int, game_id: int | None = None, db: DBSession = Depends(get_db)
+):
+    return get_rating_history(db, driver_id, game_id)
+
+
 @app.post("/api-v2/drivers/")
 async def create_driver(
     driver: DriverSchema,
@@ -667,6 +844,11 @@ async def driver_points(championship_id: int = Form(), db: DBSession = Depends(g
     return get_drivers_points(db, int(championship_id))
 
 
+@app.post("/api/team-points")
+async def team_points(championship_id: int = Form(), db: DBSession = Depends(get_db)):
+    return get_teams_points(db, int(championship_id))
+
+
 @app.post("/api/token", response_model=TokenSchema)
 async def login_old(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
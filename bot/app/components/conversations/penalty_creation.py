@@ -24,14 +24,16 @@ from telegram.ext import (
     filters,
 )
 
-from models import Category, Driver, Penalty, Protest
+from models import Category, Driver, Penalty, Protest, Team
+from simulation import StandingsChange
 from queries import (
     fetch_championship,
     fetch_driver_by_telegram_id,
     fetch_last_penalty_number,
     fetch_protests,
     fetch_reprimand_types,
-    save_and_apply_penalty,
+    save_and_apply_penalties,
+    simulate_penalties,
 )
 
 (
@@ -58,7 +60,13 @@ DBSession = sessionmaker(bind=engine, autoflush=False)
 async def create_penalty(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Allows admins to create penalties without a pre-existing protest made by a leader."""
 
-    sqla_session = DBSession()
+    user_data = cast(dict[str, Any], context.user_data)
+
+    # Queued penalties live in the session they were created in.
+    if user_data.get("pending_penalties"):
+        sqla_session = user_data["sqla_session"]
+    else:
+        sqla_session = DBSession()
     driver = fetch_driver_by_telegram_id(sqla_session, update.effective_user.id)
     if not driver:
         await update.message.reply_text(
@@ -72,7 +80,6 @@ async def create_penalty(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return ConversationHandler.END
 
-    user_data = cast(dict[str, Any], context.user_data)
     user_data["sqla_session"] = sqla_session
 
     championship = fetch_championship(sqla_session)
@@ -81,7 +88,7 @@ async def create_penalty(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         user_data.clear()
         return ConversationHandler.END
 
-    if update.message:
+    if update.message or "penalty" not in user_data:
         user_data["penalty"] = Penalty()
         user_data["penalty"].licence_points = 0
         user_data["penalty"].warnings = 0
@@ -155,12 +162,8 @@ async def ask_session(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         penalty.round = category.rounds[
             int(update.callback_query.data.removeprefix("R"))
         ]
-        penalty.number = (
-            fetch_last_penalty_number(
-                sqla_session,
-                round_id=penalty.round_id,
-            )
-            + 1
+        penalty.number = _next_penalty_number(
+            sqla_session, user_data.get("pending_penalties", []), penalty.round.id
         )
 
     text = "In quale sessione è avvenuta l'infrazione?"
@@ -354,7 +357,6 @@ async def ask_category(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     text = "Non risultano esserci segnalazioni "
 
     for protest in protests:
-
         if not protest.category_id == selected_category.id:
             continue
 
@@ -369,12 +371,8 @@ async def ask_category(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         )
         penalty = Penalty.from_protest(protest)
 
-        penalty.number = (
-            fetch_last_penalty_number(
-                sqla_session,
-                round_id=penalty.round.id,
-            )
-            + 1
+        penalty.number = _next_penalty_number(
+            sqla_session, user_data.get("pending_penalties", []), penalty.round.id
         )
         user_data["penalty"] = penalty
         user_data["current_protest"] = protest
@@ -628,11 +626,27 @@ async def ask_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     ]
 
     if penalty.is_complete():
+        pending_penalties = user_data.get("pending_penalties", [])
+        if penalty.points or penalty.time_penalty:
+            text += _standings_preview(
+                user_data["sqla_session"], [*pending_penalties, penalty]
+            )
         reply_markup.append(
             [
-                InlineKeyboardButton("Conferma decisione", callback_data="send_now"),
+                InlineKeyboardButton(
+                    "Conferma decisione"
+                    + (
+                        f" (+{len(pending_penalties)} in coda)"
+                        if pending_penalties
+                        else ""
+                    ),
+                    callback_data="send_now",
+                ),
             ],
         )
+        reply_markup.append(
+            [InlineKeyboardButton("Aggiungi alla coda", callback_data="queue")]
+        )
     else:
         text += (
             "\n⚠️ Prima di inviare il protest è necessario aver compilato tutti i campi."
@@ -643,27 +657,140 @@ async def ask_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     return ASK_IF_NEXT
 
 
-async def send_protest(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Send the protest and ends the conversation"""
+def _standings_preview(sqla_session: SQLASession, penalties: list[Penalty]) -> str:
+    """Returns the changes to the standings which applying the penalties would cause."""
+
+    outcome = simulate_penalties(sqla_session, penalties[-1].category, penalties)
+
+    text = "\n\n<b>Anteprima classifica</b>\n"
+    for change in outcome.changed_drivers():
+        driver = cast(Driver, sqla_session.get(Driver, change.id))
+        text += _standings_change_text(driver.abbreviated_name, change)
+    for change in outcome.changed_teams():
+        team = cast(Team, sqla_session.get(Team, change.id))
+        text += _standings_change_text(team.name, change)
+    return text
+
+
+def _standings_change_text(name: str, change: StandingsChange) -> str:
+    diff = (change.position_after or 0) - (change.position_before or 0)
+    if diff > 0:
+        diff_text = f" ↓{abs(diff)}"
+    elif diff < 0:
+        diff_text = f" ↑{abs(diff)}"
+    else:
+        diff_text = ""
+    return (
+        f"{change.position_after} - {name} "
+        f"<i>{change.points_before:g} → {change.points_after:g}{diff_text}</i>\n"
+    )
+
+
+def _next_penalty_number(
+    sqla_session: SQLASession, pending_penalties: list[Penalty], round_id: int
+) -> int:
+    """Returns the number the penalty being created in the round will be given,
+    counting the queued penalties of the round which haven't been saved yet."""
+    return (
+        fetch_last_penalty_number(sqla_session, round_id)
+        + sum(penalty.round.id == round_id for penalty in pending_penalties)
+        + 1
+    )
+
+
+def _assign_penalty_numbers(
+    sqla_session: SQLASession, penalties: list[Penalty]
+) -> None:
+    """Numbers the penalties in the order they were queued, following the last
+    penalty saved in each round."""
+    last_numbers: dict[int, int] = {}
+    for penalty in penalties:
+        round_id = penalty.round.id
+        if round_id not in last_numbers:
+            last_numbers[round_id] = fetch_last_penalty_number(sqla_session, round_id)
+        last_numbers[round_id] += 1
+        penalty.number = last_numbers[round_id]
+
+
+async def queue_penalty(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Adds the penalty to the ones which will be applied together at the end of the
+    conversation, then lets the user move on to the next one."""
 
     user_data = cast(dict[str, Any], context.user_data)
-    sqla_session: SQLASession = user_data["sqla_session"]
-    if user_data.get("current_protest"):
-        protest = user_data["current_protest"]
+    penalty: Penalty = user_data.pop("penalty")
+
+    if protest := user_data.pop("current_protest", None):
         protest.is_reviewed = True
-        user_data["penalty"].protest = protest
+        penalty.protest = protest
+        user_data["unreviewed_protests"].remove(protest)
 
-    penalty: Penalty = user_data["penalty"]
+    user_data.setdefault("pending_penalties", []).append(penalty)
+    user_data.pop("point_penalty_text", None)
+    user_data.pop("reprimand_text", None)
 
-    save_and_apply_penalty(sqla_session, penalty)
+    text = (
+        f"Penalità aggiunta alla coda, {len(user_data['pending_penalties'])} in attesa "
+        "di essere applicate."
+    )
 
-    buffer, filename = PenaltyDocument(penalty).generate_document()
+    selected_category = user_data.get("selected_category")
+    if protest and any(
+        p.category_id == selected_category.id  # type: ignore
+        for p in user_data["unreviewed_protests"]
+    ):
+        next_button = InlineKeyboardButton(
+            "Prossima segnalazione »", callback_data=str(ASK_CATEGORY)
+        )
+    else:
+        next_button = InlineKeyboardButton(
+            "Nuova penalità »", callback_data="create_penalty"
+        )
 
-    await context.bot.send_document(
-        chat_id=config.PROTEST_CHANNEL, document=buffer, filename=filename
+    reply_markup = InlineKeyboardMarkup(
+        [
+            [next_button],
+            [
+                InlineKeyboardButton(
+                    "Applica penalità in coda", callback_data="send_queue"
+                )
+            ],
+        ]
     )
+    await send_or_edit_message(update, text, reply_markup)
 
-    text = "Penalità applicata e inviata."
+    return ASK_IF_NEXT
+
+
+async def send_protest(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Applies the penalty together with the queued ones (if any), sends them
+    and ends the conversation."""
+
+    user_data = cast(dict[str, Any], context.user_data)
+    sqla_session: SQLASession = user_data["sqla_session"]
+    penalties: list[Penalty] = user_data.get("pending_penalties", [])
+
+    if update.callback_query.data == "send_now":
+        if user_data.get("current_protest"):
+            protest = user_data["current_protest"]
+            protest.is_reviewed = True
+            user_data["penalty"].protest = protest
+        penalties.append(user_data["penalty"])
+
+    # Queued penalties aren't flushed, so their numbers are only final here.
+    _assign_penalty_numbers(sqla_session, penalties)
+    save_and_apply_penalties(sqla_session, penalties)
+
+    for penalty in penalties:
+        buffer, filename = PenaltyDocument(penalty).generate_document()
+
+        await context.bot.send_document(
+            chat_id=config.PROTEST_CHANNEL, document=buffer, filename=filename
+        )
+
+    if len(penalties) == 1:
+        text = "Penalità applicata e inviata."
+    else:
+        text = f"{len(penalties)} penalità applicate e inviate."
 
     await send_or_edit_message(update, text)
     sqla_session.close()
@@ -759,7 +886,10 @@ penalty_creation = ConversationHandler(
         ASK_CONFIRMATION: [
             MessageHandler(filters.Regex(r"^[^/]{20,}$"), ask_confirmation)
         ],
-        ASK_IF_NEXT: [CallbackQueryHandler(send_protest, r"^send_now$")],
+        ASK_IF_NEXT: [
+            CallbackQueryHandler(send_protest, r"^send_now$|^send_queue$"),
+            CallbackQueryHandler(queue_penalty, r"^queue$"),
+        ],
     },
     fallbacks=[
         CommandHandler("esci", exit_conversation),
@@ -37,6 +37,8 @@ GROUP_COMMANDS = (
         "Classifiche piloti del campionato in corso.",
     ),
     ("classifica_costruttori", "Classifica costruttori del campionato in corso"),
+    ("pronostico", "Probabilità di vittoria del campionato in corso."),
+    ("testa_a_testa", "Confronta i risultati di due piloti della tua categoria."),
     ("calendario", "Calendario della categoria a cui partecipi."),
     ("prossima_gara", "Info sulla tua prossima gara."),
     ("ultima_gara", "Risultati della tua scorsa gara."),
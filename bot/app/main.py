@@ -60,12 +60,18 @@ from queries import (
     delete_chat,
     fetch_admins,
     fetch_driver_by_telegram_id,
-    fetch_drivers,
     fetch_championship,
+    fetch_championship_forecast,
+    fetch_head_to_head,
+    fetch_rating_history,
     fetch_round_participants,
+    fetch_standings_table,
     fetch_team_leaders,
+    fetch_team_standings_table,
+    fetch_top_drivers,
     update_participant_status,
 )
+from ratings import rating_delta
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.ERROR
@@ -401,7 +407,9 @@ async def inline_query_driver_search(
                 id=str(uuid4()),
                 title=driver.full_name,
                 input_message_content=InputTextMessageContent(
-                    driver.stats_telegram_message()
+                    driver.stats_telegram_message(
+                        rating_delta(fetch_rating_history(session, driver.id))
+                    )
                 ),
             )
             results.append(result_article)
@@ -437,9 +445,11 @@ async def championship_standings(update: Update, _: ContextTypes.DEFAULT_TYPE) -
         return
 
     message = f"<b><i>CLASSIFICA {category.name}</i></b>\n\n"
-    standings = category.standings(-1)
+    drivers = {driver.driver_id: driver.driver for driver in category.drivers}
+    standings = fetch_standings_table(session, category).standings()
 
-    for pos, (driver, (points, diff)) in enumerate(standings.items(), start=1):
+    for pos, (driver_id, points, diff) in enumerate(standings, start=1):
+        driver = drivers.get(driver_id) or session.get(Driver, driver_id)
         if diff > 0:
             diff_text = f" ↓{abs(diff)}"
         elif diff < 0:
@@ -456,6 +466,132 @@ async def championship_standings(update: Update, _: ContextTypes.DEFAULT_TYPE) -
     await update.message.reply_text(text=message)
 
 
+async def championship_forecast(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    """When activated via the /pronostico command, it sends a message containing each
+    driver's chance of winning the championship of the user's category, and each
+    team's chance of winning the constructors' championship."""
+    session = DBSession()
+    user_driver = fetch_driver_by_telegram_id(session, update.effective_user.id)
+    if not user_driver:
+        await update.message.reply_text(
+            "Per usare questa funzione devi essere registrato.\n"
+            "Puoi farlo con /registrami."
+        )
+        return
+
+    driver_category = user_driver.current_category()
+    if not driver_category:
+        await update.message.reply_text(
+            "Non fai parte di alcuna categoria al momento, quando ti iscriverai "
+            "ad un nostro campionato potrai utilizzare questo comando per vedere "
+            "il pronostico della tua categoria."
+        )
+        return
+
+    category = driver_category.category
+    forecast = fetch_championship_forecast(session, category.id)
+    if not forecast:
+        return
+
+    drivers = {driver.driver_id: driver.driver for driver in category.drivers}
+    message = (
+        f"<b><i>PRONOSTICO {category.name}</i></b>\n"
+        f"<i>Titolo - Podio, su {forecast.simulations} simulazioni</i>\n\n"
+    )
+    for pos, i in enumerate(forecast.driver_order(), start=1):
+        driver = drivers[int(forecast.driver_ids[i])]
+        if driver == user_driver:
+            driver_name = f"<b>{driver.abbreviated_name}</b>"
+        else:
+            driver_name = driver.abbreviated_name
+        message += (
+            f"{pos} - {driver_name} "
+            f"<i>{forecast.title[i]:.1%} - {forecast.podium[i]:.1%}</i>\n"
+        )
+
+    teams = {team.team_id: team.team for team in category.championship.teams}
+    message += "\n<b><i>TITOLO COSTRUTTORI</i></b>\n\n"
+    for pos, i in enumerate(forecast.team_order(), start=1):
+        team = teams[int(forecast.team_ids[i])]
+        message += f"{pos} - {team.name} <i>{forecast.team_title[i]:.1%}</i>\n"
+
+    await update.message.reply_text(text=message)
+
+
+async def head_to_head(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """When activated via the /testa_a_testa command, followed by the names (or PSN IDs)
+    of two drivers in the user's category, it sends a message containing their
+    head-to-head record in races and qualifying sessions."""
+    session = DBSession()
+    user_driver = fetch_driver_by_telegram_id(session, update.effective_user.id)
+    if not user_driver:
+        await update.message.reply_text(
+            "Per usare questa funzione devi essere registrato.\n"
+            "Puoi farlo con /registrami."
+        )
+        return
+
+    driver_category = user_driver.current_category()
+    if not driver_category:
+        await update.message.reply_text(
+            "Non fai parte di alcuna categoria al momento, quando ti iscriverai "
+            "ad un nostro campionato potrai utilizzare questo comando per confrontare "
+            "i piloti della tua categoria."
+        )
+        return
+
+    if not context.args or len(context.args) != 2:
+        await update.message.reply_text(
+            "Scrivi il nome o l'ID PSN dei due piloti da confrontare, "
+            "ad esempio: /testa_a_testa Rossi Bianchi"
+        )
+        return
+
+    category = driver_category.category
+    names: dict[str, Driver] = {}
+    for member in category.drivers:
+        driver = member.driver
+        for name in (driver.psn_id, driver.surname, driver.full_name):
+            if name:
+                names[name.lower()] = driver
+
+    drivers: list[Driver] = []
+    for arg in context.args:
+        if not (matches := get_close_matches(arg.lower(), names, n=1, cutoff=0.6)):
+            await update.message.reply_text(
+                f"Nessun pilota di {category.name} corrisponde a \"{arg}\"."
+            )
+            return
+        drivers.append(names[matches[0]])
+
+    driver, opponent = drivers
+    head_to_head_matrix = fetch_head_to_head(session, category.id)
+    record = (
+        head_to_head_matrix.record(driver.id, opponent.id)
+        if head_to_head_matrix
+        else None
+    )
+    if not record:
+        await update.message.reply_text(
+            f"{driver.abbreviated_name} e {opponent.abbreviated_name} non si sono "
+            "ancora sfidati."
+        )
+        return
+
+    if record.average_gap is None:
+        gap_text = "N.D."
+    else:
+        gap_text = f"{record.average_gap / 1000:+.3f}s"
+
+    await update.message.reply_text(
+        f"<b><i>TESTA A TESTA {category.name}</i></b>\n\n"
+        f"<b>{driver.abbreviated_name}</b> vs <b>{opponent.abbreviated_name}</b>\n\n"
+        f"<b>Gare</b>: <i>{record.race_wins} - {record.race_losses}</i>\n"
+        f"<b>Distacco medio</b>: <i>{gap_text}</i>\n"
+        f"<b>Qualifiche</b>: <i>{record.quali_wins} - {record.quali_losses}</i>\n"
+    )
+
+
 async def complete_championship_standings(
     update: Update, _: ContextTypes.DEFAULT_TYPE
 ) -> None:
@@ -463,7 +599,7 @@ async def complete_championship_standings(
     the current championship standings for the category the user is in.
     """
     sqla_session = DBSession()
-    championship = fetch_championship(sqla_session)
+    championship = fetch_championship(sqla_session, load_graph=True)
     user_driver = fetch_driver_by_telegram_id(sqla_session, update.effective_user.id)
     if not championship:
         return
@@ -475,10 +611,12 @@ async def complete_championship_standings(
         return
 
     for category in championship.categories:
-        standings = category.standings(-1)
+        drivers = {driver.driver_id: driver.driver for driver in category.drivers}
+        standings = fetch_standings_table(sqla_session, category).standings()
         message += f"\n\n<b><i>CLASSIFICA PILOTI {category.name}</i></b>\n\n"
 
-        for pos, (driver, (points, diff)) in enumerate(standings.items(), start=1):
+        for pos, (driver_id, points, diff) in enumerate(standings, start=1):
+            driver = drivers.get(driver_id) or sqla_session.get(Driver, driver_id)
             if diff > 0:
                 diff_text = f" ↓{abs(diff)}"
             elif diff < 0:
@@ -517,17 +655,24 @@ async def constructors_standings(update: Update, _: ContextTypes.DEFAULT_TYPE) -
 
     driver = fetch_driver_by_telegram_id(sqla_session, update.effective_user.id)
 
-    teams = sorted(championship.teams, key=lambda t: t.points, reverse=True)
+    teams = {team.team_id: team.team for team in championship.teams}
+    standings = fetch_team_standings_table(sqla_session, championship.id).standings()
+    current_team = driver.current_team() if driver else None
 
     message = f"<b>CLASSIFICA COSTRUTTORI #{championship.tag}</b>\n\n"
-    for pos, team in enumerate(teams, start=1):
-        if driver:
-            current_team = driver.current_team()
-            if current_team and current_team.id == team.team_id:
-                message += f"{pos} - <b>{team.team.name}</b> <i>{team.points:g}</i>\n"
-                continue
+    for pos, (team_id, points, diff) in enumerate(standings, start=1):
+        if diff > 0:
+            diff_text = f" ↓{abs(diff)}"
+        elif diff < 0:
+            diff_text = f" ↑{abs(diff)}"
+        else:
+            diff_text = ""
 
-        message += f"{pos} - {team.team.name} <i>{team.points:g}</i>\n"
+        if current_team and current_team.id == team_id:
+            team_name = f"<b>{teams[team_id].name}</b>"
+        else:
+            team_name = teams[team_id].name
+        message += f"{pos} - {team_name} <i>{points:g}{diff_text}</i>\n"
 
     await update.message.reply_text(message)
 
@@ -580,7 +725,7 @@ async def complete_last_race_results(
     round in each category of the current championship."""
 
     sqla_session = DBSession()
-    championship = fetch_championship(sqla_session)
+    championship = fetch_championship(sqla_session, load_graph=True)
     message = ""
 
     if not championship:
@@ -984,23 +1129,21 @@ async def user_stats(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
         )
         return
 
-    await update.message.reply_text(driver.stats_telegram_message())
+    await update.message.reply_text(
+        driver.stats_telegram_message(
+            rating_delta(fetch_rating_history(sqla_session, driver.id))
+        )
+    )
 
 
 async def top_ten(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a list containing the top 10 drivers by rating."""
     session = DBSession()
-    drivers = fetch_drivers(session)
-
-    drivers.sort(key=lambda d: d.rating, reverse=True)
-
-    n = 10
-    if len(drivers) < n:
-        n = len(drivers)
+    drivers = fetch_top_drivers(session, limit=10)
 
     message = "Top 10 Piloti per Driver Rating:\n\n"
-    for driver in drivers[:n]:
-        message += f"<b>{driver.abbreviated_name}</b> <i>{driver.rating:.2f}</i>\n"
+    for driver, _, _, rating in drivers:
+        message += f"<b>{driver.abbreviated_name}</b> <i>{rating:.2f}</i>\n"
 
     await update.message.reply_text(message)
 
@@ -1080,6 +1223,8 @@ def main() -> None:
     application.add_handler(CommandHandler("prossima_gara", next_event))
     application.add_handler(CommandHandler("classifica_piloti", championship_standings))
     application.add_handler(CommandHandler("calendario", calendar))
+    application.add_handler(CommandHandler("pronostico", championship_forecast))
+    application.add_handler(CommandHandler("testa_a_testa", head_to_head))
     application.add_handler(
         CommandHandler("classifica_costruttori", constructors_standings)
     )
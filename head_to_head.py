@@ -0,0 +1,220 @@
+"""
+This module contains the HeadToHeadMatrix, which keeps the head-to-head record of every
+pair of drivers in a category, in races and qualifying sessions, as a set of arrays.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+import numpy as np
+
+_ARRAYS = (
+    "race_wins",
+    "race_duels",
+    "race_gaps",
+    "race_gap_counts",
+    "quali_wins",
+    "quali_duels",
+)
+
+
+@dataclass(frozen=True)
+class HeadToHeadRecord:
+    """Head-to-head record of a driver against an opponent.
+
+    Attributes:
+        driver_id (int): ID of the driver.
+        opponent_id (int): ID of the opponent.
+        races (int): Races both took part in, and at least one of them finished.
+        race_wins (int): Races the driver finished ahead of the opponent.
+        race_losses (int): Races the opponent finished ahead of the driver.
+        average_gap (float | None): Average time (ms) the driver finished ahead of the
+            opponent by, in the races both finished. Negative if the driver was
+            usually behind. (None if they never both finished a race)
+        qualis (int): Qualifying sessions both took part in, and at least one of
+            them set a time.
+        quali_wins (int): Qualifying sessions the driver finished ahead of the opponent.
+        quali_losses (int): Qualifying sessions the opponent finished ahead of the
+            driver.
+    """
+
+    driver_id: int
+    opponent_id: int
+    races: int
+    race_wins: int
+    race_losses: int
+    average_gap: float | None
+    qualis: int
+    quali_wins: int
+    quali_losses: int
+
+
+@dataclass(frozen=True)
+class HeadToHeadMatrix:
+    """Head-to-head records of the drivers of a category.
+
+    Matrices are indexed by the position of the drivers in driver_ids: the element
+    [i, j] refers to driver i against driver j. Arrays are never modified: adding
+    sessions returns a new matrix.
+
+    Attributes:
+        driver_ids (np.ndarray): IDs of the drivers who have a result in the category.
+        race_wins (np.ndarray): Races i finished ahead of j.
+        race_duels (np.ndarray): Races i and j both took part in, and at least one of
+            them finished.
+        race_gaps (np.ndarray): Sum of the time (ms) i finished ahead of j by, in the
+            races both finished.
+        race_gap_counts (np.ndarray): Races i and j both finished.
+        quali_wins (np.ndarray): Qualifying sessions i finished ahead of j.
+        quali_duels (np.ndarray): Qualifying sessions i and j both took part in, and
+            at least one of them set a time.
+    """
+
+    driver_ids: np.ndarray
+    race_wins: np.ndarray
+    race_duels: np.ndarray
+    race_gaps: np.ndarray
+    race_gap_counts: np.ndarray
+    quali_wins: np.ndarray
+    quali_duels: np.ndarray
+    _index: dict[int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "_index",
+            {driver_id: i for i, driver_id in enumerate(self.driver_ids.tolist())},
+        )
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    @classmethod
+    def empty(cls) -> HeadToHeadMatrix:
+        return cls(
+            driver_ids=np.zeros(0, dtype=np.int64),
+            race_wins=np.zeros((0, 0), dtype=np.int32),
+            race_duels=np.zeros((0, 0), dtype=np.int32),
+            race_gaps=np.zeros((0, 0), dtype=np.float64),
+            race_gap_counts=np.zeros((0, 0), dtype=np.int32),
+            quali_wins=np.zeros((0, 0), dtype=np.int32),
+            quali_duels=np.zeros((0, 0), dtype=np.int32),
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> HeadToHeadMatrix:
+        """Loads a matrix saved with to_bytes."""
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(
+                driver_ids=arrays["driver_ids"],
+                **{name: arrays[name] for name in _ARRAYS},
+            )
+
+    def to_bytes(self) -> bytes:
+        """Returns the arrays of the matrix, compressed into a single buffer."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            driver_ids=self.driver_ids,
+            **{name: getattr(self, name) for name in _ARRAYS},
+        )
+        return buffer.getvalue()
+
+    def __contains__(self, driver_id: object) -> bool:
+        return driver_id in self._index
+
+    def record(self, driver_id: int, opponent_id: int) -> HeadToHeadRecord | None:
+        """Returns the head-to-head record of the driver against the opponent,
+        None if either of them doesn't have a result in the category."""
+        i = self._index.get(driver_id)
+        j = self._index.get(opponent_id)
+        if i is None or j is None or i == j:
+            return None
+
+        gap_count = int(self.race_gap_counts[i, j])
+        return HeadToHeadRecord(
+            driver_id=driver_id,
+            opponent_id=opponent_id,
+            races=int(self.race_duels[i, j]),
+            race_wins=int(self.race_wins[i, j]),
+            race_losses=int(self.race_wins[j, i]),
+            average_gap=(
+                float(self.race_gaps[i, j]) / gap_count if gap_count else None
+            ),
+            qualis=int(self.quali_duels[i, j]),
+            quali_wins=int(self.quali_wins[i, j]),
+            quali_losses=int(self.quali_wins[j, i]),
+        )
+
+    def add_sessions(self, rows: Sequence[Sequence[Any]]) -> HeadToHeadMatrix:
+        """Returns a new matrix including the duels of the given sessions.
+
+        Args:
+            rows (Sequence[Sequence[Any]]): Rows containing, in order: session_id,
+                driver_id, is_quali, finished, position and time (total race time or
+                qualifying laptime) of each result. Rows of the same session must be
+                next to each other.
+
+        Returns:
+            HeadToHeadMatrix: The updated matrix.
+        """
+        new_ids = list(dict.fromkeys(row[1] for row in rows if row[1] not in self))
+        size = len(self.driver_ids) + len(new_ids)
+        arrays: dict[str, np.ndarray] = {}
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            arrays[name] = np.zeros((size, size), dtype=array.dtype)
+            arrays[name][: len(array), : len(array)] = array
+
+        index = self._index | {
+            driver_id: i for i, driver_id in enumerate(new_ids, len(self.driver_ids))
+        }
+        start = 0
+        for end in range(1, len(rows) + 1):
+            if end < len(rows) and rows[end][0] == rows[start][0]:
+                continue
+            self._add_session(arrays, index, rows[start:end])
+            start = end
+
+        return HeadToHeadMatrix(
+            driver_ids=np.concatenate(
+                (self.driver_ids, np.array(new_ids, dtype=np.int64))
+            ),
+            **arrays,
+        )
+
+    @staticmethod
+    def _add_session(
+        arrays: dict[str, np.ndarray],
+        index: dict[int, int],
+        rows: Sequence[Sequence[Any]],
+    ) -> None:
+        drivers = np.array([index[row[1]] for row in rows], dtype=np.intp)
+        finished = np.array([bool(row[3]) for row in rows])
+        # Drivers who didn't finish are behind everyone who did.
+        positions = np.array(
+            [row[4] if row[3] and row[4] else np.inf for row in rows], dtype=float
+        )
+        times = np.array(
+            [row[5] if row[3] and row[5] is not None else np.nan for row in rows],
+            dtype=float,
+        )
+
+        ahead = positions[:, np.newaxis] < positions[np.newaxis, :]
+        duels = finished[:, np.newaxis] | finished[np.newaxis, :]
+        np.fill_diagonal(duels, False)
+        pair = np.ix_(drivers, drivers)
+
+        kind = "quali" if rows[0][2] else "race"
+        arrays[f"{kind}_wins"][pair] += ahead
+        arrays[f"{kind}_duels"][pair] += duels
+        if kind == "race":
+            both = ~np.isnan(times[:, np.newaxis] - times[np.newaxis, :])
+            np.fill_diagonal(both, False)
+            arrays["race_gaps"][pair] += np.where(
+                both, times[np.newaxis, :] - times[:, np.newaxis], 0
+            )
+            arrays["race_gap_counts"][pair] += both
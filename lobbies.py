@@ -0,0 +1,228 @@
+"""
+This module contains the lobby optimiser, which splits the drivers taking part in a
+round into lobbies of similar strength when they don't all fit in a single server.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+MAX_ITERATIONS = 1000
+MIN_IMPROVEMENT = 1e-12
+
+
+@dataclass(frozen=True)
+class Lobbies:
+    """Drivers assigned to each lobby, and the strength of the lobbies.
+
+    Attributes:
+        driver_ids (tuple[np.ndarray, ...]): IDs of the drivers in each lobby,
+            ordered by skill. Lobbies are ordered by mean skill.
+        mean_skills (np.ndarray): Mean predicted skill of the drivers in each lobby.
+            (NaN if the lobby is empty)
+    """
+
+    driver_ids: tuple[np.ndarray, ...]
+    mean_skills: np.ndarray
+
+    def __post_init__(self) -> None:
+        for lobby in self.driver_ids:
+            lobby.flags.writeable = False
+        self.mean_skills.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.driver_ids)
+
+    @property
+    def spread(self) -> float:
+        """Difference between the mean skill of the strongest and weakest lobbies."""
+        skills = self.mean_skills[~np.isnan(self.mean_skills)]
+        if not len(skills):
+            return 0.0
+        return float(skills.max() - skills.min())
+
+
+def _units(
+    mu: np.ndarray, groups: np.ndarray | None
+) -> tuple[list[np.ndarray], np.ndarray, np.ndarray]:
+    """Returns the indexes of the drivers in each unit which can't be split up, the
+    sum of their skills and their size. Drivers in group -1 are units on their own."""
+    if groups is None:
+        members = [np.array([i]) for i in range(len(mu))]
+    else:
+        members = [np.array([i]) for i in np.flatnonzero(groups < 0)]
+        grouped = np.flatnonzero(groups >= 0)
+        for group in np.unique(groups[grouped]):
+            members.append(grouped[groups[grouped] == group])
+
+    sums = np.array([mu[unit].sum() for unit in members], dtype=float)
+    sizes = np.array([len(unit) for unit in members], dtype=np.int64)
+    return members, sums, sizes
+
+
+def _assign(
+    sums: np.ndarray, sizes: np.ndarray, lobbies: int, capacity: int
+) -> np.ndarray:
+    """Assigns each unit to a lobby, largest and strongest units first, each one to
+    the emptiest lobby it fits in, then the weakest."""
+    limit = min(capacity, -(-int(sizes.sum()) // lobbies))
+    lobby_sums = np.zeros(lobbies)
+    lobby_counts = np.zeros(lobbies, dtype=np.int64)
+    assignment = np.empty(len(sums), dtype=np.int64)
+    for unit in np.lexsort((-sums / sizes, -sizes)):
+        fits = np.flatnonzero(lobby_counts + sizes[unit] <= limit)
+        if not len(fits):
+            fits = np.flatnonzero(lobby_counts + sizes[unit] <= capacity)
+        if not len(fits):
+            raise ValueError(
+                f"The drivers can't be split into {lobbies} lobbies of at most "
+                f"{capacity} drivers while keeping their groups together."
+            )
+        lobby = fits[np.lexsort((lobby_sums[fits], lobby_counts[fits]))[0]]
+        assignment[unit] = lobby
+        lobby_sums[lobby] += sums[unit]
+        lobby_counts[lobby] += sizes[unit]
+    return assignment
+
+
+def _improve(
+    assignment: np.ndarray,
+    sums: np.ndarray,
+    sizes: np.ndarray,
+    lobbies: int,
+    max_iterations: int,
+) -> np.ndarray:
+    """Swaps units of the same size between lobbies, or moves units to lobbies which
+    don't become the largest or smallest by receiving them, as long as the squared
+    deviation of the lobbies' mean skills from the overall mean goes down. The best
+    swap or move is found among all of them at once, and made, at each iteration."""
+    assignment = assignment.copy()
+    overall = sums.sum() / sizes.sum()
+    same_size = sizes[:, np.newaxis] == sizes[np.newaxis, :]
+    # Difference in skill between each pair of units, from the first one's lobby's
+    # point of view when they are swapped.
+    gains = sums[np.newaxis, :] - sums[:, np.newaxis]
+    targets = np.arange(lobbies)
+
+    for _ in range(max_iterations):
+        lobby_sums = np.bincount(assignment, weights=sums, minlength=lobbies)
+        lobby_counts = np.bincount(assignment, weights=sizes, minlength=lobbies)
+        a = assignment[:, np.newaxis]
+        b = assignment[np.newaxis, :]
+        with np.errstate(invalid="ignore"):
+            deviations = lobby_sums / lobby_counts - overall
+            swaps = (
+                (deviations[a] + gains / lobby_counts[a]) ** 2
+                - deviations[a] ** 2
+                + (deviations[b] - gains / lobby_counts[b]) ** 2
+                - deviations[b] ** 2
+            )
+        swaps[~same_size | (a == b)] = np.inf
+
+        # Moves can only swap the sizes of the two lobbies, so the range of lobby
+        # sizes never widens.
+        counts_from = lobby_counts[assignment][:, np.newaxis] - sizes[:, np.newaxis]
+        counts_to = lobby_counts[np.newaxis, :] + sizes[:, np.newaxis]
+        movable = (
+            (counts_from >= lobby_counts.min())
+            & (counts_to <= lobby_counts.max())
+            & (targets[np.newaxis, :] != assignment[:, np.newaxis])
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means_from = (lobby_sums[assignment] - sums)[:, np.newaxis] / counts_from
+            means_to = (lobby_sums + sums[:, np.newaxis]) / counts_to
+            moves = (
+                (means_from - overall) ** 2
+                + (means_to - overall) ** 2
+                - deviations[assignment][:, np.newaxis] ** 2
+                - deviations[np.newaxis, :] ** 2
+            )
+        moves[~movable] = np.inf
+
+        # Empty lobbies have no mean skill.
+        swaps[np.isnan(swaps)] = np.inf
+        moves[np.isnan(moves)] = np.inf
+
+        swap = np.unravel_index(np.argmin(swaps), swaps.shape)
+        move = np.unravel_index(np.argmin(moves), moves.shape)
+        if min(swaps[swap], moves[move]) > -MIN_IMPROVEMENT:
+            break
+
+        if swaps[swap] <= moves[move]:
+            u, v = swap
+            assignment[u], assignment[v] = assignment[v], assignment[u]
+        else:
+            u, lobby = move
+            assignment[u] = lobby
+    return assignment
+
+
+def split_lobbies(
+    driver_ids: Sequence[int],
+    mu: np.ndarray,
+    capacity: int,
+    groups: np.ndarray | None = None,
+    lobbies: int | None = None,
+    max_iterations: int = MAX_ITERATIONS,
+) -> Lobbies:
+    """Splits the drivers into lobbies, keeping the mean predicted skill of the lobbies
+    as close to each other as possible.
+
+    Drivers are first dealt to the lobbies, strongest first, always to the emptiest
+    lobby, then drivers (or whole groups of drivers) are swapped or moved between
+    lobbies for as long as the lobbies' mean skills get closer to the overall one.
+    Lobbies are filled evenly, and swaps and moves never widen the range of their
+    sizes.
+
+    Args:
+        driver_ids (Sequence[int]): IDs of the drivers to split.
+        mu (np.ndarray): Mean of each driver's skill.
+        capacity (int): Maximum number of drivers in a lobby.
+        groups (np.ndarray | None): Group of each driver, such as their team's ID.
+            Drivers in the same group always end up in the same lobby, except the
+            ones in group -1. Drivers aren't grouped by default.
+        lobbies (int | None): Number of lobbies. By default, the least number of
+            lobbies the drivers fit in.
+        max_iterations (int): Maximum number of swaps and moves made.
+
+    Raises:
+        ValueError: If the drivers can't be split into the lobbies with the given
+            capacity.
+
+    Returns:
+        Lobbies: The drivers in each lobby.
+    """
+    ids = np.asarray(driver_ids, dtype=np.int64)
+    mu = np.asarray(mu, dtype=float)
+    if capacity < 1:
+        raise ValueError("Lobbies must have room for at least one driver.")
+    if lobbies is None:
+        lobbies = max(1, -(-len(ids) // capacity))
+    if lobbies * capacity < len(ids):
+        raise ValueError(f"{len(ids)} drivers don't fit in {lobbies} lobbies.")
+    if not len(ids):
+        return Lobbies(driver_ids=(), mean_skills=np.zeros(0))
+
+    members, sums, sizes = _units(mu, groups)
+    assignment = _assign(sums, sizes, lobbies, capacity)
+    if lobbies > 1:
+        assignment = _improve(assignment, sums, sizes, lobbies, max_iterations)
+
+    driver_lobbies = np.empty(len(ids), dtype=np.int64)
+    for unit, lobby in zip(members, assignment.tolist()):
+        driver_lobbies[unit] = lobby
+
+    split = []
+    for lobby in range(lobbies):
+        indexes = np.flatnonzero(driver_lobbies == lobby)
+        indexes = indexes[np.argsort(-mu[indexes], kind="stable")]
+        split.append((ids[indexes], mu[indexes].mean() if len(indexes) else np.nan))
+    split.sort(key=lambda lobby: -lobby[1])
+
+    return Lobbies(
+        driver_ids=tuple(lobby_ids for lobby_ids, _ in split),
+        mean_skills=np.array([mean for _, mean in split]),
+    )
@@ -7,26 +7,26 @@ from __future__ import annotations
 
 import datetime
 import enum
-import json
 import os
-from collections import defaultdict
 from datetime import datetime as dt
 from datetime import time, timedelta
 from decimal import Decimal
-from typing import Any, DefaultDict, Optional
+from typing import Iterable, Optional
 
-from cachetools import TTLCache, cached
 from sqlalchemy import (
     BigInteger,
     Boolean,
     CheckConstraint,
+    Computed,
     Date,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Interval,
+    LargeBinary,
     Numeric,
     SmallInteger,
     String,
@@ -34,6 +34,7 @@ from sqlalchemy import (
     UniqueConstraint,
     func,
 )
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -41,6 +42,9 @@ from sqlalchemy.orm import (
     relationship,
 )
 
+from head_to_head import HeadToHeadMatrix
+from points import CompiledPointSystem, compile_point_system
+
 DOMAIN = os.environ.get("ZONE")
 SUBDOMAIN = os.environ.get("SUBDOMAIN")
 IMAGE_DIR_URL = f"https://{SUBDOMAIN + '.' if SUBDOMAIN else ''}{DOMAIN}/images/"
@@ -50,6 +54,13 @@ CIRCUIT_LOGO_DIR_URL = (
 K = Decimal("3")
 
 
+def format_laptime(ms: int) -> str:
+    """Formats a laptime given in milliseconds as m:ss.mmm."""
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{minutes}:{seconds:02}.{ms:03}"
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -175,7 +186,12 @@ class PointSystem(Base):
 
     @property
     def point_system(self) -> list[float]:
-        return json.loads(self._point_system)
+        return self.compiled.table[1:].tolist()
+
+    @property
+    def compiled(self) -> CompiledPointSystem:
+        """Lookup table for this point system, parsed only once per point system."""
+        return compile_point_system(self.id, self._point_system)
 
 
 class Permission(Base):
@@ -439,111 +455,6 @@ class Category(Base):
         """Returns list of drivers who are currently competing in this category."""
         return [driver for driver in self.drivers if not driver.left_on]
 
-    def _sort_drivers(
-        self, standings: dict[Driver, tuple[Decimal, int, int]]
-    ) -> dict[Driver, Decimal]:
-        sorted_standings = sorted(
-            standings.items(),
-            key=lambda x: (x[1][0], -x[1][1] / x[1][2], -x[1][2]),
-        )
-
-        return {driver: values[0] for driver, values in sorted_standings}
-
-    def standings(self, n: int = 0) -> dict[Driver, tuple[float, int]]:
-        """Calculates the current standings in this category.
-
-        Args:
-            n (Optional[int]): Number of races to go back. (Must be 0 or negative)
-
-        Returns:
-            DefaultDict[Driver, [float]]: DefaultDict containing Drivers as keys
-                and a list containing the total points and the number of positions
-                gained by the driver in the championship standings in the last
-                completed_rounds.
-        """
-
-        driver_points_in_last_round: DefaultDict[Driver, float] = defaultdict(lambda: 0)
-
-        last_completed_round = self.last_completed_round()
-        if not last_completed_round:
-            return {driver.driver: (0, 0) for driver in self.drivers}
-
-        # Sum points earned in races
-        for race_result in self.race_results:
-            if race_result.round_id == last_completed_round.id:
-                break
-            driver_points_in_last_round[race_result.driver] += race_result.points_earned
-        # Sum points earned in qualifying sessions
-        for quali_result in self.qualifying_results:
-            if quali_result.round_id == last_completed_round.id:
-                break
-            driver_points_in_last_round[
-                quali_result.driver
-            ] += quali_result.points_earned
-
-        driver_positions_up_to_last_round = sorted(
-            driver_points_in_last_round.keys(),
-            key=lambda d: driver_points_in_last_round[d],
-            reverse=True,
-        )
-        results: dict[Driver, tuple[float, int]] = {}
-
-        for driver in self.drivers:
-            delta = 0
-            if driver.driver in driver_positions_up_to_last_round:
-                delta = driver.position - (
-                    driver_positions_up_to_last_round.index(driver.driver) + 1
-                )
-            results[driver.driver] = (driver.points, delta)
-
-        return results
-
-    def standings_with_results(self):
-        """Calculates the current standings in this category.
-
-        Returns:
-            list[list[list[RaceResult], int]]: The first level of nesting contains
-                lists: each of those lists contains a list of RaceResult s and an
-                integer representing the points tally the RaceResults amount to.
-        """
-
-        results: DefaultDict[Driver, list[Any]] = defaultdict(lambda: [[], 0])
-
-        for race_result in self.race_results:
-            results[race_result.driver][0].append(race_result)
-            points_earned = race_result.points_earned
-            results[race_result.driver][1] += points_earned
-
-        for qualifying_result in self.qualifying_results:
-            results[qualifying_result.driver][1] += qualifying_result.points_earned
-
-        return sorted(list(results.values()), key=lambda x: x[1], reverse=True)
-
-    def points_per_round(self):
-        """Creates a list containing a list for each round which contains the total amount
-        of points each driver had after that round.
-        """
-        result: list[list[float]] = []
-        drivers = [driver.driver.full_name for driver in self.drivers]
-        driver_map = defaultdict.fromkeys(drivers, float(0))
-        result.append(["Tappa"] + drivers)  # type: ignore
-        for number, championship_round in enumerate(self.rounds, start=1):
-            if not championship_round.is_completed:
-                continue
-
-            result.append([number])
-
-            for race_result in championship_round.race_results:
-                driver_map[race_result.driver.full_name] += race_result.points_earned
-            for qualifying_result in championship_round.qualifying_results:
-                driver_map[
-                    qualifying_result.driver.full_name
-                ] += qualifying_result.points_earned
-
-            result[number].extend(driver_map.values())
-
-        return result
-
 
 class Round(Base):
     """Represents a round in the calendar of a specific category.
@@ -565,6 +476,10 @@ class Round(Base):
         race_results (list[RaceResult]): All the race results registered to the round.
         qualifying_results (list[QualifyingResult]): All the qualifying results registered to
             the round.
+        standings (list[StandingsSnapshot]): The drivers' standings as they were at the end
+            of the round. [Ordered by position]
+        circuit_records (list[CircuitRecord]): Records set on the round's circuit
+            configuration, one for each championship held on it.
     """
 
     __tablename__ = "rounds"
@@ -598,6 +513,14 @@ class Round(Base):
         back_populates="round"
     )
     participants: Mapped[list[RoundParticipant]] = relationship(back_populates="round")
+    standings: Mapped[list[StandingsSnapshot]] = relationship(
+        back_populates="round", order_by="StandingsSnapshot.position"
+    )
+    circuit_records: Mapped[list[CircuitRecord]] = relationship(
+        primaryjoin="and_(Round.circuit_id == foreign(CircuitRecord.circuit_id), "
+        "Round.configuration_id == foreign(CircuitRecord.configuration_id))",
+        viewonly=True,
+    )
 
     def __repr__(self) -> str:
         return f"Round(circuit={self.circuit.abbreviated_name}, date={self.date}, is_completed={self.is_completed})"
@@ -615,6 +538,19 @@ class Round(Base):
             f"<b>Tracciato:</b> <i>{self.circuit.name}</i>\n\n"
         )
 
+        records = ""
+        for kind, session_name in (("quali", "qualifica"), ("race", "gara")):
+            record = CircuitRecord.best(self.circuit_records, kind)
+            if record:
+                laptime = format_laptime(getattr(record, f"{kind}_laptime"))
+                driver = getattr(record, f"{kind}_driver")
+                records += (
+                    f"<b>Record attuale in {session_name}:</b> "
+                    f"<i>{laptime} ({driver.psn_id})</i>\n"
+                )
+        if records:
+            message += records + "\n"
+
         for session in self.sessions:
             if session.duration:
                 race_length = (
@@ -1063,6 +999,12 @@ class Driver(Base):
         rre_id (int | None): The driver's RaceRoom ID.
         psn_id (str | None): The driver's Playstation ID (max 16 characters).
         telegram_id (str): The driver's telegram ID.
+        mu (Decimal): Mean of the driver's TrueSkill rating in the game of the last
+            race they finished. Ratings in each game are in DriverRating.
+        sigma (Decimal): Standard deviation of the driver's TrueSkill rating in the
+            game of the last race they finished.
+        conservative_rating (Decimal): The driver's rating, mu - K * sigma. Computed
+            and indexed by the database, so drivers can be ranked by rating.
 
         championships (list[DriverChampionship]): Championships the driver has participated in.
         contracts (list[DriverContract]): All the contracts the driver has signed.
@@ -1073,6 +1015,8 @@ class Driver(Base):
         qualifying_results (list[Protest]): Results obtained by the driver in qualifying sessions
             during his career.
         roles (list[DriverRole]): Roles covered by this driver.
+        championship_stats (list[DriverStats]): Career stats of the driver in each
+            championship they have raced in.
     """
 
     __tablename__ = "drivers"
@@ -1094,6 +1038,11 @@ class Driver(Base):
     sigma: Mapped[Decimal] = mapped_column(
         Numeric(precision=7, scale=5), nullable=False, default=25 / 3
     )
+    conservative_rating: Mapped[Decimal] = mapped_column(
+        Numeric(precision=8, scale=5),
+        Computed(f"mu - {K} * sigma", persisted=True),
+        index=True,
+    )
     _telegram_id: Mapped[str | None] = mapped_column(
         "telegram_id", String(21), unique=True
     )
@@ -1115,6 +1064,9 @@ class Driver(Base):
         back_populates="driver"
     )
     roles: Mapped[list[DriverRole]] = relationship(back_populates="driver")
+    championship_stats: Mapped[list[DriverStats]] = relationship(
+        back_populates="driver"
+    )
 
     def __repr__(self) -> str:
         return f"Driver(full_name={self.full_name}, driver_id={self.id})"
@@ -1176,8 +1128,7 @@ class Driver(Base):
     @property
     def rating(self) -> Decimal:
         """Current TrueSkill rating."""
-        k = Decimal(25) / (Decimal(25) / Decimal(3))
-        return self.mu - k * self.sigma
+        return self.mu - K * self.sigma
 
     @property
     def telegram_id(self) -> int | None:
@@ -1268,88 +1219,11 @@ class Driver(Base):
             return False
         return False
 
-    @cached(cache=TTLCache(maxsize=50, ttl=240))  # type: ignore
     def stats(self) -> dict[str, int | float]:
-        """Calculates the number of wins, podiums and poles achieved by the driver."""
-
-        keys = (
-            "wins",
-            "podiums",
-            "fastest_laps",
-            "poles",
-            "races_completed",
-            "avg_race_position",
-            "avg_quali_position",
-            "race_avg_gap_perc",
-            "quali_avg_gap_perc",
-        )
-
-        statistics: dict[str, int | float] = dict.fromkeys(keys, 0)
-
-        if not self.race_results:
-            return statistics
-
-        positions = 0
-        race_gaps = 0
-        missed_races = 0
-        for race_result in self.race_results:
-            if race_result.status == SessionCompletionStatus.dns:
-                missed_races += 1
-                continue
-
-            if race_result.fastest_lap:
-                statistics["fastest_laps"] += 1
-            if race_result.status == SessionCompletionStatus.finished:
-                positions += race_result.position
-                race_gaps += (
-                    race_result.gap_to_first
-                    / (race_result.total_racetime - race_result.gap_to_first)
-                ) * 100
-            if race_result.position <= 3:
-                statistics["podiums"] += 1
-                if race_result.position == 1:
-                    statistics["wins"] += 1
-
-        quali_positions = 0
-        quali_gaps = 0
-        missed_qualis = 0
-
-        for quali_result in self.qualifying_results:
-            if not quali_result:
-                continue
-
-            if quali_result.position == 1:
-                statistics["poles"] += 1
-            if quali_result.status == SessionCompletionStatus.finished:
-                quali_positions += quali_result.position
-                quali_gaps += (
-                    quali_result.gap_to_first
-                    / (quali_result.laptime - quali_result.gap_to_first)
-                    * 100
-                )
-            else:
-                missed_qualis += 1
-
-        statistics["races_completed"] = len(self.race_results) - missed_races
-
-        if statistics["races_completed"]:
-            statistics["avg_race_position"] = round(
-                positions / statistics["races_completed"], 2
-            )
-            statistics["race_avg_gap_perc"] = round(
-                race_gaps / statistics["races_completed"], 2
-            )
-
-        quali_sessions_completed = len(self.qualifying_results) - missed_qualis
-        if quali_positions:
-            statistics["avg_quali_position"] = round(
-                quali_positions / quali_sessions_completed, 2
-            )
-            statistics["quali_avg_gap_perc"] = round(
-                quali_gaps / quali_sessions_completed, 2
-            )
-
-        return statistics
+        """Returns the number of wins, podiums and poles achieved by the driver in their
+        career, and their average positions and gaps, from the stats they have in each
+        championship."""
+        return DriverStats.summary(self.championship_stats)
 
     def has_permission(self, permission_id: int) -> bool:
         """Given a permission ID, returns True if the driver has a role that
@@ -1360,22 +1234,18 @@ class Driver(Base):
                     return True
         return False
 
-    def stats_telegram_message(self) -> str:
+    def stats_telegram_message(self, rating_change: float | None = None) -> str:
+        """Returns the driver's profile message.
+
+        Args:
+            rating_change (float | None): How much the driver's rating changed in their
+                last race, shown next to the rating if given.
+        """
 
         statistics = self.stats()
 
-        current_category = self.current_category()
-        rnd = current_category.category.penultimate_completed_round()
-        previous_rating = 0
-        if rnd:
-            for result in rnd.long_race.race_results:
-                if result.driver_id == self.id:
-                    if result.mu and result.sigma:
-                        previous_rating = result.mu - K * result.sigma
-                    break
-
-        if previous_rating:
-            diff = round(self.rating - previous_rating, 2)
+        if rating_change is not None:
+            diff = round(rating_change, 2)
             diff_text = f"↓{abs(diff)}" if diff < 0 else f"↑{abs(diff)}"
             driver_rating_text = (
                 f"<b>Driver Rating</b>: <i>{round(self.rating, 2)} {diff_text}</i>\n"
@@ -1402,6 +1272,141 @@ class Driver(Base):
         )
 
 
+class DriverRating(Base):
+    """Represents the rating of a driver in one of the games categories race in.
+    Each game has a rating pool of its own, since skill doesn't carry over from one
+    game to another.
+
+    Attributes:
+        driver_id (int): ID of the driver the rating belongs to.
+        game_id (int): ID of the game the rating refers to.
+        mu (Decimal): Mean of the driver's TrueSkill rating in the game.
+        sigma (Decimal): Standard deviation of the driver's TrueSkill rating in the
+            game.
+        conservative_rating (Decimal): mu - K * sigma. Computed and indexed by the
+            database, so drivers can be ranked by rating in each game.
+
+        driver (Driver): Driver the rating belongs to.
+        game (Game): Game the rating refers to.
+    """
+
+    __tablename__ = "driver_ratings"
+    __table_args__ = (
+        Index("ix_driver_ratings_game_rating", "game_id", "conservative_rating"),
+    )
+
+    driver_id: Mapped[int] = mapped_column(ForeignKey(Driver.id), primary_key=True)
+    game_id: Mapped[int] = mapped_column(ForeignKey(Game.id), primary_key=True)
+    mu: Mapped[Decimal] = mapped_column(
+        Numeric(precision=7, scale=5), nullable=False, default=25
+    )
+    sigma: Mapped[Decimal] = mapped_column(
+        Numeric(precision=7, scale=5), nullable=False, default=25 / 3
+    )
+    conservative_rating: Mapped[Decimal] = mapped_column(
+        Numeric(precision=8, scale=5),
+        Computed(f"mu - {K} * sigma", persisted=True),
+    )
+
+    driver: Mapped[Driver] = relationship()
+    game: Mapped[Game] = relationship()
+
+    def __repr__(self) -> str:
+        return f"DriverRating(driver_id={self.driver_id}, game_id={self.game_id})"
+
+    @property
+    def rating(self) -> Decimal:
+        """Current TrueSkill rating in the game."""
+        return self.mu - K * self.sigma
+
+
+class DriverStats(Base):
+    """Aggregated results of a driver in a championship. Rows are rebuilt from the
+    results whenever they are saved or penalties are applied or reversed, so that
+    career stats can be read without going through every result of the driver.
+
+    Attributes:
+        driver_id (int): ID of the driver the stats belong to.
+        championship_id (int): ID of the championship the results were obtained in.
+        wins (int): Races won.
+        podiums (int): Races finished in the top three.
+        fastest_laps (int): Fastest laps scored.
+        poles (int): Qualifying sessions finished in first position.
+        races_completed (int): Races the driver started.
+        race_position_sum (int): Sum of the positions of the races the driver finished.
+        race_gap_sum (float): Sum of the gaps to the winner of the races the driver
+            finished, as a percentage of the winner's race time.
+        qualis_completed (int): Qualifying sessions the driver finished.
+        quali_position_sum (int): Sum of the positions of the qualifying sessions the
+            driver finished.
+        quali_gap_sum (float): Sum of the gaps to the pole sitter of the qualifying
+            sessions the driver finished, as a percentage of the pole lap time.
+
+        driver (Driver): Driver the stats belong to.
+        championship (Championship): Championship the results were obtained in.
+    """
+
+    __tablename__ = "driver_stats"
+
+    driver_id: Mapped[int] = mapped_column(ForeignKey(Driver.id), primary_key=True)
+    championship_id: Mapped[int] = mapped_column(
+        ForeignKey(Championship.id), primary_key=True
+    )
+    wins: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    podiums: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    fastest_laps: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    poles: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    races_completed: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=0
+    )
+    race_position_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    race_gap_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    qualis_completed: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=0
+    )
+    quali_position_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    quali_gap_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+
+    driver: Mapped[Driver] = relationship(back_populates="championship_stats")
+    championship: Mapped[Championship] = relationship()
+
+    def __repr__(self) -> str:
+        return (
+            f"DriverStats(driver_id={self.driver_id}, "
+            f"championship_id={self.championship_id})"
+        )
+
+    @staticmethod
+    def summary(rows: Iterable[DriverStats]) -> dict[str, int | float]:
+        """Adds up the given stats and returns the number of wins, podiums and poles
+        achieved, and the average positions and gaps."""
+        rows = list(rows)
+        statistics: dict[str, int | float] = {
+            key: sum(getattr(row, key) for row in rows)
+            for key in ("wins", "podiums", "fastest_laps", "poles", "races_completed")
+        }
+        races = statistics["races_completed"]
+        qualis = sum(row.qualis_completed for row in rows)
+        race_positions = sum(row.race_position_sum for row in rows)
+        quali_positions = sum(row.quali_position_sum for row in rows)
+
+        statistics["avg_race_position"] = (
+            round(race_positions / races, 2) if races else 0
+        )
+        statistics["avg_quali_position"] = (
+            round(quali_positions / qualis, 2) if quali_positions else 0
+        )
+        statistics["race_avg_gap_perc"] = (
+            round(sum(row.race_gap_sum for row in rows) / races, 2) if races else 0
+        )
+        statistics["quali_avg_gap_perc"] = (
+            round(sum(row.quali_gap_sum for row in rows) / qualis, 2)
+            if quali_positions
+            else 0
+        )
+        return statistics
+
+
 class Team(Base):
     """Represents a team.
 
@@ -1647,6 +1652,225 @@ class DriverCategory(Base):
         return f"DriverCategory(driver_id={self.driver_id}, category_id={self.category_id})"
 
 
+class StandingsSnapshot(Base):
+    """Represents a driver's position in the standings of a category at the end of a round.
+    Snapshots are rebuilt whenever results are saved or penalties are applied or reversed,
+    so that standings can be read without going through every result in the category.
+
+    Attributes:
+        points (float): Points tally of the driver after the round.
+        position (int): Championship position of the driver after the round.
+        delta (int): Positions lost by the driver in this round. Negative if positions
+            were gained.
+
+        round_id (int): Unique ID of the round the snapshot was taken at.
+        driver_id (int): Unique ID of the driver the snapshot belongs to.
+        category_id (int): Unique ID of the category the snapshot belongs to.
+
+        round (Round): Round the snapshot was taken at.
+        driver (Driver): Driver the snapshot belongs to.
+    """
+
+    __tablename__ = "standings_snapshots"
+
+    round_id: Mapped[int] = mapped_column(ForeignKey(Round.id), primary_key=True)
+    driver_id: Mapped[int] = mapped_column(ForeignKey(Driver.id), primary_key=True)
+    category_id: Mapped[int] = mapped_column(
+        ForeignKey(Category.id), nullable=False, index=True
+    )
+    points: Mapped[float] = mapped_column(Float, default=0, nullable=False)
+    position: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    delta: Mapped[int] = mapped_column(SmallInteger, default=0, nullable=False)
+
+    round: Mapped[Round] = relationship(back_populates="standings")
+    driver: Mapped[Driver] = relationship(lazy="joined")
+
+    def __repr__(self) -> str:
+        return (
+            f"StandingsSnapshot(round_id={self.round_id}, driver_id={self.driver_id}, "
+            f"points={self.points}, position={self.position})"
+        )
+
+
+class HeadToHead(Base):
+    """Represents the head-to-head records of every pair of drivers in a category.
+    Records are kept as the arrays of a HeadToHeadMatrix, compressed in a single
+    column. Sessions are added to them when results are saved, and they are rebuilt
+    when time penalties are applied or reversed.
+
+    Attributes:
+        category_id (int): ID of the category the records refer to.
+        data (bytes): Arrays of the matrix, as returned by HeadToHeadMatrix.to_bytes.
+
+        category (Category): Category the records refer to.
+    """
+
+    __tablename__ = "head_to_heads"
+
+    category_id: Mapped[int] = mapped_column(
+        ForeignKey(Category.id), primary_key=True
+    )
+    # BLOB is capped at 64 KB on MySQL, too little for the larger categories.
+    data: Mapped[bytes] = mapped_column(
+        LargeBinary().with_variant(MEDIUMBLOB, "mysql"), nullable=False
+    )
+
+    category: Mapped[Category] = relationship()
+
+    def __repr__(self) -> str:
+        return f"HeadToHead(category_id={self.category_id})"
+
+    @property
+    def matrix(self) -> HeadToHeadMatrix:
+        return HeadToHeadMatrix.from_bytes(self.data)
+
+    @matrix.setter
+    def matrix(self, matrix: HeadToHeadMatrix) -> None:
+        self.data = matrix.to_bytes()
+
+
+class CircuitRecord(Base):
+    """Represents the fastest laps set on a circuit configuration during a
+    championship, in qualifying and in the races. Records are updated when the
+    results of a round are saved. All-time records are the fastest among those of
+    every championship.
+
+    Race records only come from RaceRoom results: results read from PSN screenshots
+    don't contain lap times, so their best_laptime is never set.
+
+    Attributes:
+        circuit_id (int): ID of the circuit the records were set on.
+        configuration_id (int): ID of the configuration of the circuit.
+        championship_id (int): ID of the championship the records were set in.
+        quali_laptime (int | None): Fastest qualifying lap (ms).
+        quali_driver_id (int | None): ID of the driver who set it.
+        quali_round_id (int | None): ID of the round it was set in.
+        race_laptime (int | None): Fastest lap set in a race (ms).
+        race_driver_id (int | None): ID of the driver who set it.
+        race_round_id (int | None): ID of the round it was set in.
+
+        championship (Championship): Championship the records were set in.
+        quali_driver (Driver | None): Holder of the qualifying record.
+        race_driver (Driver | None): Holder of the race record.
+    """
+
+    __tablename__ = "circuit_records"
+
+    circuit_id: Mapped[int] = mapped_column(ForeignKey(Circuit.id), primary_key=True)
+    configuration_id: Mapped[int] = mapped_column(
+        ForeignKey(CircuitConfiguration.id), primary_key=True
+    )
+    championship_id: Mapped[int] = mapped_column(
+        ForeignKey(Championship.id), primary_key=True
+    )
+    quali_laptime: Mapped[int | None] = mapped_column(Integer)
+    quali_driver_id: Mapped[int | None] = mapped_column(ForeignKey(Driver.id))
+    quali_round_id: Mapped[int | None] = mapped_column(ForeignKey(Round.id))
+    race_laptime: Mapped[int | None] = mapped_column(Integer)
+    race_driver_id: Mapped[int | None] = mapped_column(ForeignKey(Driver.id))
+    race_round_id: Mapped[int | None] = mapped_column(ForeignKey(Round.id))
+
+    championship: Mapped[Championship] = relationship()
+    quali_driver: Mapped[Driver | None] = relationship(
+        foreign_keys=[quali_driver_id], lazy="joined"
+    )
+    race_driver: Mapped[Driver | None] = relationship(
+        foreign_keys=[race_driver_id], lazy="joined"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"CircuitRecord(circuit_id={self.circuit_id}, "
+            f"configuration_id={self.configuration_id}, "
+            f"championship_id={self.championship_id})"
+        )
+
+    def set_record(
+        self, kind: str, laptime: int, driver_id: int, round_id: int
+    ) -> bool:
+        """Sets the qualifying ("quali") or race ("race") record, if the laptime
+        beats the current one. Returns True if it did."""
+        current = getattr(self, f"{kind}_laptime")
+        if current is not None and current <= laptime:
+            return False
+        setattr(self, f"{kind}_laptime", laptime)
+        setattr(self, f"{kind}_driver_id", driver_id)
+        setattr(self, f"{kind}_round_id", round_id)
+        return True
+
+    @staticmethod
+    def best(records: Iterable[CircuitRecord], kind: str) -> CircuitRecord | None:
+        """Returns the record with the fastest qualifying ("quali") or race ("race")
+        lap among the given ones, None if none of them has one."""
+        return min(
+            (record for record in records if getattr(record, f"{kind}_laptime")),
+            key=lambda record: getattr(record, f"{kind}_laptime"),
+            default=None,
+        )
+
+
+class PointsLedgerKind(enum.Enum):
+    result = "result"
+    fastest_lap = "fastest_lap"
+    penalty = "penalty"
+
+
+class PointsLedgerEntry(Base):
+    """Represents an amount of points gained or lost by a driver, and by the team they
+    were racing for. The ledger is append-only: when the points given by a result or
+    a penalty change, an entry containing the difference is added rather than
+    modifying the existing ones. Driver and team points tallies are the sum of
+    their entries.
+
+    Attributes:
+        id (int): Automatically generated unique ID.
+        kind (PointsLedgerKind): What the points were given for.
+        points (float): Points gained. (Negative if lost)
+        created_at (datetime): When the entry was added.
+        penalty_id (int | None): ID of the penalty the points were deducted with.
+            Not a foreign key, since entries outlive reversed penalties.
+
+        championship_id (int): Unique ID of the championship the points count towards.
+        category_id (int): Unique ID of the category the points count towards.
+        round_id (int): Unique ID of the round the points were given in.
+        session_id (int): Unique ID of the session the points were given in.
+        driver_id (int): Unique ID of the driver the points were given to.
+        team_id (int | None): Unique ID of the team the driver was racing for.
+    """
+
+    __tablename__ = "points_ledger"
+
+    __table_args__ = (
+        Index("ix_points_ledger_category_driver", "category_id", "driver_id"),
+        Index("ix_points_ledger_championship_team", "championship_id", "team_id"),
+    )
+
+    id: Mapped[int] = mapped_column("entry_id", Integer, primary_key=True)
+    kind: Mapped[PointsLedgerKind] = mapped_column(
+        Enum(PointsLedgerKind, name="points_ledger_kind"), nullable=False
+    )
+    points: Mapped[float] = mapped_column(Float, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=dt.now
+    )
+    penalty_id: Mapped[int | None] = mapped_column(Integer)
+
+    championship_id: Mapped[int] = mapped_column(
+        ForeignKey(Championship.id), nullable=False
+    )
+    category_id: Mapped[int] = mapped_column(ForeignKey(Category.id), nullable=False)
+    round_id: Mapped[int] = mapped_column(ForeignKey(Round.id), nullable=False)
+    session_id: Mapped[int] = mapped_column(ForeignKey(Session.id), nullable=False)
+    driver_id: Mapped[int] = mapped_column(ForeignKey(Driver.id), nullable=False)
+    team_id: Mapped[int | None] = mapped_column(ForeignKey(Team.id))
+
+    def __repr__(self) -> str:
+        return (
+            f"PointsLedgerEntry(driver_id={self.driver_id}, round_id={self.round_id}, "
+            f"kind={self.kind.value}, points={self.points})"
+        )
+
+
 class QualifyingResult(Base):
     """Represents a single result made by a driver in a qualifying Session.
 
@@ -1707,7 +1931,7 @@ class QualifyingResult(Base):
         if self.status != SessionCompletionStatus.finished:
             return 0
 
-        return self.session.point_system.point_system[self.position - 1]
+        return self.session.point_system.compiled.points_for(self.position)
 
 
 class TeamChampionship(Base):
@@ -1751,7 +1975,12 @@ class RaceResult(Base):
         fastest_lap (bool): True if the driver scored the fastest lap, False by default.
         gap_to_first (int): Difference between the driver's race time
             and the class winner's race time.
-        total_racetime (int): Total time the driver took to complete the race.
+        total_racetime (int): Total time the driver took to complete the race,
+            time penalties included.
+        original_racetime (int | None): Total race time as it was recorded, before any
+            time penalty was added to it.
+        best_laptime (int | None): Fastest lap the driver set in the race. (None if it
+            wasn't recorded, as in results read from screenshots)
 
         driver_id (int): Unique ID of the driver the result is registered to.
         round_id (int): Unique ID of the round the result is registered to.
@@ -1781,6 +2010,8 @@ class RaceResult(Base):
     )
     gap_to_first: Mapped[int | None] = mapped_column(Integer)
     total_racetime: Mapped[int | None] = mapped_column(Integer)
+    original_racetime: Mapped[int | None] = mapped_column(Integer)
+    best_laptime: Mapped[int | None] = mapped_column(Integer)
     mu: Mapped[Decimal | None] = mapped_column(Numeric(precision=6, scale=3))
     sigma: Mapped[Decimal | None] = mapped_column(Numeric(precision=6, scale=3))
 
@@ -1821,7 +2052,7 @@ class RaceResult(Base):
             return 0
 
         return (
-            self.session.point_system.point_system[self.position - 1]
+            self.session.point_system.compiled.points_for(self.position)
             + self.fastest_lap_points
         )
 
@@ -1881,3 +2112,31 @@ class Reprimand(Base):
 
     id: Mapped[int] = mapped_column("reprimand_id", SmallInteger, primary_key=True)
     description: Mapped[str] = mapped_column(String(100))
+
+
+class CacheVersion(Base):
+    """Version counter for a group of cached query results, shared by every process
+    using the database. The version is bumped each time the data behind the cached
+    results changes.
+
+    key (str): Name of the group of cached results. E.g. "championship-3"
+    version (int): Incremented each time the cached results become stale.
+    """
+
+    __tablename__ = "cache_versions"
+
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class PendingAnalyticsRound(Base):
+    """Round whose changes haven't been mirrored into the analytics file yet.
+    Rows are deleted once a refresh mirrors the round, so a refresh which can't open
+    the file leaves them for the next one to retry.
+
+    round_id (int): ID of the round.
+    """
+
+    __tablename__ = "pending_analytics_rounds"
+
+    round_id: Mapped[int] = mapped_column(ForeignKey(Round.id), primary_key=True)
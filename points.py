@@ -0,0 +1,227 @@
+"""
+This module contains the points engine, which calculates the points earned in race and
+qualifying sessions for many results at once, instead of going through the
+points_earned properties one result at a time.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CompiledPointSystem:
+    """Immutable lookup table built from a PointSystem.
+
+    Attributes:
+        id (int): ID of the point system the table was built from.
+        table (np.ndarray): Read-only array where the element at index i contains the
+            points awarded for finishing in position i. Index 0 is always 0, so that
+            unclassified results can be looked up as position 0.
+    """
+
+    id: int
+    table: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.table) - 1
+
+    def points_for(self, position: int | None) -> float:
+        """Returns the points awarded for the given finishing position."""
+        if not position or position >= len(self.table):
+            return 0
+        return float(self.table[position])
+
+
+@lru_cache(maxsize=64)
+def compile_point_system(
+    point_system_id: int, point_system: str
+) -> CompiledPointSystem:
+    """Parses a point system string only once and returns it as a CompiledPointSystem.
+
+    Args:
+        point_system_id (int): ID of the point system.
+        point_system (str): JSON list containing the points for each position.
+
+    Returns:
+        CompiledPointSystem: The compiled lookup table.
+    """
+    table = np.zeros(len(json.loads(point_system)) + 1, dtype=np.float64)
+    table[1:] = json.loads(point_system)
+    table.flags.writeable = False
+    return CompiledPointSystem(id=point_system_id, table=table)
+
+
+def score(
+    point_systems: Sequence[CompiledPointSystem],
+    point_system_indexes: np.ndarray,
+    positions: np.ndarray,
+    finished: np.ndarray,
+    fastest_laps: np.ndarray,
+    fastest_lap_points: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculates the points earned by a batch of results in a single vectorized lookup.
+
+    Args:
+        point_systems (Sequence[CompiledPointSystem]): Point systems used by the results.
+        point_system_indexes (np.ndarray): Index in point_systems of the point system
+            used by each result.
+        positions (np.ndarray): Finishing position of each result. (0 if not classified)
+        finished (np.ndarray): True if the result has the finished status.
+        fastest_laps (np.ndarray): True if the result scored the fastest lap.
+        fastest_lap_points (np.ndarray): Points given for the fastest lap in the session
+            of each result.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Total points earned by each result (finishing
+            position + fastest lap) and the fastest lap points included in them.
+    """
+    if not len(positions):
+        return np.zeros(0), np.zeros(0)
+
+    width = max(len(point_system.table) for point_system in point_systems)
+    lookup = np.zeros((len(point_systems), width + 1))
+    for i, point_system in enumerate(point_systems):
+        lookup[i, : len(point_system.table)] = point_system.table
+
+    # Positions outside of the point system are mapped to the zero-filled last column.
+    positions = np.where((positions > 0) & (positions < width), positions, width)
+
+    fl_points = np.where(finished & fastest_laps, fastest_lap_points, 0).astype(float)
+    points = np.where(finished, lookup[point_system_indexes, positions], 0) + fl_points
+    return points, fl_points
+
+
+def results_points(results: Sequence[Any]) -> np.ndarray:
+    """Calculates the points earned by each of the given RaceResults and QualifyingResults,
+    fastest lap points included.
+
+    Args:
+        results (Sequence[RaceResult | QualifyingResult]): Results to calculate the
+            points of. They don't need to be persisted yet.
+
+    Returns:
+        np.ndarray: Points earned by each result, in the same order they were given in.
+    """
+    point_systems: dict[int, int] = {}
+    compiled: list[CompiledPointSystem] = []
+    sessions: dict[int, tuple[int, float]] = {}
+    indexes: list[int] = []
+    fastest_lap_points: list[float] = []
+
+    for result in results:
+        session = result.session
+        # Point systems are resolved once per session rather than once per result.
+        if id(session) not in sessions:
+            point_system = session.point_system
+            if point_system.id not in point_systems:
+                point_systems[point_system.id] = len(compiled)
+                compiled.append(point_system.compiled)
+            sessions[id(session)] = (
+                point_systems[point_system.id],
+                session.fastest_lap_points or 0,
+            )
+
+        index, session_fastest_lap_points = sessions[id(session)]
+        indexes.append(index)
+        fastest_lap_points.append(session_fastest_lap_points)
+
+    positions = [result.position or 0 for result in results]
+    finished = [result.status.name == "finished" for result in results]
+    fastest_laps = [getattr(result, "fastest_lap", False) for result in results]
+
+    points, _ = score(
+        compiled,
+        np.array(indexes, dtype=np.intp),
+        np.array(positions, dtype=np.intp),
+        np.array(finished, dtype=bool),
+        np.array(fastest_laps, dtype=bool),
+        np.array(fastest_lap_points, dtype=float),
+    )
+    return points
+
+
+@dataclass(frozen=True)
+class PointsTable:
+    """Points earned by every result of a session, round, category or championship,
+    stored as parallel arrays.
+
+    Attributes:
+        category_ids (np.ndarray): ID of the category of each result.
+        round_ids (np.ndarray): ID of the round of each result.
+        session_ids (np.ndarray): ID of the session of each result.
+        driver_ids (np.ndarray): ID of the driver of each result.
+        is_quali (np.ndarray): True if the result was obtained in a qualifying session.
+        points (np.ndarray): Points earned with each result, fastest lap included.
+        fastest_lap_points (np.ndarray): Fastest lap points earned with each result.
+    """
+
+    category_ids: np.ndarray
+    round_ids: np.ndarray
+    session_ids: np.ndarray
+    driver_ids: np.ndarray
+    is_quali: np.ndarray
+    points: np.ndarray
+    fastest_lap_points: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> PointsTable:
+        """Builds the table from rows containing, in order: category_id, round_id,
+        session_id, driver_id, is_quali, position, finished, fastest_lap,
+        fastest_lap_points, point_system_id and point_system."""
+
+        point_systems: dict[int, int] = {}
+        compiled: list[CompiledPointSystem] = []
+        for row in rows:
+            if row[9] not in point_systems:
+                point_systems[row[9]] = len(compiled)
+                compiled.append(compile_point_system(row[9], row[10]))
+
+        columns = list(zip(*rows)) if rows else [()] * 11
+        indexes = np.fromiter(
+            (point_systems[i] for i in columns[9]), dtype=np.intp, count=len(rows)
+        )
+        positions = np.array([p or 0 for p in columns[5]], dtype=np.intp)
+        finished = np.array(columns[6], dtype=bool)
+        fastest_laps = np.array(columns[7], dtype=bool)
+        fastest_lap_points = np.array(columns[8], dtype=float)
+
+        points, fl_points = score(
+            compiled, indexes, positions, finished, fastest_laps, fastest_lap_points
+        )
+        return cls(
+            category_ids=np.array(columns[0], dtype=np.int64),
+            round_ids=np.array(columns[1], dtype=np.int64),
+            session_ids=np.array(columns[2], dtype=np.int64),
+            driver_ids=np.array(columns[3], dtype=np.int64),
+            is_quali=np.array(columns[4], dtype=bool),
+            points=points,
+            fastest_lap_points=fl_points,
+        )
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def totals_by_driver(self) -> dict[int, float]:
+        """Returns the total points earned by each driver in the table."""
+        driver_ids, inverse = np.unique(self.driver_ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.points, minlength=len(driver_ids))
+        return dict(zip(driver_ids.tolist(), totals.tolist()))
+
+    def totals_by_round(self) -> dict[int, dict[int, float]]:
+        """Returns the points earned by each driver, grouped by round."""
+        keys = np.stack((self.round_ids, self.driver_ids), axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        totals = np.bincount(
+            inverse.ravel(), weights=self.points, minlength=len(unique_keys)
+        )
+
+        result: dict[int, dict[int, float]] = {}
+        for (round_id, driver_id), points in zip(unique_keys.tolist(), totals.tolist()):
+            result.setdefault(round_id, {})[driver_id] = points
+        return result
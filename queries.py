@@ -4,45 +4,101 @@ such as Protests, Categories and Drivers.
 """
 
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 import logging
+from typing import Any, Iterable
 
+import numpy as np
 import sqlalchemy as sa
-import trueskill as ts
 from cachetools import TTLCache, cached
-from sqlalchemy import delete, desc, select, update
+from cachetools.keys import hashkey
+from sqlalchemy import delete, desc, insert, select, update
 from sqlalchemy.exc import MultipleResultsFound
 from sqlalchemy.orm import Session as DBSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 from models import (
+    CacheVersion,
     Category,
     Championship,
     Chat,
+    CircuitRecord,
     Driver,
     DriverContract,
     DriverCategory,
+    DriverRating,
     DriverRole,
+    DriverStats,
+    HeadToHead,
     Penalty,
+    PointsLedgerEntry,
+    Participation,
+    PointsLedgerKind,
+    PointSystem,
     QualifyingResult,
     RaceResult,
     Protest,
     Reprimand,
+    Round,
     RoundParticipant,
     Session,
     SessionCompletionStatus,
+    StandingsSnapshot,
     Team,
     TeamChampionship,
 )
-
-TrueSkillEnv = ts.TrueSkill(
-    draw_probability=0,
+from analytics import refresh_analytics
+from head_to_head import HeadToHeadMatrix
+from lobbies import Lobbies, split_lobbies
+from points import PointsTable
+from ratings import (
+    RacePrediction,
+    RatingPoint,
+    TrueSkillEnv,
+    predict_race,
+    rate_race,
+    replay_ratings,
+    session_order,
+)
+from simulation import (
+    CategoryResults,
+    ChampionshipForecast,
+    RemainingSeason,
+    WhatIfOutcome,
+    forecast_championship,
+)
+from standings import StandingsTable
+
+# Loader options fetching a championship together with everything the standings, results
+# and category views go through: categories, rounds, sessions, results, protests, teams
+# and drivers with their contracts. Each relationship is loaded with a single batched
+# SELECT ... IN, so the number of queries doesn't grow with the number of drivers.
+_driver_graph = selectinload(Driver.contracts).joinedload(DriverContract.team)
+ChampionshipGraph = (
+    selectinload(Championship.categories).options(
+        selectinload(Category.drivers)
+        .joinedload(DriverCategory.driver)
+        .options(_driver_graph),
+        selectinload(Category.rounds).options(
+            joinedload(Round.circuit),
+            selectinload(Round.protests),
+            selectinload(Round.sessions).options(
+                selectinload(Session.race_results)
+                .joinedload(RaceResult.driver)
+                .options(_driver_graph),
+                selectinload(Session.qualifying_results)
+                .joinedload(QualifyingResult.driver)
+                .options(_driver_graph),
+            ),
+        ),
+    ),
+    selectinload(Championship.teams).joinedload(TeamChampionship.team),
 )
 
 
 def fetch_championship(
-    db: DBSession, championship_id: int | None = None
+    db: DBSession, championship_id: int | None = None, load_graph: bool = False
 ) -> Championship | None:
     """If not given a championship_id, returns the most recent one.
 
@@ -50,6 +106,8 @@ def fetch_championship(
         db (DBSession): Session to execute the query with.
         championship_id (int, optional): ID of the championship to retrieve.
             Defaults to None.
+        load_graph (bool): If True, the whole ChampionshipGraph is loaded upfront
+            instead of lazily, one relationship at a time. Defaults to False.
 
     Returns:
         Championship | None: Only None if no championships are registered in
@@ -61,6 +119,9 @@ def fetch_championship(
     else:
         statement = select(Championship).order_by(desc(Championship.start))
 
+    if load_graph:
+        statement = statement.limit(1).options(*ChampionshipGraph)
+
     result = db.execute(statement).first()
     if result:
         return result[0]
@@ -176,7 +237,6 @@ def fetch_protests(
 
 @cached(cache=TTLCache(maxsize=50, ttl=30))  # type: ignore
 def fetch_driver_by_psn_id(db: DBSession, psn_id: str) -> Driver | None:
-
     statement = select(Driver).where(Driver.psn_id == psn_id)
     try:
         result = db.execute(statement).one_or_none()
@@ -214,6 +274,12 @@ def fetch_driver_by_email(db: DBSession, email: str) -> Driver | None:
     return result[0] if result else None
 
 
+def fetch_drivers_by_id(db: DBSession, driver_ids: Iterable[int]) -> dict[int, Driver]:
+    """Returns the drivers with the given IDs, by ID, loaded with a single query."""
+    statement = select(Driver).where(Driver.id.in_(list(driver_ids)))
+    return {driver.id: driver for driver in db.execute(statement).scalars()}
+
+
 def fetch_teams(db: DBSession, championship_id: int) -> list[Team]:
     """Returns the list of teams participating to the given championship, ordered by
     championship position.
@@ -348,24 +414,70 @@ def save_qualifying_penalty(db: DBSession, penalty: Penalty) -> None:
     db.commit()
 
 
-def _update_ratings(results: list[RaceResult]) -> None:
-    """Updates the driver ratings"""
-    ranks: list[int] = []
-    rating_groups: list[tuple[ts.Rating]] = []
-    race_results: list[RaceResult] = []
-    for result in results:
-        driver: Driver = result.driver
+def _fetch_game_ratings(
+    db: DBSession, game_id: int, drivers: Iterable[Driver]
+) -> dict[int, DriverRating]:
+    """Returns the ratings the given drivers have in the game, by driver ID. Drivers who
+    never raced in the game are given the initial rating, which is added to the
+    session."""
+
+    drivers = {driver.id: driver for driver in drivers}
+    ratings = {
+        rating.driver_id: rating
+        for rating in db.execute(
+            select(DriverRating)
+            .where(DriverRating.game_id == game_id)
+            .where(DriverRating.driver_id.in_(drivers))
+        ).scalars()
+    }
+    for driver_id, driver in drivers.items():
+        if driver_id not in ratings:
+            ratings[driver_id] = DriverRating(
+                driver=driver,
+                game_id=game_id,
+                mu=Decimal(str(TrueSkillEnv.mu)),
+                sigma=Decimal(str(TrueSkillEnv.sigma)),
+            )
+            db.add(ratings[driver_id])
+    return ratings
+
 
-        if result.status == SessionCompletionStatus.finished:
-            rating_groups.append((ts.Rating(float(driver.mu), float(driver.sigma)),))
-            ranks.append(result.position)  # type: ignore
-            race_results.append(result)
+def _update_ratings(
+    results: list[RaceResult], game_ratings: dict[int, DriverRating]
+) -> None:
+    """Updates the driver ratings in the game the race was held in.
+
+    Args:
+        results (list[RaceResult]): Results of the race.
+        game_ratings (dict[int, DriverRating]): Ratings of the drivers in the game, by
+            driver ID, which are updated in place.
+    """
+    race_results = sorted(
+        (
+            result
+            for result in results
+            if result.status == SessionCompletionStatus.finished
+        ),
+        key=lambda result: result.position,  # type: ignore
+    )
+    ratings = [game_ratings[result.driver.id] for result in race_results]
+    if len(race_results) < 2:
+        # A race nobody else finished doesn't tell anything about the driver's skill.
+        for result, rating in zip(race_results, ratings):
+            result.mu = result.driver.mu = rating.mu
+            result.sigma = result.driver.sigma = rating.sigma
+        return
 
-    rating_groups = TrueSkillEnv.rate(rating_groups, ranks)  # type: ignore
+    mu, sigma = rate_race(
+        np.array([float(rating.mu) for rating in ratings]),
+        np.array([float(rating.sigma) for rating in ratings]),
+    )
 
-    for rating_group, result in zip(rating_groups, race_results):  # type: ignore
-        result.mu = result.driver.mu = Decimal(str(rating_group[0].mu))  # type: ignore
-        result.sigma = result.driver.sigma = Decimal(str(rating_group[0].sigma))
+    for result, rating, new_mu, new_sigma in zip(
+        race_results, ratings, mu.tolist(), sigma.tolist()
+    ):
+        result.mu = result.driver.mu = rating.mu = Decimal(str(new_mu))  # type: ignore
+        result.sigma = result.driver.sigma = rating.sigma = Decimal(str(new_sigma))
 
 
 def reverse_qualifying_penalty(db: DBSession, penalty: Penalty) -> None:
@@ -387,94 +499,1195 @@ def reverse_qualifying_penalty(db: DBSession, penalty: Penalty) -> None:
     db.commit()
 
 
+def fetch_points_table(
+    db: DBSession,
+    session_id: int | None = None,
+    round_id: int | None = None,
+    category_id: int | None = None,
+    championship_id: int | None = None,
+) -> PointsTable:
+    """Calculates the points earned by every race and qualifying result in the given
+    session, round, category or championship with a single query.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        session_id (int | None): Only include results from this session.
+        round_id (int | None): Only include results from this round.
+        category_id (int | None): Only include results from this category.
+        championship_id (int | None): Only include results from this championship.
+
+    Returns:
+        PointsTable: The points earned with each result. (Penalties excluded)
+    """
+
+    race_query = (
+        select(
+            RaceResult.category_id,
+            RaceResult.round_id,
+            RaceResult.session_id,
+            RaceResult.driver_id,
+            sa.literal(False).label("is_quali"),
+            RaceResult.position,
+            (RaceResult.status == SessionCompletionStatus.finished).label("finished"),
+            RaceResult.fastest_lap,
+            Session.fastest_lap_points,
+            PointSystem.id,
+            PointSystem._point_system,
+        )
+        .join(Session, RaceResult.session_id == Session.id)
+        .join(PointSystem, Session.point_system_id == PointSystem.id)
+        .join(Round, RaceResult.round_id == Round.id)
+    )
+    quali_query = (
+        select(
+            QualifyingResult.category_id,
+            QualifyingResult.round_id,
+            QualifyingResult.session_id,
+            QualifyingResult.driver_id,
+            sa.literal(True).label("is_quali"),
+            QualifyingResult.position,
+            (QualifyingResult.status == SessionCompletionStatus.finished).label(
+                "finished"
+            ),
+            sa.literal(False).label("fastest_lap"),
+            sa.literal(0).label("fastest_lap_points"),
+            PointSystem.id,
+            PointSystem._point_system,
+        )
+        .join(Session, QualifyingResult.session_id == Session.id)
+        .join(PointSystem, Session.point_system_id == PointSystem.id)
+        .join(Round, QualifyingResult.round_id == Round.id)
+    )
+
+    for query_filter, value in (
+        (Session.id, session_id),
+        (Round.id, round_id),
+        (Round.category_id, category_id),
+        (Round.championship_id, championship_id),
+    ):
+        if value is not None:
+            race_query = race_query.where(query_filter == value)
+            quali_query = quali_query.where(query_filter == value)
+
+    rows = db.execute(sa.union_all(race_query, quali_query)).all()
+    return PointsTable.from_rows(rows)
+
+
+def compute_standings_table(db: DBSession, category: Category) -> StandingsTable:
+    """Calculates the standings of the given category after each of its completed rounds,
+    summing the points ledger entries of each round and driver with a single query.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        category (Category): Category to calculate the standings of.
+
+    Returns:
+        StandingsTable: The standings after each completed round.
+    """
+    round_ids = [rnd.id for rnd in category.rounds if rnd.is_completed]
+    rounds = {round_id: i for i, round_id in enumerate(round_ids)}
+
+    entries = [
+        (round_id, driver_id, points)
+        for round_id, driver_id, points in db.execute(
+            select(
+                PointsLedgerEntry.round_id,
+                PointsLedgerEntry.driver_id,
+                sa.func.sum(PointsLedgerEntry.points),
+            )
+            .where(PointsLedgerEntry.category_id == category.id)
+            .group_by(PointsLedgerEntry.round_id, PointsLedgerEntry.driver_id)
+        ).all()
+        if round_id in rounds
+    ]
+
+    # Drivers who aren't part of the category anymore are still ranked from the first
+    # round they earned (or lost) points in.
+    drivers = {driver.driver_id: i for i, driver in enumerate(category.drivers)}
+    joined = [0] * len(drivers)
+    for round_id, driver_id, _ in sorted(entries, key=lambda e: rounds[e[0]]):
+        if driver_id not in drivers:
+            drivers[driver_id] = len(drivers)
+            joined.append(rounds[round_id])
+
+    points = np.zeros((len(rounds), len(drivers)))
+    for round_id, driver_id, round_points in entries:
+        points[rounds[round_id], drivers[driver_id]] = round_points
+
+    return StandingsTable.from_points(
+        list(drivers), round_ids, points, np.array(joined, dtype=np.intp)
+    )
+
+
+def fetch_standings_table(db: DBSession, category: Category) -> StandingsTable:
+    """Returns the standings of the given category after each of its completed rounds,
+    read from the saved snapshots with a single query.
+
+    Standings are calculated from the results instead when some of the completed rounds
+    don't have a snapshot yet.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        category (Category): Category to fetch the standings of.
+
+    Returns:
+        StandingsTable: The standings after each completed round.
+    """
+    round_ids = [rnd.id for rnd in category.rounds if rnd.is_completed]
+
+    rows = db.execute(
+        select(
+            StandingsSnapshot.round_id,
+            StandingsSnapshot.driver_id,
+            StandingsSnapshot.points,
+            StandingsSnapshot.position,
+            StandingsSnapshot.delta,
+        ).where(StandingsSnapshot.category_id == category.id)
+    ).all()
+
+    if not rows or {row[0] for row in rows} != set(round_ids):
+        return compute_standings_table(db, category)
+
+    return StandingsTable.from_snapshots(round_ids, rows)
+
+
+def fetch_cache_version(db: DBSession, key: str) -> int:
+    """Returns the current version of the given group of cached results."""
+    version = db.execute(
+        select(CacheVersion.version).where(CacheVersion.key == key)
+    ).scalar()
+    return version or 0
+
+
+def bump_cache_version(db: DBSession, key: str) -> None:
+    """Marks the cached results in the given group as stale in every process."""
+    result = db.execute(
+        update(CacheVersion)
+        .where(CacheVersion.key == key)
+        .values(version=CacheVersion.version + 1)
+    )
+    if not result.rowcount:  # type: ignore
+        db.execute(insert(CacheVersion).values(key=key, version=1))
+
+
+def _championship_cache_key(championship_id: int) -> str:
+    return f"championship-{championship_id}"
+
+
+# Version of the results cached until drivers' ratings change.
+RATINGS_CACHE_KEY = "ratings"
+
+# Version of the results cached until drivers' stats change.
+STATS_CACHE_KEY = "stats"
+
+
+def fetch_points_per_round(
+    db: DBSession, championship_id: int
+) -> dict[int, list[list[Any]]]:
+    """Returns the points tally of each driver after every completed round, for each
+    category in the championship.
+
+    Results are cached until results or penalties in the championship change.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        championship_id (int): ID of the championship.
+
+    Returns:
+        dict[int, list[list[Any]]]: Category IDs as keys, each with a chart table as
+            value: the first row contains "Tappa" followed by the drivers' names,
+            following rows contain the round number followed by the drivers' tallies.
+    """
+    version = fetch_cache_version(db, _championship_cache_key(championship_id))
+    return _fetch_points_per_round(db, championship_id, version)
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, championship_id, version: hashkey(championship_id, version),
+)  # type: ignore
+def _fetch_points_per_round(
+    db: DBSession, championship_id: int, version: int
+) -> dict[int, list[list[Any]]]:
+    rows = db.execute(
+        select(
+            Round.category_id,
+            Round.number,
+            PointsLedgerEntry.driver_id,
+            Driver.name,
+            Driver.surname,
+            Driver.psn_id,
+            sa.func.sum(PointsLedgerEntry.points),
+        )
+        .join(Round, PointsLedgerEntry.round_id == Round.id)
+        .join(Driver, PointsLedgerEntry.driver_id == Driver.id)
+        .where(PointsLedgerEntry.championship_id == championship_id, Round.is_completed)
+        .group_by(
+            Round.category_id,
+            Round.id,
+            Round.number,
+            PointsLedgerEntry.driver_id,
+            Driver.name,
+            Driver.surname,
+            Driver.psn_id,
+        )
+        .order_by(Round.category_id, Round.number)
+    ).all()
+
+    categories: dict[int, list[tuple[int, int, str, float]]] = defaultdict(list)
+    for category_id, number, driver_id, name, surname, psn_id, points in rows:
+        full_name = f"{name} {surname}" if name and surname else psn_id
+        categories[category_id].append((number, driver_id, full_name, float(points)))
+
+    result: dict[int, list[list[Any]]] = {}
+    for category_id, category_rows in categories.items():
+        numbers = list(dict.fromkeys(row[0] for row in category_rows))
+        drivers = {row[1]: row[2] for row in category_rows}
+        round_index = {number: i for i, number in enumerate(numbers)}
+        driver_index = {driver_id: i for i, driver_id in enumerate(drivers)}
+
+        points = np.zeros((len(numbers), len(drivers)))
+        for number, driver_id, _, round_points in category_rows:
+            points[round_index[number], driver_index[driver_id]] = round_points
+        cumulative = np.cumsum(points, axis=0).tolist()
+
+        result[category_id] = [["Tappa"] + list(drivers.values())] + [
+            [number] + tallies for number, tallies in zip(numbers, cumulative)
+        ]
+    return result
+
+
+def fetch_team_standings_table(db: DBSession, championship_id: int) -> StandingsTable:
+    """Returns the constructors' standings after each round number of the championship,
+    summing the points ledger entries of each team with a single query.
+
+    Results are cached until results or penalties in the championship change.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        championship_id (int): ID of the championship.
+
+    Returns:
+        StandingsTable: The standings of the teams taking part in the championship,
+            with team IDs in place of driver IDs and round numbers in place of
+            round IDs.
+    """
+    version = fetch_cache_version(db, _championship_cache_key(championship_id))
+    return _fetch_team_standings_table(db, championship_id, version)
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, championship_id, version: hashkey(championship_id, version),
+)  # type: ignore
+def _fetch_team_standings_table(
+    db: DBSession, championship_id: int, version: int
+) -> StandingsTable:
+    rows = db.execute(
+        select(
+            TeamChampionship.team_id,
+            Round.number,
+            sa.func.sum(PointsLedgerEntry.points),
+        )
+        .select_from(TeamChampionship)
+        .outerjoin(
+            PointsLedgerEntry,
+            sa.and_(
+                PointsLedgerEntry.team_id == TeamChampionship.team_id,
+                PointsLedgerEntry.championship_id == TeamChampionship.championship_id,
+            ),
+        )
+        .outerjoin(
+            Round, sa.and_(PointsLedgerEntry.round_id == Round.id, Round.is_completed)
+        )
+        .where(TeamChampionship.championship_id == championship_id)
+        .group_by(TeamChampionship.team_id, Round.number)
+    ).all()
+
+    # Teams which haven't earned points yet are only returned with no round number.
+    team_ids = sorted({team_id for team_id, _, _ in rows})
+    numbers = sorted({number for _, number, _ in rows if number is not None})
+    team_index = {team_id: i for i, team_id in enumerate(team_ids)}
+    round_index = {number: i for i, number in enumerate(numbers)}
+
+    points = np.zeros((len(numbers), len(team_ids)))
+    for team_id, number, round_points in rows:
+        if number is not None:
+            points[round_index[number], team_index[team_id]] = round_points
+
+    return StandingsTable.from_points(team_ids, numbers, points)
+
+
+def _team_id_on_date(driver: Driver, round_date: date) -> int | None:
+    team = driver.get_team_on_date(round_date) or driver.current_team()
+    if not team and driver.contracts:
+        team = driver.contracts[-1].team
+    return team.id if team else None
+
+
+def update_points_ledger(db: DBSession, category: Category) -> None:
+    """Appends to the points ledger the entries needed for its totals to match the points
+    given by the current results and penalties of the category. Existing entries are
+    never modified: changes are recorded as new entries containing the difference.
+    Results count towards the team they were first entered into the ledger with.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category to update the ledger of.
+    """
+    db.flush()
+
+    LedgerKey = tuple[int, int, int, int | None, PointsLedgerKind, int | None]
+    expected: defaultdict[LedgerKey, float] = defaultdict(float)
+
+    points_table = fetch_points_table(db, category_id=category.id)
+    rows = list(
+        zip(
+            points_table.round_ids.tolist(),
+            points_table.session_ids.tolist(),
+            points_table.driver_ids.tolist(),
+            points_table.points.tolist(),
+            points_table.fastest_lap_points.tolist(),
+        )
+    )
+
+    # The team is resolved once, when the result is first entered into the ledger,
+    # so a driver changing team later doesn't move their past points to the new one.
+    teams: dict[tuple[int, int], int | None] = {}
+    for round_id, driver_id, team_id, _ in db.execute(
+        select(
+            PointsLedgerEntry.round_id,
+            PointsLedgerEntry.driver_id,
+            PointsLedgerEntry.team_id,
+            sa.func.min(PointsLedgerEntry.id),
+        )
+        .where(
+            PointsLedgerEntry.category_id == category.id,
+            PointsLedgerEntry.kind != PointsLedgerKind.penalty,
+        )
+        .group_by(
+            PointsLedgerEntry.round_id,
+            PointsLedgerEntry.driver_id,
+            PointsLedgerEntry.team_id,
+        )
+        .order_by(sa.func.min(PointsLedgerEntry.id).desc())
+    ).all():
+        teams[round_id, driver_id] = team_id
+
+    new_driver_ids = {
+        driver_id
+        for round_id, _, driver_id, *_ in rows
+        if (round_id, driver_id) not in teams
+    }
+    if new_driver_ids:
+        rounds = {rnd.id: rnd for rnd in category.rounds}
+        drivers = {
+            driver.id: driver
+            for driver in db.execute(
+                select(Driver)
+                .where(Driver.id.in_(new_driver_ids))
+                .options(_driver_graph)
+            ).scalars()
+        }
+        for round_id, _, driver_id, *_ in rows:
+            if (round_id, driver_id) not in teams:
+                teams[round_id, driver_id] = _team_id_on_date(
+                    drivers[driver_id],
+                    rounds[round_id].date,  # type: ignore
+                )
+
+    for round_id, session_id, driver_id, points, fastest_lap_points in rows:
+        team_id = teams[round_id, driver_id]
+
+        key = (round_id, session_id, driver_id, team_id)
+        expected[(*key, PointsLedgerKind.result, None)] += points - fastest_lap_points
+        expected[(*key, PointsLedgerKind.fastest_lap, None)] += fastest_lap_points
+
+    penalties = db.execute(
+        select(
+            Penalty.id,
+            Penalty.round_id,
+            Penalty.session_id,
+            Penalty.driver_id,
+            Penalty.team_id,
+            Penalty.points,
+        ).where(Penalty.category_id == category.id, Penalty.points != 0)
+    ).all()
+    for penalty_id, round_id, session_id, driver_id, team_id, points in penalties:
+        key = (round_id, session_id, driver_id, team_id)
+        expected[(*key, PointsLedgerKind.penalty, penalty_id)] -= points
+
+    recorded: defaultdict[LedgerKey, float] = defaultdict(float)
+    columns = (
+        PointsLedgerEntry.round_id,
+        PointsLedgerEntry.session_id,
+        PointsLedgerEntry.driver_id,
+        PointsLedgerEntry.team_id,
+        PointsLedgerEntry.kind,
+        PointsLedgerEntry.penalty_id,
+    )
+    for *key, points in db.execute(
+        select(*columns, sa.func.sum(PointsLedgerEntry.points))
+        .where(PointsLedgerEntry.category_id == category.id)
+        .group_by(*columns)
+    ).all():
+        recorded[tuple(key)] = points  # type: ignore
+
+    entries: list[dict[str, Any]] = []
+    for key in expected.keys() | recorded.keys():
+        difference = expected[key] - recorded[key]
+        if abs(difference) < 1e-6:
+            continue
+
+        round_id, session_id, driver_id, team_id, kind, penalty_id = key
+        entries.append(
+            {
+                "kind": kind,
+                "points": difference,
+                "penalty_id": penalty_id,
+                "championship_id": category.championship_id,
+                "category_id": category.id,
+                "round_id": round_id,
+                "session_id": session_id,
+                "driver_id": driver_id,
+                "team_id": team_id,
+            }
+        )
+
+    if entries:
+        db.execute(insert(PointsLedgerEntry), entries)
+
+
+def update_points_totals(
+    db: DBSession, category: Category, standings_table: StandingsTable
+) -> None:
+    """Sets the points tally of each driver in the category, and of each team in its
+    championship, to the totals in the points ledger. Drivers' positions are taken from
+    the standings after the last completed round.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category to update the drivers' totals of.
+        standings_table (StandingsTable): Up to date standings of the category.
+    """
+    driver_totals: dict[int, float] = dict(
+        db.execute(  # type: ignore
+            select(PointsLedgerEntry.driver_id, sa.func.sum(PointsLedgerEntry.points))
+            .where(PointsLedgerEntry.category_id == category.id)
+            .group_by(PointsLedgerEntry.driver_id)
+        ).all()
+    )
+    positions = {
+        driver_id: position
+        for position, (driver_id, _, _) in enumerate(
+            standings_table.standings(), start=1
+        )
+    }
+    for driver_category in category.drivers:
+        driver_category.points = driver_totals.get(driver_category.driver_id, 0)
+        driver_category.position = positions.get(
+            driver_category.driver_id, len(positions) + 1
+        )
+
+    team_totals: dict[int, float] = dict(
+        db.execute(  # type: ignore
+            select(PointsLedgerEntry.team_id, sa.func.sum(PointsLedgerEntry.points))
+            .where(PointsLedgerEntry.championship_id == category.championship_id)
+            .group_by(PointsLedgerEntry.team_id)
+        ).all()
+    )
+    for team_championship in category.championship.teams:
+        team_championship.points = team_totals.get(team_championship.team_id, 0)
+
+
+def refresh_category_points(db: DBSession, category: Category) -> None:
+    """Brings the points ledger, the drivers' and teams' points tallies, the standings
+    snapshots of the given category and the drivers' stats in its championship up to
+    date with its results and penalties.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category whose results or penalties changed.
+    """
+    update_points_ledger(db, category)
+    standings_table = compute_standings_table(db, category)
+    update_points_totals(db, category, standings_table)
+    update_standings_snapshots(db, category, standings_table)
+    update_driver_stats(db, category.championship_id)
+
+
+def update_standings_snapshots(
+    db: DBSession, category: Category, standings_table: StandingsTable | None = None
+) -> None:
+    """Rebuilds the standings snapshots of every completed round in the given category.
+    Points earned in each round (minus the penalty points given in it) are accumulated
+    round by round, and the drivers are ranked after each of them.
+    Cached results depending on the category's championship are invalidated as well.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category to rebuild the snapshots of.
+        standings_table (StandingsTable | None): Standings to save, if already
+            calculated.
+    """
+    db.flush()
+
+    if standings_table is None:
+        standings_table = compute_standings_table(db, category)
+    snapshots = standings_table.snapshot_rows(category.id)
+
+    db.execute(
+        delete(StandingsSnapshot).where(StandingsSnapshot.category_id == category.id)
+    )
+    if snapshots:
+        db.execute(insert(StandingsSnapshot), snapshots)
+
+    for rnd in category.rounds:
+        db.expire(rnd, ["standings"])
+
+    bump_cache_version(db, _championship_cache_key(category.championship_id))
+
+
+def _count_if(condition: Any) -> Any:
+    """Counts the rows matching the condition. (MySQL doesn't support FILTER)"""
+    return sa.func.sum(sa.case((condition, 1), else_=0))
+
+
+def _sum_if(condition: Any, column: Any) -> Any:
+    """Sums the column over the rows matching the condition."""
+    return sa.func.sum(sa.case((condition, column), else_=0))
+
+
+def update_driver_stats(db: DBSession, championship_id: int) -> None:
+    """Rebuilds the stats of every driver who took part in the given championship,
+    aggregating their race and qualifying results with a query for each.
+    Cached stats are invalidated as well.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        championship_id (int): ID of the championship to rebuild the stats of.
+    """
+    db.flush()
+
+    started = RaceResult.status != SessionCompletionStatus.dns
+    finished = RaceResult.status == SessionCompletionStatus.finished
+    race_rows = db.execute(
+        select(
+            RaceResult.driver_id,
+            _count_if(started & (RaceResult.position == 1)),
+            _count_if(started & (RaceResult.position <= 3)),
+            _count_if(started & RaceResult.fastest_lap),
+            _count_if(started),
+            sa.func.coalesce(_sum_if(finished, RaceResult.position), 0),
+            sa.func.coalesce(
+                _sum_if(
+                    finished,
+                    RaceResult.gap_to_first
+                    * 100.0
+                    / (RaceResult.total_racetime - RaceResult.gap_to_first),
+                ),
+                0,
+            ),
+        )
+        .join(Category, RaceResult.category_id == Category.id)
+        .where(Category.championship_id == championship_id)
+        .group_by(RaceResult.driver_id)
+    ).all()
+
+    quali_finished = QualifyingResult.status == SessionCompletionStatus.finished
+    quali_rows = db.execute(
+        select(
+            QualifyingResult.driver_id,
+            _count_if(QualifyingResult.position == 1),
+            _count_if(quali_finished),
+            sa.func.coalesce(_sum_if(quali_finished, QualifyingResult.position), 0),
+            sa.func.coalesce(
+                _sum_if(
+                    quali_finished,
+                    QualifyingResult.gap_to_first
+                    * 100.0
+                    / (QualifyingResult.laptime - QualifyingResult.gap_to_first),
+                ),
+                0,
+            ),
+        )
+        .join(Category, QualifyingResult.category_id == Category.id)
+        .where(Category.championship_id == championship_id)
+        .group_by(QualifyingResult.driver_id)
+    ).all()
+
+    stats: dict[int, dict[str, Any]] = defaultdict(
+        lambda: {"championship_id": championship_id}
+    )
+    race_keys = (
+        "wins",
+        "podiums",
+        "fastest_laps",
+        "races_completed",
+        "race_position_sum",
+        "race_gap_sum",
+    )
+    for driver_id, *values in race_rows:
+        stats[driver_id].update(zip(race_keys, values))
+    quali_keys = ("poles", "qualis_completed", "quali_position_sum", "quali_gap_sum")
+    for driver_id, *values in quali_rows:
+        stats[driver_id].update(zip(quali_keys, values))
+
+    db.execute(
+        delete(DriverStats).where(DriverStats.championship_id == championship_id)
+    )
+    if stats:
+        defaults = dict.fromkeys(race_keys + quali_keys, 0)
+        db.execute(
+            insert(DriverStats),
+            [
+                {**defaults, **values, "driver_id": driver_id}
+                for driver_id, values in stats.items()
+            ],
+        )
+
+    for driver in db.identity_map.values():
+        if isinstance(driver, Driver):
+            db.expire(driver, ["championship_stats"])
+    bump_cache_version(db, STATS_CACHE_KEY)
+
+
+def _head_to_head_rows(
+    db: DBSession, category_id: int, round_id: int | None = None
+) -> list[Any]:
+    """Returns the session_id, driver_id, is_quali, finished status, position and time
+    of the race and qualifying results of the category, or of one of its rounds,
+    ordered by session."""
+    race_query = select(
+        RaceResult.session_id,
+        RaceResult.driver_id,
+        sa.literal(False).label("is_quali"),
+        (RaceResult.status == SessionCompletionStatus.finished).label("finished"),
+        RaceResult.position,
+        RaceResult.total_racetime.label("time"),
+    ).where(RaceResult.category_id == category_id)
+    quali_query = select(
+        QualifyingResult.session_id,
+        QualifyingResult.driver_id,
+        sa.literal(True),
+        QualifyingResult.status == SessionCompletionStatus.finished,
+        QualifyingResult.position,
+        QualifyingResult.laptime,
+    ).where(QualifyingResult.category_id == category_id)
+    if round_id is not None:
+        race_query = race_query.where(RaceResult.round_id == round_id)
+        quali_query = quali_query.where(QualifyingResult.round_id == round_id)
+
+    results = sa.union_all(race_query, quali_query).subquery()
+    return list(db.execute(select(results).order_by(results.c.session_id)).all())
+
+
+def update_head_to_head(
+    db: DBSession, category: Category, rnd: Round | None = None
+) -> None:
+    """Brings the head-to-head records of the category up to date.
+
+    If a round is given, only the sessions of that round are added to the records,
+    so it must be called once, after its results are saved. Otherwise, or if the
+    category has no records yet, they are rebuilt from every result in it.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category to update the records of.
+        rnd (Round | None): Round whose results were just saved.
+    """
+    db.flush()
+
+    head_to_head = db.get(HeadToHead, category.id)
+    if head_to_head and rnd:
+        head_to_head.matrix = head_to_head.matrix.add_sessions(
+            _head_to_head_rows(db, category.id, rnd.id)
+        )
+        return
+
+    matrix = HeadToHeadMatrix.empty().add_sessions(_head_to_head_rows(db, category.id))
+    if head_to_head:
+        head_to_head.matrix = matrix
+    else:
+        db.add(HeadToHead(category_id=category.id, data=matrix.to_bytes()))
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, category_id, version: hashkey(category_id, version),
+)  # type: ignore
+def _fetch_head_to_head(
+    db: DBSession, category_id: int, version: int
+) -> HeadToHeadMatrix:
+    head_to_head = db.get(HeadToHead, category_id)
+    if not head_to_head:
+        return HeadToHeadMatrix.empty()
+    return head_to_head.matrix
+
+
+def fetch_head_to_head(db: DBSession, category_id: int) -> HeadToHeadMatrix | None:
+    """Returns the head-to-head records of every pair of drivers in the category.
+
+    Records are cached until results are saved or penalties are applied or reversed.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category_id (int): ID of the category.
+
+    Returns:
+        HeadToHeadMatrix | None: The records, None if the category doesn't exist.
+    """
+    category = db.get(Category, category_id)
+    if not category:
+        return None
+
+    version = fetch_cache_version(db, _championship_cache_key(category.championship_id))
+    return _fetch_head_to_head(db, category_id, version)
+
+
+def _fastest_laps(
+    db: DBSession,
+    result: type[QualifyingResult] | type[RaceResult],
+    laptime: Any,
+    round_id: int | None = None,
+) -> dict[tuple[int, int, int], tuple[int, int, int]]:
+    """Returns the fastest lap among the given results set on each circuit
+    configuration during each championship, together with the driver_id and round_id
+    of who set it, by circuit_id, configuration_id and championship_id."""
+    statement = (
+        select(
+            Round.circuit_id,
+            Round.configuration_id,
+            Round.championship_id,
+            laptime,
+            result.driver_id,
+            Round.id,
+        )
+        .join(Round, Round.id == result.round_id)
+        .where(laptime > 0)
+        .where(result.status != SessionCompletionStatus.dsq)
+        .order_by(laptime, Round.date)
+    )
+    if round_id is not None:
+        statement = statement.where(Round.id == round_id)
+
+    fastest: dict[tuple[int, int, int], tuple[int, int, int]] = {}
+    for circuit_id, configuration_id, championship_id, *record in db.execute(statement):
+        fastest.setdefault(
+            (circuit_id, configuration_id, championship_id), tuple(record)
+        )
+    return fastest
+
+
+def update_circuit_records(db: DBSession, rnd: Round | None = None) -> None:
+    """Brings the circuit records up to date.
+
+    If a round is given, its fastest laps replace the records of its circuit
+    configuration they beat, so it must be called after its results are saved.
+    Otherwise, every record is rebuilt from all the results.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        rnd (Round | None): Round whose results were just saved.
+    """
+    db.flush()
+
+    round_id = rnd.id if rnd else None
+    fastest = {
+        "quali": _fastest_laps(
+            db, QualifyingResult, QualifyingResult.laptime, round_id
+        ),
+        "race": _fastest_laps(db, RaceResult, RaceResult.best_laptime, round_id),
+    }
+
+    if rnd:
+        statement = (
+            select(CircuitRecord)
+            .where(CircuitRecord.circuit_id == rnd.circuit_id)
+            .where(CircuitRecord.configuration_id == rnd.configuration_id)
+        )
+        records = {
+            (record.circuit_id, record.configuration_id, record.championship_id): record
+            for record in db.execute(statement).unique().scalars()
+        }
+    else:
+        db.execute(delete(CircuitRecord))
+        records = {}
+
+    for kind, laps in fastest.items():
+        for key, (laptime, driver_id, record_round_id) in laps.items():
+            if key not in records:
+                circuit_id, configuration_id, championship_id = key
+                records[key] = CircuitRecord(
+                    circuit_id=circuit_id,
+                    configuration_id=configuration_id,
+                    championship_id=championship_id,
+                )
+                db.add(records[key])
+            records[key].set_record(kind, laptime, driver_id, record_round_id)
+
+
+def fetch_circuit_lap_records(
+    db: DBSession, circuit_id: int, configuration_id: int | None = None
+) -> list[CircuitRecord]:
+    """Returns the records set on the circuit's configurations during each
+    championship, with their holders.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        circuit_id (int): ID of the circuit.
+        configuration_id (int | None): Only returns the records of this configuration.
+
+    Returns:
+        list[CircuitRecord]: The records, by configuration and championship.
+    """
+    statement = (
+        select(CircuitRecord)
+        .where(CircuitRecord.circuit_id == circuit_id)
+        .options(joinedload(CircuitRecord.championship))
+        .order_by(CircuitRecord.configuration_id, CircuitRecord.championship_id)
+    )
+    if configuration_id is not None:
+        statement = statement.where(CircuitRecord.configuration_id == configuration_id)
+    return list(db.execute(statement).unique().scalars())
+
+
 def save_results(
     db: DBSession,
     qualifying_results: list[QualifyingResult],
     races: dict[Session, list[RaceResult]],
 ) -> None:
-    """"""
+    """Saves the results of a round, updates the ratings of the drivers who took part in
+    it and the points tallies of drivers and teams.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        qualifying_results (list[QualifyingResult]): Results of the qualifying session.
+        races (dict[Session, list[RaceResult]]): Results of each race session.
+
+    Raises:
+        ValueError: Raised when one of the drivers isn't part of a team.
+    """
 
-    driver_points: defaultdict[Driver, float] = defaultdict(float)
     category = qualifying_results[0].category
 
-    # Calculates points earned in qualifying by each driver.
     db.add_all(qualifying_results)
-    for quali_result in qualifying_results:
-        points_earned = quali_result.points_earned
-        driver_points[quali_result.driver] += points_earned
-
+    participants: list[Driver] = [result.driver for result in qualifying_results]
+    game_ratings = _fetch_game_ratings(
+        db,
+        category.game_id,
+        {result.driver for results in races.values() for result in results},
+    )
+    for _, race_results in races.items():
+        for race_result in race_results:
+            race_result.original_racetime = race_result.total_racetime
+        db.add_all(race_results)
+        _update_ratings(race_results, game_ratings)
+        participants.extend(result.driver for result in race_results)
+    bump_cache_version(db, RATINGS_CACHE_KEY)
+    rnd = qualifying_results[0].round
+    update_head_to_head(db, category, rnd)
+    update_circuit_records(db, rnd)
+
+    category_drivers = {driver.driver_id for driver in category.drivers}
+    for driver in dict.fromkeys(participants):
         # Should never be None, since every driver who takes part in a race/qualifying session
         # must also be part of a team.
-        team = quali_result.driver.current_team()
-
-        if team is None:
-            logging.error(
-                "Driver {d} is not associated with a category".format(
-                    quali_result.driver.id
-                )
-            )
-            raise ValueError(
-                "Driver {d} is not associated with a category".format(
-                    quali_result.driver.id
+        if driver.current_team() is None:
+            logging.error(f"Driver {driver.id} is not associated with a team")
+            raise ValueError(f"Driver {driver.id} is not associated with a team")
+
+        # Remaining drivers are reserves who are covering in this category for the first time
+        if driver.id not in category_drivers:
+            category_drivers.add(driver.id)
+            db.add(
+                DriverCategory(
+                    driver=driver,
+                    category=category,
+                    race_number=0,
+                    position=len(category_drivers),
                 )
             )
 
-        for team_championship in team.championships:
-            if team_championship.championship_id == category.championship_id:
-                team_championship.points += float(points_earned)
-                break
+    refresh_category_points(db, category)
+    db.commit()
+    refresh_analytics(db, [rnd.id])
+
+
+# Milliseconds the total race time minus the gap of drivers finishing on the same lap
+# can differ by, since lap and total times are rounded separately.
+SAME_LAP_TOLERANCE = 1000
+
+
+def _round_race_results(db: DBSession, rnd: Round) -> list[Any]:
+    """Returns the ID, session_id, driver_id, finished status, total race time, original
+    race time, position and gap_to_first of every race result in the round."""
+    return list(
+        db.execute(
+            select(
+                RaceResult.id,
+                RaceResult.session_id,
+                RaceResult.driver_id,
+                (RaceResult.status == SessionCompletionStatus.finished).label(
+                    "finished"
+                ),
+                RaceResult.total_racetime,
+                RaceResult.original_racetime,
+                RaceResult.position,
+                RaceResult.gap_to_first,
+            ).where(RaceResult.round_id == rnd.id)
+        ).all()
+    )
 
-    # Calculates points earned across all race sessions by each driver.
-    for _, race_results in races.items():
-        db.add_all(race_results)
-        _update_ratings(race_results)
-        for race_result in race_results:
-            points_earned = race_result.points_earned
-            driver_points[race_result.driver] += points_earned
-
-            team = race_result.driver.current_team()
-            if team is None:
-                logging.error(
-                    "Driver {d} is not associated with a category".format(
-                        race_result.driver.id
-                    )
-                )
-                raise ValueError(
-                    "Driver {d} is not associated with a category".format(
-                        race_result.driver.id
-                    )
-                )
 
-            for team_championship in team.championships:
-                if team_championship.championship_id == category.championship_id:
-                    team_championship.points += float(points_earned)
-                    break
+def _round_time_penalties(
+    db: DBSession, rnd: Round, rows: list[Any]
+) -> defaultdict[int, int]:
+    """Returns the sum of the time penalties saved in the round, by ID of the race result
+    they have to be added to.
 
-    drivers = qualifying_results[0].category.drivers
+    Time penalties are added to the result obtained in the session they were given in.
+    They are deferred to the long race if the driver didn't finish "Gara 1", and ignored
+    if they weren't given in a race or the driver didn't finish it.
+    """
+    finished_results = {
+        (session_id, driver_id): result_id
+        for result_id, session_id, driver_id, finished, *_ in rows
+        if finished
+    }
+    sessions = {session.id: session for session in rnd.sessions}
+
+    time_penalties: defaultdict[int, int] = defaultdict(int)
+    for session_id, driver_id, time_penalty in db.execute(
+        select(Penalty.session_id, Penalty.driver_id, Penalty.time_penalty)
+        .where(Penalty.round_id == rnd.id)
+        .where(Penalty.time_penalty != 0)
+    ).all():
+        result_id = finished_results.get((session_id, driver_id))
+        if result_id is None and sessions[session_id].name == "Gara 1":
+            result_id = finished_results.get((rnd.long_race.id, driver_id))
+        if result_id is not None:
+            time_penalties[result_id] += time_penalty
+    return time_penalties
+
+
+def record_original_racetimes(db: DBSession, rnd: Round) -> None:
+    """Records the original race time of the results in the round which were saved
+    before it was stored, subtracting the time penalties given until now from their
+    total race time.
+
+    Must be called before penalties are added to or removed from the round, without
+    flushing them first.
 
-    for driver in drivers:
-        driver.points += driver_points[driver.driver]
-        driver_points.pop(driver.driver)
+    Args:
+        db (DBSession): Session to execute the queries with.
+        rnd (Round): Round to record the original race times of.
+    """
+    rows = _round_race_results(db, rnd)
+    missing = [row for row in rows if row[5] is None and row[4] is not None]
+    if not missing:
+        return
 
-    # Remaining drivers are reserves who are covering in this category for the first time
-    if driver_points:
-        category = qualifying_results[0].category
-        for driver, points in driver_points.items():
-            dc = DriverCategory(
-                driver=driver,
-                category=category,
-                race_number=0,
-                points=points,
+    time_penalties = _round_time_penalties(db, rnd, rows)
+    db.execute(
+        update(RaceResult),
+        [
+            {"id": row[0], "original_racetime": row[4] - time_penalties[row[0]]}
+            for row in missing
+        ],
+    )
+
+
+def _rerank_session(
+    results: list[tuple[int | None, int, int | None, int | None, int]],
+    values: dict[int, dict[str, Any]],
+) -> None:
+    """Reorders the finished results of a session after the time penalties given in it
+    changed, shifting their recorded gap by the change in their penalty.
+
+    The total race time minus the gap is the time the winner took to complete as many
+    laps as the driver did, so drivers finishing on the same lap share it. Results are
+    split into groups by it in their recorded order and only the order inside each group
+    is rebuilt, keeping lapped drivers behind the ones on the lead lap. Results without
+    a time or a gap keep their place. Every gap is then made relative to the new winner.
+
+    Args:
+        results (list[tuple[int | None, int, int | None, int | None, int]]): Recorded
+            position, ID, recorded gap, total race time minus the gap and change in
+            time penalty of each finished result.
+        values (dict[int, dict[str, Any]]): New values of each result, by ID.
+    """
+    results.sort(key=lambda result: (result[0] is None, result[0] or 0, result[1]))
+
+    groups: list[list[tuple[int, int, int]]] = []
+    previous_reference = None
+    for _, result_id, gap, reference, shift in results:
+        if (
+            reference is None
+            or previous_reference is None
+            or abs(reference - previous_reference) > SAME_LAP_TOLERANCE
+        ):
+            groups.append([])
+        if gap is not None:
+            # Ties are broken by original race time, then by result ID.
+            original = values[result_id]["original_racetime"] or 0
+            groups[-1].append((gap + shift, original, result_id))
+        else:
+            groups[-1].append((0, 0, result_id))
+        previous_reference = reference
+
+    for group in groups:
+        group.sort()
+    winner_gap, _, winner_id = groups[0][0]
+    if values[winner_id]["gap_to_first"] is None:
+        winner_gap = 0
+
+    position = 0
+    for group in groups:
+        for gap, _, result_id in group:
+            position += 1
+            values[result_id]["position"] = position
+            if values[result_id]["gap_to_first"] is not None:
+                values[result_id]["gap_to_first"] = gap - winner_gap
+
+
+def recompute_round(db: DBSession, rnd: Round) -> list[Session]:
+    """Brings the total race times, gaps and finishing positions of the races in the
+    round up to date with the time penalties currently given in it, then writes the
+    ones which changed with a single bulk UPDATE.
+
+    Total race times are rebuilt from the original race times. Only the races where a
+    driver's time penalties changed are reordered, and the gaps recorded at import are
+    shifted by the change rather than recomputed, so lapped drivers stay behind the
+    drivers on the lead lap. Points aren't touched: refresh_category_points brings them
+    up to date with the new positions.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        rnd (Round): Round to recompute the results of.
+
+    Returns:
+        list[Session]: Sessions whose finishing order changed.
+    """
+    db.flush()
+
+    rows = _round_race_results(db, rnd)
+    time_penalties = _round_time_penalties(db, rnd, rows)
+
+    columns = ("total_racetime", "original_racetime", "position", "gap_to_first")
+    values: dict[int, dict[str, Any]] = {}
+    finished_results: defaultdict[
+        int, list[tuple[int | None, int, int | None, int | None, int]]
+    ] = defaultdict(list)
+    for result_id, session_id, _, finished, total, original, position, gap in rows:
+        reference = None if total is None or gap is None else total - gap
+        if original is None and total is not None:
+            original = total - time_penalties[result_id]
+        shift = 0
+        if original is not None and total is not None:
+            shift = original + time_penalties[result_id] - total
+            total += shift
+
+        values[result_id] = dict(zip(columns, (total, original, position, gap)))
+        if finished:
+            finished_results[session_id].append(
+                (position, result_id, gap, reference, shift)
             )
-            db.add(dc)
-            drivers.append(dc)
 
-    drivers.sort(key=lambda d: d.points, reverse=True)
+    for results in finished_results.values():
+        if any(shift for *_, shift in results):
+            _rerank_session(results, values)
+
+    updates = [
+        {"id": row[0], **values[row[0]]}
+        for row in rows
+        if tuple(row[4:]) != tuple(values[row[0]][column] for column in columns)
+    ]
+    if updates:
+        db.execute(update(RaceResult), updates)
+
+    reordered = {
+        row[1] for row in rows if row[6] != values[row[0]]["position"] and row[3]
+    }
+    return [session for session in rnd.sessions if session.id in reordered]
+
+
+def replay_ratings_after(db: DBSession, sessions: list[Session]) -> None:
+    """Brings drivers' ratings up to date after the finishing order of the given
+    sessions changed, replaying, in the rating pool of each game, only the earliest of
+    them and the ones held after it.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        sessions (list[Session]): Sessions whose finishing order changed.
+    """
+    games: defaultdict[int, list[Session]] = defaultdict(list)
+    for session in sessions:
+        games[session.round.category.game_id].append(session)
+
+    for game_id, game_sessions in games.items():
+        replay_ratings(db, since=min(game_sessions, key=session_order), game_id=game_id)
+    if games:
+        bump_cache_version(db, RATINGS_CACHE_KEY)
+
+
+def save_and_apply_penalties(db: DBSession, penalties: list[Penalty]) -> None:
+    """Saves the given penalties and applies them in a single transaction.
+    Each round affected by a time penalty is recomputed once, and points are
+    recalculated once for each category, however many penalties were given.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        penalties (list[Penalty]): Penalty objects to persist to the database.
+
+    Raises:
+        ValueError: Raised when the qualifying result a penalty refers to couldn't
+            be found.
+    """
+
+    categories: dict[int, Category] = {}
+    rounds: dict[int, Round] = {
+        penalty.round.id: penalty.round
+        for penalty in penalties
+        if penalty.time_penalty and not penalty.session.is_quali
+    }
+    for rnd in rounds.values():
+        record_original_racetimes(db, rnd)
+
+    for penalty in penalties:
+        if penalty.session.is_quali:
+            result = db.execute(
+                select(QualifyingResult)
+                .where(QualifyingResult.driver_id == penalty.driver.id)
+                .where(QualifyingResult.session_id == penalty.session.id)
+            ).one_or_none()
+
+            if not result:
+                raise ValueError("QualifyingResult not in database.")
+
+        # Applies licence points and warnings to the penalised driver's record.
+        # (Points deductions are recorded in the points ledger)
+        for driver_category in penalty.driver.categories:
+            if driver_category.category_id == penalty.category.id:
+                driver_category.licence_points -= penalty.licence_points
+                driver_category.warnings += penalty.warnings
+
+        db.add(penalty)
+        categories[penalty.category.id] = penalty.category
+
+    reordered: list[Session] = []
+    for rnd in rounds.values():
+        reordered.extend(recompute_round(db, rnd))
+    replay_ratings_after(db, reordered)
+    for category_id in {rnd.category_id for rnd in rounds.values()}:
+        update_head_to_head(db, categories[category_id])
 
-    for p, driver in enumerate(drivers, 1):
-        driver.position = p
+    for category in categories.values():
+        refresh_category_points(db, category)
 
+    round_ids = {penalty.round.id for penalty in penalties}
     db.commit()
+    refresh_analytics(db, round_ids)
 
 
 def save_and_apply_penalty(db: DBSession, penalty: Penalty) -> None:
@@ -486,141 +1699,159 @@ def save_and_apply_penalty(db: DBSession, penalty: Penalty) -> None:
         db (DBSession): Session to execute the query with.
         penalty (Penalty): Penalty object to persist to the database.
     """
+    save_and_apply_penalties(db, [penalty])
 
-    # Applies licence points and warnings to the penalised driver's record.
-    for driver_category in penalty.driver.categories:
-        if driver_category.category_id == penalty.category.id:
-            driver_category.licence_points -= penalty.licence_points
-            driver_category.warnings += penalty.warnings
-            driver_category.points -= penalty.points
-
-            if penalty.points:
-                if team := driver_category.driver.current_team():
-                    team_championship = team.get_championship(
-                        driver_category.category.championship_id
-                    )
-                    team_championship.points -= penalty.points  # type:  ignore
-                # Sort drivers in case standings changed
-                drivers = [d for d in driver_category.category.drivers]
-                drivers.sort(key=lambda d: d.points, reverse=True)
-                for pos, driver in enumerate(drivers):
-                    driver.position = pos
-
-    # If no time penalty was issued there aren't any changes left to make, so it saves and returns.
-    if not penalty.time_penalty:
-        db.add(penalty)
-        db.commit()
-        return
 
-    if penalty.session.is_quali:
-        save_qualifying_penalty(db, penalty)
-        return
+def fetch_category_results(db: DBSession, category: Category) -> CategoryResults:
+    """Loads the results and penalties of the given category into a structure detached
+    from the database, which what-if scenarios can be simulated on.
 
-    # Gets the race results from the relevant session ordered by finishing position.
-    rows = db.execute(
-        select(RaceResult)
-        .where(RaceResult.session_id == penalty.session.id)
-        .where(RaceResult.status == SessionCompletionStatus.finished)
-        .order_by(RaceResult.position)
-    ).all()
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category to load the results of.
 
-    penalised_race_result: RaceResult | None = None
-    race_results: list[RaceResult] = []
-    driver_points: dict[Driver, float] = {}
-    # Finds the race result belonging to the penalised driver and applies the time penalty
-    for row in rows:
-        race_result: RaceResult = row[0]
-        race_results.append(race_result)
-        driver_points[race_result.driver] = race_result.points_earned
-        if (
-            race_result.driver_id == penalty.driver.id
-            and race_result.status == SessionCompletionStatus.finished
-        ):
-            race_result.total_racetime += penalty.time_penalty  # type: ignore
-            penalised_race_result = race_result
-
-    # Defers the time penalty in case the penalised driver did not complete the race
-    if not penalised_race_result:
-        if penalty.session.name == "Gara 1":
-            driver_points.clear()
-            # If penalty was applied in first race, check if driver completed the second race and apply it there
-            race_results = penalty.round.long_race.race_results
-            for race_result in race_results:
-                race_results.append(race_result)
-                driver_points[race_result.driver] = race_result.points_earned
-                if (
-                    race_result.driver_id == penalty.driver.id
-                    and race_result.status == SessionCompletionStatus.finished
-                ):
-                    race_result.total_racetime += penalty.time_penalty  # type: ignore
-                    penalised_race_result = race_result
-                    break
-
-        elif penalty.session.name in ("Gara", "Gara 2"):
-            category = penalty.category
-            session = penalty.session
-            index = category.rounds.index(session.round) + 1
-
-            if len(category.rounds) == index:
-                db.commit()
-                return
-
-            db.commit()
-            return
-
-    # Sorts the race results after the time penalty has been applied
-    race_results.sort(key=lambda x: x.total_racetime)  # type: ignore
-
-    # Applies the correct finishing position, recalculates the gap_to_first.
-    best_time = race_results[0].total_racetime
-    for position, result in enumerate(race_results, start=1):
-        result.gap_to_first = result.total_racetime - best_time  # type: ignore
-        result.position = position
-
-    # Remove points earned before the penalty and add the points after the penalty.
-    drivers: list[DriverCategory] = []
-    for race_result in race_results:
-        driver = race_result.driver
-
-        driver_category: DriverCategory = driver.current_category()  # type: ignore
-
-        team = driver.current_team()
-
-        if team is None:
-            logging.error(
-                "Driver {d} is not associated with a category".format(
-                    race_result.driver.id
-                )
+    Returns:
+        CategoryResults: The detached results of the category.
+    """
+
+    race_query = (
+        select(
+            RaceResult.round_id,
+            RaceResult.session_id,
+            RaceResult.driver_id,
+            sa.literal(False).label("is_quali"),
+            RaceResult.position,
+            (RaceResult.status == SessionCompletionStatus.finished).label("finished"),
+            RaceResult.total_racetime,
+            RaceResult.fastest_lap,
+            Session.fastest_lap_points,
+            PointSystem.id,
+            PointSystem._point_system,
+        )
+        .join(Session, RaceResult.session_id == Session.id)
+        .join(PointSystem, Session.point_system_id == PointSystem.id)
+        .where(RaceResult.category_id == category.id)
+    )
+    quali_query = (
+        select(
+            QualifyingResult.round_id,
+            QualifyingResult.session_id,
+            QualifyingResult.driver_id,
+            sa.literal(True).label("is_quali"),
+            QualifyingResult.position,
+            (QualifyingResult.status == SessionCompletionStatus.finished).label(
+                "finished"
+            ),
+            QualifyingResult.laptime,
+            sa.literal(False).label("fastest_lap"),
+            sa.literal(0).label("fastest_lap_points"),
+            PointSystem.id,
+            PointSystem._point_system,
+        )
+        .join(Session, QualifyingResult.session_id == Session.id)
+        .join(PointSystem, Session.point_system_id == PointSystem.id)
+        .where(QualifyingResult.category_id == category.id)
+    )
+
+    # Teams are read from the points ledger, which already records the team each
+    # driver was racing for in each round.
+    rounds = {rnd.id: rnd for rnd in category.rounds}
+    teams: dict[tuple[int, int], int | None] = {
+        (round_id, driver_id): team_id
+        for round_id, driver_id, team_id in db.execute(
+            select(
+                PointsLedgerEntry.round_id,
+                PointsLedgerEntry.driver_id,
+                PointsLedgerEntry.team_id,
             )
-            raise ValueError(
-                "Driver {d} is not associated with a category".format(
-                    race_result.driver.id
-                )
+            .where(PointsLedgerEntry.category_id == category.id)
+            .where(PointsLedgerEntry.kind == PointsLedgerKind.result)
+            .distinct()
+        ).all()
+    }
+    rows = []
+    for round_id, session_id, driver_id, *columns in db.execute(
+        sa.union_all(race_query, quali_query)
+    ).all():
+        if (round_id, driver_id) not in teams:
+            teams[round_id, driver_id] = _team_id_on_date(
+                db.get(Driver, driver_id),
+                rounds[round_id].date,  # type: ignore
             )
-        drivers.append(driver_category)
+        rows.append(
+            (round_id, session_id, driver_id, teams[round_id, driver_id], *columns)
+        )
 
-        for team_championship in team.championships:
-            if team_championship.championship_id == driver_category.driver_id:
+    deductions = db.execute(
+        select(Penalty.round_id, Penalty.driver_id, Penalty.team_id, Penalty.points)
+        .where(Penalty.category_id == category.id)
+        .where(Penalty.points != 0)
+    ).all()
 
-                driver_category.points -= driver_points[driver]
-                team_championship.points -= driver_points[driver]
+    long_races: dict[int, int] = {}
+    for rnd in category.rounds:
+        sprint_race = rnd.sprint_race
+        if rnd.is_completed and sprint_race and sprint_race.name == "Gara 1":
+            long_races[sprint_race.id] = rnd.long_race.id
+
+    return CategoryResults.from_rows(
+        round_ids=[rnd.id for rnd in category.rounds if rnd.is_completed],
+        driver_ids=[driver.driver_id for driver in category.drivers],
+        rows=rows,
+        deductions=deductions,
+        long_races=long_races,
+        team_points=_fetch_team_points(db, category.championship),
+    )
 
-                points_earned = race_result.points_earned
-                driver_category.points += points_earned
-                team_championship.points += points_earned
-                break
 
-    drivers.sort(key=lambda d: d.points, reverse=True)
+def _fetch_team_points(db: DBSession, championship: Championship) -> dict[int, float]:
+    """Returns the points tally of each team in the championship, summing its points
+    ledger entries."""
+    team_points = {
+        team_championship.team_id: 0.0 for team_championship in championship.teams
+    }
+    team_points.update(
+        db.execute(  # type: ignore
+            select(PointsLedgerEntry.team_id, sa.func.sum(PointsLedgerEntry.points))
+            .where(PointsLedgerEntry.championship_id == championship.id)
+            .where(PointsLedgerEntry.team_id.in_(team_points))
+            .group_by(PointsLedgerEntry.team_id)
+        ).all()
+    )
+    return team_points
 
-    # Apply correct championship positions.
-    for pos, driver in enumerate(drivers, start=1):
-        driver.position = pos
-        if driver.driver_id == penalty.driver_id:
-            break
 
-    db.add(penalty)
-    db.commit()
-    return
+def simulate_penalties(
+    db: DBSession, category: Category, penalties: list[Penalty]
+) -> WhatIfOutcome:
+    """Calculates how the standings would change if the given penalties were applied,
+    without saving them or modifying any result.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category (Category): Category the penalties were given in.
+        penalties (list[Penalty]): Penalties to simulate. They don't need to be
+            persisted, and the ones given in other categories are ignored.
+
+    Returns:
+        WhatIfOutcome: The standings before and after applying the penalties.
+    """
+    scenario = fetch_category_results(db, category).scenario()
+    for penalty in penalties:
+        if penalty.category.id != category.id:
+            continue
+        if penalty.time_penalty:
+            scenario.add_time_penalty(
+                penalty.driver.id, penalty.session.id, penalty.time_penalty
+            )
+        if penalty.points:
+            scenario.deduct_points(
+                penalty.driver.id,
+                penalty.round.id,
+                penalty.points,
+                penalty.team.id if penalty.team else None,
+            )
+    return scenario.outcome()
 
 
 def fetch_category(db: DBSession, category_id: int) -> Category | None:
@@ -667,6 +1898,452 @@ def fetch_drivers(db: DBSession) -> list[Driver]:
     return [r[0] for r in result]
 
 
+def fetch_rating_history(
+    db: DBSession, driver_id: int, game_id: int | None = None
+) -> list[RatingPoint]:
+    """Returns the rating the driver had after each race they finished, in the order
+    races were held in, sprint races included.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        driver_id (int): ID of the driver to get the rating history of.
+        game_id (int | None): If given, only races held in this game are included.
+
+    Returns:
+        list[RatingPoint]: Rating history of the driver, oldest first.
+    """
+
+    statement = (
+        select(
+            Round.date,
+            Round.id,
+            Session.id,
+            Session.name,
+            Category.game_id,
+            RaceResult.mu,
+            RaceResult.sigma,
+        )
+        .join(Round, RaceResult.round_id == Round.id)
+        .join(Session, RaceResult.session_id == Session.id)
+        .join(Category, RaceResult.category_id == Category.id)
+        .where(RaceResult.driver_id == driver_id)
+        .where(RaceResult.status == SessionCompletionStatus.finished)
+        .where(RaceResult.mu.is_not(None), RaceResult.sigma.is_not(None))
+        .order_by(Round.date, Round.id, Session.name, Session.id)
+    )
+    if game_id is not None:
+        statement = statement.where(Category.game_id == game_id)
+
+    return [
+        RatingPoint(*row[:5], mu=float(row.mu), sigma=float(row.sigma))
+        for row in db.execute(statement)
+    ]
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, championship_id, category_id, game_id, version: hashkey(
+        championship_id, category_id, game_id, version
+    ),
+)  # type: ignore
+def _fetch_drivers_stats(
+    db: DBSession,
+    championship_id: int | None,
+    category_id: int | None,
+    game_id: int | None,
+    version: int,
+) -> dict[int, dict[str, int | float]]:
+    race_finished = RaceResult.status == SessionCompletionStatus.finished
+    quali_finished = QualifyingResult.status == SessionCompletionStatus.finished
+    results = sa.union_all(
+        select(
+            RaceResult.driver_id,
+            RaceResult.category_id,
+            sa.literal(False).label("is_quali"),
+            (RaceResult.status != SessionCompletionStatus.dns).label("started"),
+            race_finished.label("finished"),
+            RaceResult.position,
+            RaceResult.fastest_lap,
+            sa.case(
+                (
+                    race_finished,
+                    RaceResult.gap_to_first
+                    * 100.0
+                    / (RaceResult.total_racetime - RaceResult.gap_to_first),
+                )
+            ).label("gap"),
+        ),
+        select(
+            QualifyingResult.driver_id,
+            QualifyingResult.category_id,
+            sa.literal(True),
+            sa.literal(True),
+            quali_finished,
+            QualifyingResult.position,
+            sa.literal(False),
+            sa.case(
+                (
+                    quali_finished,
+                    QualifyingResult.gap_to_first
+                    * 100.0
+                    / (QualifyingResult.laptime - QualifyingResult.gap_to_first),
+                )
+            ),
+        ),
+    ).subquery()
+
+    race = results.c.started & ~results.c.is_quali
+    finished_race = race & results.c.finished
+    finished_quali = results.c.is_quali & results.c.finished
+    races = _count_if(race)
+    qualis = _count_if(finished_quali)
+    statement = (
+        select(
+            results.c.driver_id,
+            _count_if(race & (results.c.position == 1)).label("wins"),
+            _count_if(race & (results.c.position <= 3)).label("podiums"),
+            _count_if(race & results.c.fastest_lap).label("fastest_laps"),
+            _count_if(results.c.is_quali & (results.c.position == 1)).label("poles"),
+            races.label("races_completed"),
+            (
+                sa.cast(_sum_if(finished_race, results.c.position), sa.Float)
+                / sa.func.nullif(races, 0)
+            ).label("avg_race_position"),
+            (
+                sa.cast(_sum_if(finished_quali, results.c.position), sa.Float)
+                / sa.func.nullif(qualis, 0)
+            ).label("avg_quali_position"),
+            (_sum_if(finished_race, results.c.gap) / sa.func.nullif(races, 0)).label(
+                "race_avg_gap_perc"
+            ),
+            (_sum_if(finished_quali, results.c.gap) / sa.func.nullif(qualis, 0)).label(
+                "quali_avg_gap_perc"
+            ),
+        )
+        .join(Category, results.c.category_id == Category.id)
+        .group_by(results.c.driver_id)
+        .order_by(desc("wins"), desc("podiums"), desc("poles"), results.c.driver_id)
+    )
+    if championship_id is not None:
+        statement = statement.where(Category.championship_id == championship_id)
+    if category_id is not None:
+        statement = statement.where(Category.id == category_id)
+    if game_id is not None:
+        statement = statement.where(Category.game_id == game_id)
+
+    stats: dict[int, dict[str, int | float]] = {}
+    for row in db.execute(statement).mappings():
+        driver_stats = dict(row)
+        del driver_stats["driver_id"]
+        for key in ("wins", "podiums", "fastest_laps", "poles", "races_completed"):
+            # MySQL sums are DECIMAL.
+            driver_stats[key] = int(driver_stats[key])
+        for key in (
+            "avg_race_position",
+            "avg_quali_position",
+            "race_avg_gap_perc",
+            "quali_avg_gap_perc",
+        ):
+            value = driver_stats[key]
+            driver_stats[key] = round(float(value), 2) if value else 0
+        stats[row["driver_id"]] = driver_stats
+    return stats
+
+
+def fetch_drivers_stats(
+    db: DBSession,
+    championship_id: int | None = None,
+    category_id: int | None = None,
+    game_id: int | None = None,
+) -> dict[int, dict[str, int | float]]:
+    """Returns the stats of every driver who obtained a result, calculated in a single
+    grouped query over their race and qualifying results. The stats are the same
+    Driver.stats returns, and can be limited to the results obtained in a
+    championship, a category or a game.
+
+    Stats are cached until results are saved or penalties are applied or reversed.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        championship_id (int | None): ID of the championship to count the results of.
+        category_id (int | None): ID of the category to count the results of.
+        game_id (int | None): ID of the game to count the results of.
+
+    Returns:
+        dict[int, dict[str, int | float]]: Stats of each driver, by driver ID. Ordered
+            by wins, podiums and poles.
+    """
+    version = fetch_cache_version(db, STATS_CACHE_KEY)
+    return _fetch_drivers_stats(db, championship_id, category_id, game_id, version)
+
+
+def fetch_top_drivers(
+    db: DBSession,
+    limit: int = 10,
+    offset: int = 0,
+    game_id: int | None = None,
+) -> list[tuple[Driver, Decimal, Decimal, Decimal]]:
+    """Returns the highest rated drivers who are still members and are currently
+    competing in a category, ordered by conservative rating.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        limit (int): Maximum number of drivers to return. Defaults to 10.
+        offset (int): Number of drivers to skip, for pagination. Defaults to 0.
+        game_id (int | None): If given, only drivers competing in a category of this
+            game are returned, ranked by their rating in it.
+
+    Returns:
+        list[tuple[Driver, Decimal, Decimal, Decimal]]: Drivers ordered by
+            descending rating, each with the mu, sigma and conservative rating they
+            are ranked by.
+    """
+
+    competing = (
+        select(DriverCategory.driver_id)
+        .join(Category, DriverCategory.category_id == Category.id)
+        .where(DriverCategory.driver_id == Driver.id)
+        .where(DriverCategory.left_on.is_(None))
+    )
+    if game_id is None:
+        statement = select(
+            Driver, Driver.mu, Driver.sigma, Driver.conservative_rating
+        ).order_by(desc(Driver.conservative_rating), Driver.id)
+    else:
+        competing = competing.where(Category.game_id == game_id)
+        statement = (
+            select(
+                Driver,
+                DriverRating.mu,
+                DriverRating.sigma,
+                DriverRating.conservative_rating,
+            )
+            .join(DriverRating, DriverRating.driver_id == Driver.id)
+            .where(DriverRating.game_id == game_id)
+            .order_by(desc(DriverRating.conservative_rating), Driver.id)
+        )
+
+    statement = (
+        statement.where(Driver.left_on.is_(None))
+        .where(competing.exists())
+        .limit(limit)
+        .offset(offset)
+    )
+    return [tuple(row) for row in db.execute(statement)]  # type: ignore
+
+
+def _race_prediction(db: DBSession, game_id: int, drivers: Any) -> RacePrediction:
+    """Predicts a race between the drivers selected by the given query, which must
+    select the Driver entities, using their ratings in the given game."""
+    rows = db.execute(
+        drivers.add_columns(DriverRating.mu, DriverRating.sigma)
+        .outerjoin(
+            DriverRating,
+            (DriverRating.driver_id == Driver.id) & (DriverRating.game_id == game_id),
+        )
+        .order_by(Driver.id)
+    ).all()
+    return predict_race(
+        [driver.id for driver, _, _ in rows],
+        [driver.abbreviated_name for driver, _, _ in rows],
+        np.array(
+            [float(mu) if mu is not None else TrueSkillEnv.mu for _, mu, _ in rows]
+        ),
+        np.array(
+            [
+                float(sigma) if sigma is not None else TrueSkillEnv.sigma
+                for _, _, sigma in rows
+            ]
+        ),
+    )
+
+
+def fetch_race_prediction(
+    db: DBSession, driver_ids: list[int], game_id: int
+) -> RacePrediction:
+    """Predicts the outcome of a race between the given drivers, held in the given
+    game. Drivers who don't exist are left out.
+
+    Args:
+        db (DBSession): Session to execute the query with.
+        driver_ids (list[int]): IDs of the drivers taking part in the race.
+        game_id (int): ID of the game the race is held in.
+
+    Returns:
+        RacePrediction: Pairwise win probabilities and expected finishing order.
+    """
+    return _race_prediction(
+        db, game_id, select(Driver).where(Driver.id.in_(driver_ids))
+    )
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, round_id, version: hashkey(round_id, version),
+)  # type: ignore
+def _fetch_round_prediction(
+    db: DBSession, round_id: int, version: int
+) -> RacePrediction | None:
+    rnd = db.get(Round, round_id)
+    if not rnd:
+        return None
+
+    drivers = (
+        select(Driver)
+        .join(DriverCategory, DriverCategory.driver_id == Driver.id)
+        .where(DriverCategory.category_id == rnd.category_id)
+        .where(DriverCategory.left_on.is_(None))
+    )
+    return _race_prediction(db, rnd.category.game_id, drivers)
+
+
+def fetch_round_prediction(db: DBSession, round_id: int) -> RacePrediction | None:
+    """Predicts the outcome of the races of a round between the drivers currently in
+    its category.
+
+    Predictions are cached until drivers' ratings change.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        round_id (int): ID of the round.
+
+    Returns:
+        RacePrediction | None: Pairwise win probabilities and expected finishing
+            order, None if the round doesn't exist.
+    """
+    version = fetch_cache_version(db, RATINGS_CACHE_KEY)
+    return _fetch_round_prediction(db, round_id, version)
+
+
+def _fetch_remaining_season(
+    db: DBSession, category: Category, team_indexes: dict[int, int]
+) -> RemainingSeason:
+    """Loads the drivers' points and ratings and the sessions left to be held in the
+    category into a structure detached from the database."""
+    drivers = category.drivers
+    ratings = {
+        rating.driver_id: rating
+        for rating in db.execute(
+            select(DriverRating)
+            .where(DriverRating.game_id == category.game_id)
+            .where(DriverRating.driver_id.in_([d.driver_id for d in drivers]))
+        ).scalars()
+    }
+    current_teams = dict(
+        db.execute(  # type: ignore
+            select(DriverContract.driver_id, DriverContract.team_id)
+            .where(DriverContract.driver_id.in_([d.driver_id for d in drivers]))
+            .where(DriverContract.end.is_(None))
+        ).all()
+    )
+    sessions = [
+        session
+        for rnd in category.rounds
+        if not rnd.is_completed
+        for session in rnd.sessions
+    ]
+    return RemainingSeason(
+        category_id=category.id,
+        driver_ids=np.array([d.driver_id for d in drivers], dtype=np.int64),
+        team_indexes=np.array(
+            [
+                team_indexes.get(current_teams.get(d.driver_id), -1)  # type: ignore
+                for d in drivers
+            ],
+            dtype=np.intp,
+        ),
+        points=np.array([d.points for d in drivers], dtype=float),
+        racing=np.array([d.left_on is None for d in drivers], dtype=bool),
+        mu=np.array(
+            [
+                float(ratings[d.driver_id].mu)
+                if d.driver_id in ratings
+                else TrueSkillEnv.mu
+                for d in drivers
+            ]
+        ),
+        sigma=np.array(
+            [
+                float(ratings[d.driver_id].sigma)
+                if d.driver_id in ratings
+                else TrueSkillEnv.sigma
+                for d in drivers
+            ]
+        ),
+        point_systems=tuple(session.point_system.compiled for session in sessions),
+        fastest_lap_points=np.array(
+            [session.fastest_lap_points for session in sessions], dtype=float
+        ),
+    )
+
+
+@cached(
+    cache=TTLCache(maxsize=50, ttl=86400),
+    key=lambda db, category_id, version, ratings_version: hashkey(
+        category_id, version, ratings_version
+    ),
+)  # type: ignore
+def _fetch_championship_forecast(
+    db: DBSession, category_id: int, version: int, ratings_version: int
+) -> ChampionshipForecast | None:
+    category = db.get(Category, category_id)
+    if not category:
+        return None
+
+    # Every category is simulated, since they all contribute to the constructors'
+    # championship.
+    team_points = _fetch_team_points(db, category.championship)
+    team_indexes = {team_id: i for i, team_id in enumerate(team_points)}
+    categories = db.execute(
+        select(Category)
+        .where(Category.championship_id == category.championship_id)
+        .options(
+            selectinload(Category.drivers),
+            selectinload(Category.rounds)
+            .selectinload(Round.sessions)
+            .joinedload(Session.point_system),
+        )
+    ).scalars()
+    seasons = [
+        _fetch_remaining_season(db, championship_category, team_indexes)
+        for championship_category in categories
+    ]
+    return forecast_championship(
+        seasons,
+        category_id,
+        list(team_points),
+        list(team_points.values()),
+        beta=TrueSkillEnv.beta,
+        seed=version,
+    )
+
+
+def fetch_championship_forecast(
+    db: DBSession, category_id: int
+) -> ChampionshipForecast | None:
+    """Estimates the probability of each driver in the category winning the
+    championship or finishing on the podium, and of each team winning the
+    constructors' championship, by simulating the remaining rounds many times.
+
+    Forecasts are cached until results are saved or penalties are applied.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        category_id (int): ID of the category.
+
+    Returns:
+        ChampionshipForecast | None: The outcome probabilities, None if the category
+            doesn't exist.
+    """
+    category = db.get(Category, category_id)
+    if not category:
+        return None
+
+    version = fetch_cache_version(db, _championship_cache_key(category.championship_id))
+    ratings_version = fetch_cache_version(db, RATINGS_CACHE_KEY)
+    return _fetch_championship_forecast(db, category_id, version, ratings_version)
+
+
 def fetch_round_participants(db: DBSession, round_id: int) -> list[RoundParticipant]:
     """Returns a list containing the participants to a particular round.
 
@@ -680,6 +2357,80 @@ def fetch_round_participants(db: DBSession, round_id: int) -> list[RoundParticip
     return [r[0] for r in result]
 
 
+def fetch_round_lobbies(
+    db: DBSession,
+    round_id: int,
+    capacity: int,
+    keep_teams: bool = True,
+    include_unconfirmed: bool = False,
+) -> Lobbies | None:
+    """Splits the drivers taking part in a round into lobbies of similar strength,
+    going by their rating in the category's game.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        round_id (int): ID of the round.
+        capacity (int): Maximum number of drivers in a lobby.
+        keep_teams (bool): If True, team-mates are put in the same lobby.
+        include_unconfirmed (bool): If True, drivers who haven't confirmed their
+            participation yet are split as well. Drivers who said they won't take
+            part never are.
+
+    Raises:
+        ValueError: If the drivers can't be split into lobbies with the given capacity.
+
+    Returns:
+        Lobbies | None: The drivers in each lobby, None if the round doesn't exist.
+    """
+    rnd = db.get(Round, round_id)
+    if not rnd:
+        return None
+
+    participating = RoundParticipant.participating == Participation.YES
+    if include_unconfirmed:
+        # Drivers who were never asked don't have a row at all.
+        participating = (RoundParticipant.participating != Participation.NO) | (
+            RoundParticipant.driver_id.is_(None)
+        )
+
+    rows = db.execute(
+        select(DriverRating.mu, DriverContract.team_id, DriverCategory.driver_id)
+        .join(
+            RoundParticipant,
+            (RoundParticipant.driver_id == DriverCategory.driver_id)
+            & (RoundParticipant.round_id == rnd.id),
+            isouter=include_unconfirmed,
+        )
+        .join(
+            DriverRating,
+            (DriverRating.driver_id == DriverCategory.driver_id)
+            & (DriverRating.game_id == rnd.category.game_id),
+            isouter=True,
+        )
+        .join(
+            DriverContract,
+            (DriverContract.driver_id == DriverCategory.driver_id)
+            & DriverContract.end.is_(None),
+            isouter=True,
+        )
+        .where(DriverCategory.category_id == rnd.category_id)
+        .where(DriverCategory.left_on.is_(None))
+        .where(participating)
+        .order_by(DriverCategory.driver_id)
+    ).all()
+
+    return split_lobbies(
+        [driver_id for _, _, driver_id in rows],
+        np.array([TrueSkillEnv.mu if mu is None else float(mu) for mu, _, _ in rows]),
+        capacity,
+        groups=(
+            np.array([-1 if team_id is None else team_id for _, team_id, _ in rows])
+            if keep_teams
+            else None
+        ),
+    )
+
+
 def update_participant_status(db: DBSession, participant: RoundParticipant):
     stmt = (
         update(RoundParticipant)
@@ -712,13 +2463,12 @@ def reverse_penalty(db: DBSession, penalty: Penalty):
 
     delete_penalty_stmt = delete(Penalty).where(Penalty.id == penalty.id)
     category = penalty.category
-    drivers = category.active_drivers()
 
     if penalty.protest:
         penalty.protest.is_reviewed = False
 
-    # Gives back licence points, championship points, removes reprimands
-    # and warnings on the penalised driver's record.
+    # Gives back licence points, removes reprimands and warnings on the penalised
+    # driver's record. (Championship points are given back through the points ledger)
     for driver_category in penalty.driver.categories:
         if driver_category.category_id == penalty.category_id:
             if penalty.reprimand:
@@ -726,82 +2476,18 @@ def reverse_penalty(db: DBSession, penalty: Penalty):
 
             driver_category.licence_points += penalty.licence_points
             driver_category.warnings -= penalty.warnings
-            driver_category.points += penalty.points
             break
     else:
         raise RuntimeError()
 
-    # If no time penalty was issued, give back points to the driver's team (if any), save and return.
-    if not penalty.time_penalty:
-        driver_team = penalty.driver.current_team()
-        if driver_team and penalty.points:
-            teams: list[TeamChampionship] = []
-            for team in category.championship.teams:
-                teams.append(team)
-                if driver_team.id == team.team_id:
-                    team.points += penalty.points
-
-        db.execute(delete_penalty_stmt)
-        db.commit()
-        return
-
-    # Gets the race results from the relevant session ordered by finishing position.
-    rows = db.execute(
-        select(RaceResult)
-        .where(RaceResult.session_id == penalty.session_id)
-        .where(RaceResult.status == SessionCompletionStatus.finished)
-        .order_by(RaceResult.position)
-    ).all()
-
-    race_results: list[RaceResult] = []
-    # Finds the no longer penalised driver's race result and removes the time penalty from it.
-    driver_points_before_penalty_deletion: dict[Driver, float] = {}
-    for i, row in enumerate(rows):
-        race_result: RaceResult = row[0]
-        race_results.append(race_result)
-        driver_points_before_penalty_deletion[race_result.driver] = (
-            race_result.points_earned
-        )
-
-        # Remove the penalty from the driver's result
-        if race_result.driver_id == penalty.driver_id:
-            race_result.total_racetime -= penalty.time_penalty  # type: ignore
-            race_result.gap_to_first -= penalty.time_penalty  # type: ignore
-
-            if (
-                len(row) < i + 1
-                and rows[i - 1][0].gap_to_first < race_result.gap_to_first
-            ):
-                db.execute(delete_penalty_stmt)
-                db.commit()
-                return
-
-    race_results.sort(key=lambda x: x.total_racetime)  # type: ignore
-
-    # Applies the correct finishing position, recalculates the gap_to_first and points.
-    best_time = race_results[0].total_racetime
-    driver_points_after_penalty_deletion: dict[Driver, float] = {}
-    for position, result in enumerate(race_results, start=1):
-        result.gap_to_first = result.total_racetime - best_time  # type: ignore
-        result.position = position
-        driver_points_after_penalty_deletion[result.driver] = result.points_earned
-
-    # Apply championships standings changes
-    for driver_category in drivers:
-        driver = driver_category.driver
-        if driver in driver_points_after_penalty_deletion:
-            delta = (
-                driver_points_before_penalty_deletion[driver]
-                - driver_points_after_penalty_deletion[driver]
-            )
-            driver_category.points -= delta
-            driver.current_team().get_championship(category.championship_id).points -= delta  # type: ignore
-
-    drivers.sort(key=lambda d: d.points, reverse=True)
-
-    for position, driver_category in enumerate(drivers):
-        driver_category.position = position
-
+    if penalty.time_penalty:
+        record_original_racetimes(db, penalty.round)
     db.execute(delete_penalty_stmt)
+    if penalty.time_penalty:
+        replay_ratings_after(db, recompute_round(db, penalty.round))
+        update_head_to_head(db, category)
+
+    refresh_category_points(db, category)
+    round_id = penalty.round_id
     db.commit()
-    return
+    refresh_analytics(db, [round_id])
@@ -0,0 +1,584 @@
+"""
+This module contains the rating replay, which recalculates the TrueSkill rating of every
+driver by going through their whole race history, one session at a time, and rate_race,
+a NumPy implementation of TrueSkill specialised for races, which are free-for-all
+matches where nobody draws.
+"""
+
+from __future__ import annotations
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Any, Hashable, Iterable, Iterator, Sequence
+
+import numpy as np
+import sqlalchemy as sa
+import trueskill as ts  # type: ignore
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session as DBSession
+
+from models import (
+    K,
+    Category,
+    Driver,
+    DriverRating,
+    RaceResult,
+    Round,
+    Session,
+    SessionCompletionStatus,
+)
+
+TrueSkillEnv = ts.TrueSkill(
+    draw_probability=0,
+)
+
+# Number of rows fetched from the database, and written to it, at a time.
+BATCH_SIZE = 1000
+
+# rate_race stops once no message changes by more than this between iterations, and
+# gives up after MAX_ITERATIONS. Races converge in about ten.
+MIN_DELTA = 1e-6
+MAX_ITERATIONS = 100
+
+
+def _erfc(x: np.ndarray) -> np.ndarray:
+    """Complementary error function, with the same approximation trueskill uses."""
+    z = np.abs(x)
+    t = 1.0 / (1.0 + z / 2.0)
+    # fmt: off
+    r = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (
+        0.37409196 + t * (0.09678418 + t * (-0.18628806 + t * (
+            0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+                -0.82215223 + t * 0.17087277
+            )))
+        )))
+    )))
+    # fmt: on
+    return np.where(x < 0, 2.0 - r, r)
+
+
+def normal_cdf(x: np.ndarray) -> np.ndarray:
+    """Cumulative distribution function of the standard normal distribution."""
+    return 0.5 * _erfc(-x / math.sqrt(2))
+
+
+def normal_pdf(x: np.ndarray) -> np.ndarray:
+    """Probability density function of the standard normal distribution."""
+    return np.exp(-(x**2) / 2) / math.sqrt(2 * math.pi)
+
+
+def _performances(
+    prior_pi: np.ndarray,
+    prior_tau: np.ndarray,
+    diff_pi: np.ndarray,
+    diff_tau: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the mean and covariance of the drivers' performances, given their prior
+    and the messages sent to the differences between consecutive drivers."""
+
+    n = len(prior_pi)
+    k = np.arange(n - 1)
+    precision = np.diag(prior_pi)
+    precision[k, k] += diff_pi
+    precision[k + 1, k + 1] += diff_pi
+    precision[k, k + 1] -= diff_pi
+    precision[k + 1, k] -= diff_pi
+    covariance = np.linalg.inv(precision)
+
+    shift = prior_tau.copy()
+    shift[:-1] += diff_tau
+    shift[1:] -= diff_tau
+    return covariance @ shift, covariance
+
+
+def rate_race(mu: np.ndarray, sigma: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Updates the ratings of the drivers who finished a race, with the same result
+    TrueSkillEnv.rate gives when every driver is in a team of their own and nobody
+    ties.
+
+    Each driver's performance is compared with the one of the driver who finished
+    right behind them. The messages the comparisons send are updated all at once,
+    with expectation propagation, from the exact posterior of the performances, until
+    they converge.
+
+    Args:
+        mu (np.ndarray): Mean of each driver's rating, in finishing order.
+        sigma (np.ndarray): Standard deviation of each driver's rating, in finishing
+            order.
+
+    Raises:
+        ValueError: Raised when less than two drivers are given.
+        FloatingPointError: Raised when the outcome is too unlikely to be
+            calculated, as TrueSkillEnv.rate does.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Updated mean and standard deviation of each
+            driver's rating.
+    """
+    if len(mu) < 2:
+        raise ValueError("At least two drivers are needed to rate a race.")
+
+    skill_var = sigma**2 + TrueSkillEnv.tau**2
+    performance_var = skill_var + TrueSkillEnv.beta**2
+    prior_pi = 1 / performance_var
+    prior_tau = mu / performance_var
+
+    diff_pi = np.zeros(len(mu) - 1)
+    diff_tau = np.zeros(len(mu) - 1)
+    k = np.arange(len(mu) - 1)
+    for _ in range(MAX_ITERATIONS):
+        mean, covariance = _performances(prior_pi, prior_tau, diff_pi, diff_tau)
+        var = covariance[k, k] + covariance[k + 1, k + 1] - 2 * covariance[k, k + 1]
+
+        cavity_pi = 1 / var - diff_pi
+        cavity_tau = (mean[:-1] - mean[1:]) / var - diff_tau
+        sqrt_pi = np.sqrt(cavity_pi)
+        x = cavity_tau / sqrt_pi
+        cdf = normal_cdf(x)
+        v = np.where(cdf > 0, normal_pdf(x) / np.where(cdf > 0, cdf, 1), -x)
+        w = v * (v + x)
+        if not np.all((0 < w) & (w < 1)):
+            raise FloatingPointError("Race outcome too unlikely to be rated.")
+
+        new_pi = cavity_pi / (1 - w) - cavity_pi
+        new_tau = (cavity_tau + sqrt_pi * v) / (1 - w) - cavity_tau
+        delta = max(np.abs(new_pi - diff_pi).max(), np.abs(new_tau - diff_tau).max())
+        diff_pi, diff_tau = new_pi, new_tau
+        if delta < MIN_DELTA:
+            break
+
+    mean, covariance = _performances(prior_pi, prior_tau, diff_pi, diff_tau)
+    gain = skill_var / performance_var
+    return (
+        mu + gain * (mean - mu),
+        np.sqrt(skill_var * (1 - gain) + gain**2 * np.diag(covariance)),
+    )
+
+
+# A driver's rating pool: the ID of the driver and the one of the game.
+PoolKey = tuple[int, int]
+
+
+@dataclass
+class Ratings:
+    """Ratings of drivers in each game, stored in float arrays indexed through index.
+
+    Attributes:
+        index (dict[PoolKey, int]): Index of each rating in the arrays, by driver ID
+            and game ID.
+        mu (np.ndarray): Mean of each rating.
+        sigma (np.ndarray): Standard deviation of each rating.
+    """
+
+    index: dict[PoolKey, int]
+    mu: np.ndarray
+    sigma: np.ndarray
+
+    @classmethod
+    def initial(cls, keys: Iterable[PoolKey]) -> Ratings:
+        """Returns the ratings drivers start with before their first race in a game."""
+        index = {key: i for i, key in enumerate(keys)}
+        return cls(
+            index=index,
+            mu=np.full(len(index), TrueSkillEnv.mu),
+            sigma=np.full(len(index), TrueSkillEnv.sigma),
+        )
+
+    def indexes(self, keys: Sequence[PoolKey]) -> np.ndarray:
+        """Returns the indexes of the given ratings in the arrays."""
+        return np.fromiter(
+            (self.index[key] for key in keys), dtype=np.intp, count=len(keys)
+        )
+
+
+@dataclass(frozen=True)
+class RatingPoint:
+    """Rating a driver had right after finishing a race.
+
+    Attributes:
+        date (date): Date of the round the race was part of.
+        round_id (int): ID of the round the race was part of.
+        session_id (int): ID of the race.
+        session_name (str): Name of the race.
+        game_id (int): ID of the game the race was held in.
+        mu (float): Mean of the driver's rating in the game after the race.
+        sigma (float): Standard deviation of the driver's rating in the game after
+            the race.
+    """
+
+    date: date
+    round_id: int
+    session_id: int
+    session_name: str
+    game_id: int
+    mu: float
+    sigma: float
+
+    @property
+    def rating(self) -> float:
+        """Conservative rating, as Driver.rating."""
+        return self.mu - float(K) * self.sigma
+
+
+def rating_delta(history: Sequence[RatingPoint]) -> float | None:
+    """Returns how much the rating changed in the last race of the given history,
+    compared to the previous race held in the same game, or None if the driver hasn't
+    finished two races in that game."""
+    for point in reversed(history[:-1]):
+        if point.game_id == history[-1].game_id:
+            return history[-1].rating - point.rating
+    return None
+
+
+@dataclass(frozen=True)
+class RacePrediction:
+    """Predicted outcome of a race between the given drivers, based on their ratings.
+
+    Attributes:
+        driver_ids (tuple[int, ...]): IDs of the drivers taking part in the race.
+        driver_names (tuple[str, ...]): Abbreviated name of each driver.
+        win_probabilities (np.ndarray): Read-only matrix where [i, j] is the
+            probability of the i-th driver finishing ahead of the j-th one.
+    """
+
+    driver_ids: tuple[int, ...]
+    driver_names: tuple[str, ...]
+    win_probabilities: np.ndarray
+
+    @property
+    def expected_positions(self) -> np.ndarray:
+        """Expected finishing position of each driver: one, plus the probability of
+        each other driver finishing ahead of them."""
+        return 1 + self.win_probabilities.sum(axis=0)
+
+    def expected_order(self) -> list[tuple[int, str, float]]:
+        """Returns the ID, name and expected position of each driver, in the order
+        they're expected to finish in."""
+        positions = self.expected_positions.tolist()
+        return sorted(
+            zip(self.driver_ids, self.driver_names, positions), key=itemgetter(2)
+        )
+
+
+def predict_race(
+    driver_ids: Sequence[int],
+    driver_names: Sequence[str],
+    mu: np.ndarray,
+    sigma: np.ndarray,
+) -> RacePrediction:
+    """Predicts the outcome of a race from the ratings of the drivers taking part in it,
+    comparing the performance distributions of every pair of drivers at once.
+
+    Args:
+        driver_ids (Sequence[int]): IDs of the drivers.
+        driver_names (Sequence[str]): Names of the drivers.
+        mu (np.ndarray): Mean of each driver's rating.
+        sigma (np.ndarray): Standard deviation of each driver's rating.
+
+    Returns:
+        RacePrediction: The predicted outcome.
+    """
+    spread = np.sqrt(
+        2 * TrueSkillEnv.beta**2 + sigma[:, np.newaxis] ** 2 + sigma[np.newaxis, :] ** 2
+    )
+    win_probabilities = normal_cdf((mu[:, np.newaxis] - mu[np.newaxis, :]) / spread)
+    np.fill_diagonal(win_probabilities, 0)
+    win_probabilities.setflags(write=False)
+    return RacePrediction(tuple(driver_ids), tuple(driver_names), win_probabilities)
+
+
+def session_order(session: Session) -> tuple[date, int, str, int]:
+    """Returns the key sessions are replayed in the order of."""
+    return (session.round.date, session.round.id, session.name, session.id)
+
+
+def _session_key() -> Any:
+    return sa.tuple_(Round.date, Round.id, Session.name, Session.id)
+
+
+def _in_range(statement: Any, since: Session | None, game_id: int | None) -> Any:
+    """Restricts a query on race results to the sessions held from the given one
+    onwards, in the categories of the given game."""
+    statement = statement.join(Round, RaceResult.round_id == Round.id).join(
+        Session, RaceResult.session_id == Session.id
+    )
+    if since is not None:
+        statement = statement.where(_session_key() >= session_order(since))
+    if game_id is not None:
+        statement = statement.where(Category.game_id == game_id)
+    return statement
+
+
+def _finished_race_results(
+    db: DBSession, since: Session | None = None, game_id: int | None = None
+) -> Iterator[tuple[tuple[int, ...], tuple[PoolKey, ...]]]:
+    """Streams the finished race results, grouped by session, in the order sessions
+    were held in. Each group contains the IDs of its results and the rating pools of
+    the drivers who obtained them, in finishing order."""
+
+    statement = _in_range(
+        select(
+            RaceResult.session_id,
+            RaceResult.id,
+            RaceResult.driver_id,
+            Category.game_id,
+        ).join(Category, RaceResult.category_id == Category.id),
+        since,
+        game_id,
+    )
+    statement = (
+        statement.where(RaceResult.status == SessionCompletionStatus.finished)
+        .order_by(Round.date, Round.id, Session.name, Session.id, RaceResult.position)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+
+    for _, rows in groupby(db.execute(statement), key=itemgetter(0)):
+        _, result_ids, driver_ids, game_ids = zip(*rows)
+        yield result_ids, tuple(zip(driver_ids, game_ids))
+
+
+def _session_levels(sessions: Sequence[Sequence[Hashable]]) -> list[list[int]]:
+    """Groups sessions, given the rating pools of the drivers who took part in each of
+    them in the order they were held in, by their level in the graph where each session
+    depends on the earlier ones it shares a rating with.
+
+    Every session is in a later level than the sessions it depends on, and sessions in
+    the same level have no ratings in common, so they can be rated in any order.
+
+    Returns:
+        list[list[int]]: Indexes of the sessions in each level.
+    """
+    key_levels: dict[Hashable, int] = {}
+    levels: list[list[int]] = []
+    for i, keys in enumerate(sessions):
+        level = 1 + max((key_levels.get(key, -1) for key in keys), default=-1)
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(i)
+        key_levels.update((key, level) for key in keys)
+    return levels
+
+
+def _rate_races(
+    fields: list[tuple[np.ndarray, np.ndarray]],
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Rates each of the given races with rate_race."""
+    return [rate_race(mu, sigma) for mu, sigma in fields]
+
+
+def _last_results(keys: Any, *where: Any) -> Any:
+    """Returns a subquery with the mu and sigma stored in the last finished result of
+    each rating pool, among the results matching the given conditions. The rows of the
+    last results have row_number 1."""
+    return (
+        select(
+            RaceResult.driver_id,
+            Category.game_id,
+            RaceResult.mu,
+            RaceResult.sigma,
+            sa.func.row_number()
+            .over(
+                partition_by=keys,
+                order_by=(
+                    Round.date.desc(),
+                    Round.id.desc(),
+                    Session.name.desc(),
+                    Session.id.desc(),
+                ),
+            )
+            .label("row_number"),
+        )
+        .join(Category, RaceResult.category_id == Category.id)
+        .join(Round, RaceResult.round_id == Round.id)
+        .join(Session, RaceResult.session_id == Session.id)
+        .where(RaceResult.status == SessionCompletionStatus.finished)
+        .where(RaceResult.mu.is_not(None), RaceResult.sigma.is_not(None))
+        .where(*where)
+        .subquery()
+    )
+
+
+def _ratings_before(
+    db: DBSession, since: Session | None, game_id: int | None
+) -> Ratings:
+    """Returns the ratings the drivers who took part in the given session, or in any of
+    the following ones, had right before it, in each game they raced in. They are
+    restored from the rating stored in each driver's last result in the game, or are
+    the initial ones for drivers who didn't race in it before the session."""
+
+    keys = db.execute(
+        _in_range(
+            select(RaceResult.driver_id, Category.game_id)
+            .join(Category, RaceResult.category_id == Category.id)
+            .distinct(),
+            since,
+            game_id,
+        )
+    ).all()
+    ratings = Ratings.initial(tuple(key) for key in keys)
+    if since is None:
+        return ratings
+
+    last_results = _last_results(
+        (RaceResult.driver_id, Category.game_id),
+        _session_key() < session_order(since),
+        RaceResult.driver_id.in_({driver_id for driver_id, _ in keys}),
+        *((Category.game_id == game_id,) if game_id is not None else ()),
+    )
+    for driver_id, result_game_id, mu, sigma in db.execute(
+        select(
+            last_results.c.driver_id,
+            last_results.c.game_id,
+            last_results.c.mu,
+            last_results.c.sigma,
+        ).where(last_results.c.row_number == 1)
+    ).all():
+        i = ratings.index.get((driver_id, result_game_id))
+        if i is not None:
+            ratings.mu[i] = mu
+            ratings.sigma[i] = sigma
+    return ratings
+
+
+def _save_driver_ratings(db: DBSession, ratings: Ratings) -> None:
+    """Writes the given ratings to DriverRating, then sets each driver's mu and sigma to
+    their rating in the game of the last race they finished."""
+
+    driver_ids = {driver_id for driver_id, _ in ratings.index}
+    existing = set(
+        db.execute(
+            select(DriverRating.driver_id, DriverRating.game_id).where(
+                DriverRating.driver_id.in_(driver_ids)
+            )
+        )
+        .tuples()
+        .all()
+    )
+    rows = [
+        {
+            "driver_id": driver_id,
+            "game_id": game_id,
+            "mu": round(mu, 5),
+            "sigma": round(sigma, 5),
+        }
+        for (driver_id, game_id), mu, sigma in zip(
+            ratings.index, ratings.mu.tolist(), ratings.sigma.tolist()
+        )
+    ]
+    updated = [row for row in rows if (row["driver_id"], row["game_id"]) in existing]
+    inserted = [
+        row for row in rows if (row["driver_id"], row["game_id"]) not in existing
+    ]
+    for i in range(0, len(updated), BATCH_SIZE):
+        db.execute(update(DriverRating), updated[i : i + BATCH_SIZE])
+    for i in range(0, len(inserted), BATCH_SIZE):
+        db.execute(insert(DriverRating), inserted[i : i + BATCH_SIZE])
+
+    last_results = _last_results(
+        RaceResult.driver_id, RaceResult.driver_id.in_(driver_ids)
+    )
+    current_ratings = {
+        driver_id: {"id": driver_id, "mu": mu, "sigma": sigma}
+        for driver_id, mu, sigma in db.execute(
+            select(DriverRating.driver_id, DriverRating.mu, DriverRating.sigma)
+            .join(
+                last_results,
+                (last_results.c.driver_id == DriverRating.driver_id)
+                & (last_results.c.game_id == DriverRating.game_id),
+            )
+            .where(last_results.c.row_number == 1)
+        )
+    }
+    driver_ratings = [
+        current_ratings.get(
+            driver_id,
+            {"id": driver_id, "mu": TrueSkillEnv.mu, "sigma": TrueSkillEnv.sigma},
+        )
+        for driver_id in driver_ids
+    ]
+    for i in range(0, len(driver_ratings), BATCH_SIZE):
+        db.execute(update(Driver), driver_ratings[i : i + BATCH_SIZE])
+
+
+def replay_ratings(
+    db: DBSession,
+    since: Session | None = None,
+    workers: int | None = None,
+    game_id: int | None = None,
+) -> int:
+    """Recalculates drivers' ratings, replaying the finished race results in the order
+    they were obtained in. Each game has a separate rating pool.
+
+    If a session is given, only that session and the ones held after it are replayed,
+    starting from the ratings stored in the results obtained before it. Otherwise the
+    whole history is replayed, starting from scratch. If a game is given, only the
+    sessions of its categories are replayed, and only the ratings in its pool change.
+
+    Sessions are grouped by _session_levels, and given more than one worker, the
+    sessions in each group are rated at the same time by a pool of processes. Since
+    they have no ratings in common, the outcome is the same as replaying them one at a
+    time.
+
+    Each result's mu and sigma are set to the rating its driver had in the game after
+    the session, as save_results does. Everything is written with bulk statements once
+    the replay is over, in the same transaction, which is left to the caller to commit.
+
+    Args:
+        db (DBSession): Session to execute the queries with.
+        since (Session | None): Earliest session whose results changed.
+        workers (int | None): Number of processes to rate sessions with. Sessions
+            are rated in this process by default.
+        game_id (int | None): ID of the game to replay the rating pool of. Every game
+            is replayed by default.
+
+    Returns:
+        int: Number of sessions replayed.
+    """
+    db.flush()
+
+    ratings = _ratings_before(db, since, game_id)
+    sessions = list(_finished_race_results(db, since, game_id))
+    result_ratings: list[dict[str, Any]] = []
+    executor = ProcessPoolExecutor(workers) if workers and workers > 1 else None
+    try:
+        for level in _session_levels([keys for _, keys in sessions]):
+            indexes = [ratings.indexes(sessions[i][1]) for i in level]
+            # Races nobody else finished don't tell anything about the driver's skill.
+            rated = [index for index in indexes if len(index) > 1]
+            fields = [(ratings.mu[index], ratings.sigma[index]) for index in rated]
+
+            if executor and len(fields) > 1:
+                size = -(-len(fields) // workers)  # type: ignore
+                chunks = [fields[i : i + size] for i in range(0, len(fields), size)]
+                new_ratings = list(
+                    chain.from_iterable(executor.map(_rate_races, chunks))
+                )
+            else:
+                new_ratings = _rate_races(fields)
+
+            for index, (mu, sigma) in zip(rated, new_ratings):
+                ratings.mu[index] = mu
+                ratings.sigma[index] = sigma
+
+            for i, index in zip(level, indexes):
+                result_ratings.extend(
+                    {"id": result_id, "mu": round(mu, 3), "sigma": round(sigma, 3)}
+                    for result_id, mu, sigma in zip(
+                        sessions[i][0],
+                        ratings.mu[index].tolist(),
+                        ratings.sigma[index].tolist(),
+                    )
+                )
+    finally:
+        if executor:
+            executor.shutdown()
+
+    for i in range(0, len(result_ratings), BATCH_SIZE):
+        db.execute(update(RaceResult), result_ratings[i : i + BATCH_SIZE])
+    _save_driver_ratings(db, ratings)
+
+    return len(sessions)
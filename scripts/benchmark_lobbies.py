@@ -0,0 +1,50 @@
+"""
+This module is for measuring how long split_lobbies takes, and how balanced the lobbies
+it makes are, for grids of different sizes.
+"""
+
+import functools
+import timeit
+
+import numpy as np
+
+from lobbies import split_lobbies
+from ratings import TrueSkillEnv
+
+Grid = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def make_grid(drivers: int, rng: np.random.Generator) -> Grid:
+    """Returns the IDs, skills and teams of a grid where most drivers have a team-mate."""
+    driver_ids = np.arange(1, drivers + 1)
+    mu = rng.normal(TrueSkillEnv.mu, TrueSkillEnv.sigma / 2, drivers)
+    teams = np.repeat(np.arange(drivers // 2), 2)
+    teams = np.concatenate((teams, np.full(drivers - len(teams), -1)))
+    # A tenth of the drivers don't have a team.
+    teams[rng.choice(drivers, drivers // 10, replace=False)] = -1
+    return driver_ids, mu, teams
+
+
+def benchmark_lobbies(
+    grid_sizes: tuple[int, ...] = (20, 50, 100, 200, 300, 500),
+    capacity: int = 16,
+    repeat: int = 5,
+) -> None:
+    rng = np.random.default_rng(0)
+    for drivers in grid_sizes:
+        driver_ids, mu, teams = make_grid(drivers, rng)
+        for groups in (None, teams):
+            split = functools.partial(
+                split_lobbies, driver_ids, mu, capacity, groups=groups
+            )
+            elapsed = min(timeit.repeat(split, number=1, repeat=repeat))
+            lobbies = split()
+            print(
+                f"{drivers} drivers, {len(lobbies)} lobbies"
+                f"{', team-mates together' if groups is not None else ''}: "
+                f"{elapsed * 1000:.1f}ms, spread {lobbies.spread:.4f}"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_lobbies()
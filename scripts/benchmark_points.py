@@ -0,0 +1,106 @@
+"""
+This module is for comparing the speed of the points engine against calculating the
+points through the points_earned properties one result at a time.
+"""
+
+import json
+import random
+import timeit
+
+import numpy as np
+
+from models import (
+    PointSystem,
+    QualifyingResult,
+    RaceResult,
+    Session,
+    SessionCompletionStatus,
+)
+from points import results_points
+
+RACE_POINT_SYSTEM = json.dumps([25, 18, 15, 12, 10, 8, 6, 4, 2, 1] + [0] * 20)
+QUALI_POINT_SYSTEM = json.dumps([1] + [0] * 29)
+
+
+def create_results(sessions: int, drivers: int) -> list[RaceResult | QualifyingResult]:
+    """Creates transient race and qualifying results, so that no database is needed."""
+
+    race_point_system = PointSystem(id=1, _point_system=RACE_POINT_SYSTEM)
+    quali_point_system = PointSystem(id=2, _point_system=QUALI_POINT_SYSTEM)
+
+    results: list[RaceResult | QualifyingResult] = []
+    for session_id in range(sessions):
+        is_quali = session_id % 3 == 0
+        session = Session(
+            id=session_id,
+            name="Qualifica" if is_quali else "Gara",
+            point_system=quali_point_system if is_quali else race_point_system,
+            fastest_lap_points=0 if is_quali else 1,
+        )
+        fastest_lap = random.randrange(drivers)
+        for position in range(1, drivers + 1):
+            status = (
+                SessionCompletionStatus.finished
+                if position < drivers
+                else SessionCompletionStatus.dnf
+            )
+            if is_quali:
+                results.append(
+                    QualifyingResult(session=session, position=position, status=status)
+                )
+            else:
+                results.append(
+                    RaceResult(
+                        session=session,
+                        position=position if position < drivers else None,
+                        fastest_lap=position - 1 == fastest_lap,
+                        status=status,
+                    )
+                )
+    return results
+
+
+def legacy_points_earned(result: RaceResult | QualifyingResult) -> float:
+    """Points earned as they were calculated before the points engine was introduced,
+    parsing the point system again for every result."""
+    if result.status != SessionCompletionStatus.finished:
+        return 0
+    points = json.loads(result.session.point_system._point_system)[result.position - 1]
+    if getattr(result, "fastest_lap", False):
+        points += result.session.fastest_lap_points
+    return points
+
+
+def benchmark_points(sessions: int = 300, drivers: int = 20, repeat: int = 5) -> None:
+    results = create_results(sessions, drivers)
+
+    expected = np.array([result.points_earned for result in results])
+    if not np.allclose(results_points(results), expected):
+        raise RuntimeError("Points engine and points_earned disagree.")
+
+    legacy = min(
+        timeit.repeat(
+            lambda: [legacy_points_earned(result) for result in results],
+            number=1,
+            repeat=repeat,
+        )
+    )
+    per_result = min(
+        timeit.repeat(
+            lambda: [result.points_earned for result in results],
+            number=1,
+            repeat=repeat,
+        )
+    )
+    batched = min(
+        timeit.repeat(lambda: results_points(results), number=1, repeat=repeat)
+    )
+
+    print(f"{len(results)} results")
+    print(f"json.loads per result: {legacy * 1000:.2f}ms")
+    print(f"points_earned: {per_result * 1000:.2f}ms")
+    print(f"results_points: {batched * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark_points()
@@ -0,0 +1,63 @@
+"""
+This module is for comparing the speed of rate_race against TrueSkillEnv.rate, for
+fields of different sizes.
+"""
+
+import functools
+import random
+import timeit
+
+import numpy as np
+
+from ratings import TrueSkillEnv, rate_race
+
+Field = tuple[np.ndarray, np.ndarray]
+
+
+def rate_with_library(fields: list[Field]) -> None:
+    for mu, sigma in fields:
+        TrueSkillEnv.rate(
+            [(TrueSkillEnv.create_rating(m, s),) for m, s in zip(mu, sigma)],
+            list(range(1, len(mu) + 1)),
+        )
+
+
+def rate_vectorized(fields: list[Field]) -> None:
+    for mu, sigma in fields:
+        rate_race(mu, sigma)
+
+
+def benchmark_ratings(
+    field_sizes: tuple[int, ...] = (2, 5, 10, 20, 30), races: int = 200, repeat: int = 5
+) -> None:
+    rng = random.Random(0)
+    for drivers in field_sizes:
+        fields = [
+            (
+                np.array([rng.uniform(15, 35) for _ in range(drivers)]),
+                np.array([rng.uniform(1, TrueSkillEnv.sigma) for _ in range(drivers)]),
+            )
+            for _ in range(races)
+        ]
+
+        library = min(
+            timeit.repeat(
+                functools.partial(rate_with_library, fields), number=1, repeat=repeat
+            )
+        )
+        vectorized = min(
+            timeit.repeat(
+                functools.partial(rate_vectorized, fields), number=1, repeat=repeat
+            )
+        )
+
+        print(
+            f"{drivers} drivers: "
+            f"TrueSkillEnv.rate {library / races * 1000:.3f}ms, "
+            f"rate_race {vectorized / races * 1000:.3f}ms "
+            f"({library / vectorized:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_ratings()
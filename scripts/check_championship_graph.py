@@ -0,0 +1,255 @@
+"""
+This module is for checking that the views starting from fetch_championship issue the
+same number of queries however many drivers take part in the championship, once the
+ChampionshipGraph is loaded. Championships are generated in an in-memory SQLite
+database, so no real data is needed.
+"""
+
+import datetime
+import itertools
+import random
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import sessionmaker
+
+from models import (
+    Base,
+    Category,
+    Championship,
+    Circuit,
+    CircuitConfiguration,
+    Driver,
+    DriverCategory,
+    DriverContract,
+    Game,
+    PointSystem,
+    Protest,
+    QualifyingResult,
+    RaceResult,
+    Round,
+    Session,
+    SessionCompletionStatus,
+    Team,
+    TeamChampionship,
+    TeamRole,
+)
+from queries import (
+    _fetch_points_per_round,
+    fetch_championship,
+    fetch_points_per_round,
+    fetch_standings_table,
+    refresh_category_points,
+)
+
+RACE_POINT_SYSTEM = "[25, 18, 15, 12, 10, 8, 6, 4, 2, 1]"
+QUALI_POINT_SYSTEM = "[1]"
+START = datetime.date(2024, 1, 1)
+
+
+def create_championship(
+    db: DBSession, drivers: int, categories: int = 3, rounds: int = 6
+) -> None:
+    """Creates a championship where every completed round has a qualifying session,
+    two races and a protest."""
+
+    rng = random.Random(drivers)
+    # SQLite only autoincrements INTEGER primary keys, so IDs are given explicitly.
+    ids = itertools.count(1)
+    db.add_all(
+        [
+            Game(id=1, name="gt7"),
+            PointSystem(id=1, _point_system=RACE_POINT_SYSTEM),
+            PointSystem(id=2, _point_system=QUALI_POINT_SYSTEM),
+            TeamRole(id=1, name="driver"),
+            Championship(id=1, name="Championship", start=START, tag="RTI1"),
+            Circuit(id=1, name="Monza", abbreviated_name="Monza", game_id=1),
+            CircuitConfiguration(id=1, circuit_id=1, name="GP"),
+        ]
+    )
+
+    teams = [Team(id=i, name=f"Team {i}", credits=0) for i in range(1, 11)]
+    db.add_all(teams)
+    db.add_all(
+        TeamChampionship(team_id=team.id, championship_id=1, joined_on=START)
+        for team in teams
+    )
+
+    for category_id in range(1, categories + 1):
+        db.add(
+            Category(
+                id=category_id,
+                name=f"Category {category_id}",
+                tag=f"C{category_id}",
+                display_order=category_id,
+                game_id=1,
+                championship_id=1,
+            )
+        )
+
+        category_drivers: list[int] = []
+        for i in range(drivers):
+            driver_id = (category_id - 1) * drivers + i + 1
+            category_drivers.append(driver_id)
+            db.add(
+                Driver(
+                    id=driver_id,
+                    name=f"Name{driver_id}",
+                    surname=f"Surname{driver_id}",
+                    psn_id=f"psn{driver_id}",
+                    hashed_password="",
+                    mu=25,
+                    sigma=25 / 3,
+                )
+            )
+            db.add(
+                DriverContract(
+                    id=driver_id,
+                    driver_id=driver_id,
+                    team_id=teams[i % len(teams)].id,
+                    start=START - datetime.timedelta(days=30),
+                    role_id=1,
+                )
+            )
+            db.add(
+                DriverCategory(
+                    driver_id=driver_id,
+                    category_id=category_id,
+                    race_number=i + 1,
+                    position=i + 1,
+                    joined_on=START,
+                )
+            )
+
+        for number in range(1, rounds + 1):
+            rnd = Round(
+                id=next(ids),
+                number=number,
+                date=START + datetime.timedelta(weeks=number, days=category_id),
+                is_completed=number < rounds,
+                category_id=category_id,
+                championship_id=1,
+                circuit_id=1,
+                configuration_id=1,
+            )
+            for name in ("Qualifica", "Gara 1", "Gara 2"):
+                rnd.sessions.append(
+                    Session(
+                        id=next(ids),
+                        name=name,
+                        fuel_consumption=1,
+                        tyre_degradation=1,
+                        time_of_day="12:00",
+                        laps=10,
+                        point_system_id=2 if name == "Qualifica" else 1,
+                        fastest_lap_points=0 if name == "Qualifica" else 1,
+                    )
+                )
+            db.add(rnd)
+
+            if not rnd.is_completed:
+                continue
+
+            for session in rnd.sessions:
+                order = rng.sample(category_drivers, len(category_drivers))
+                for position, driver_id in enumerate(order, start=1):
+                    result = dict(
+                        id=next(ids),
+                        position=position,
+                        gap_to_first=(position - 1) * 500,
+                        status=SessionCompletionStatus.finished,
+                        driver_id=driver_id,
+                        category_id=category_id,
+                        round=rnd,
+                        session=session,
+                    )
+                    if session.is_quali:
+                        db.add(QualifyingResult(laptime=90000 + position, **result))
+                    else:
+                        db.add(
+                            RaceResult(
+                                total_racetime=1800000 + (position - 1) * 500,
+                                fastest_lap=position == 1,
+                                **result,
+                            )
+                        )
+
+            db.add(
+                Protest(
+                    id=next(ids),
+                    number=1,
+                    incident_time="00:00",
+                    reason="",
+                    is_reviewed=number < rounds - 1,
+                    protested_driver_id=category_drivers[0],
+                    protesting_driver_id=category_drivers[1],
+                    protested_team_id=teams[0].id,
+                    protesting_team_id=teams[1].id,
+                    category_id=category_id,
+                    round=rnd,
+                    session=rnd.sessions[0],
+                )
+            )
+
+    db.flush()
+    championship = db.get(Championship, 1)
+    for category in championship.categories:  # type: ignore
+        refresh_category_points(db, category)
+    db.commit()
+
+
+def visit_championship(db: DBSession) -> None:
+    """Goes through the championship the same way the categories list, the complete
+    standings and the last results views do."""
+
+    championship = fetch_championship(db, load_graph=True)
+    if not championship:
+        raise RuntimeError("Championship not found.")
+
+    for category in championship.categories:
+        last_round = category.last_completed_round()
+        if last_round:
+            any(not protest.is_reviewed for protest in last_round.protests)
+            for session in last_round.sessions:
+                session.results_message()
+
+        drivers = {driver.driver_id: driver.driver for driver in category.drivers}
+        for driver_id, _, _ in fetch_standings_table(db, category).standings():
+            driver = drivers.get(driver_id) or db.get(Driver, driver_id)
+            team = driver.current_team()  # type: ignore
+            f"{team.name if team else ''} {driver.abbreviated_name}"  # type: ignore
+
+    _fetch_points_per_round.cache.clear()  # type: ignore
+    fetch_points_per_round(db, championship.id)
+
+
+def count_queries(drivers: int) -> int:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        create_championship(db, drivers)
+        db.expunge_all()
+
+        queries = 0
+
+        def count(*_) -> None:
+            nonlocal queries
+            queries += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        visit_championship(db)
+        event.remove(engine, "before_cursor_execute", count)
+    return queries
+
+
+def check_championship_graph() -> None:
+    counts = {drivers: count_queries(drivers) for drivers in (5, 20, 80)}
+    for drivers, queries in counts.items():
+        print(f"{drivers} drivers per category: {queries} queries")
+
+    if len(set(counts.values())) != 1:
+        raise RuntimeError("Query count grows with the number of drivers.")
+
+
+if __name__ == "__main__":
+    check_championship_graph()
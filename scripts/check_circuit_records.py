@@ -0,0 +1,224 @@
+"""
+This module is for checking that circuit records are kept up to date as the results of
+each round are saved, and that race records only come from results with lap times:
+the ones uploaded from RaceRoom, not the ones read from PSN screenshots. The rounds are
+generated in an in-memory SQLite database, so no real data is needed. It can be run
+from any directory.
+"""
+
+import datetime
+import itertools
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import sessionmaker
+
+# The repository root, where the models and queries modules are.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import (  # noqa: E402
+    Base,
+    Category,
+    Championship,
+    Circuit,
+    CircuitConfiguration,
+    CircuitRecord,
+    Driver,
+    DriverCategory,
+    DriverContract,
+    Game,
+    PointSystem,
+    QualifyingResult,
+    RaceResult,
+    Round,
+    Session,
+    SessionCompletionStatus,
+    Team,
+    TeamChampionship,
+    TeamRole,
+)
+from queries import save_results, update_circuit_records  # noqa: E402
+
+START = datetime.date(2024, 1, 1)
+DRIVERS = 4
+
+
+def create_rounds(db: DBSession) -> list[Round]:
+    """Creates two rounds held on the same circuit configuration, with no results."""
+
+    db.add_all(
+        [
+            Game(id=1, name="rre"),
+            PointSystem(id=1, _point_system="[25, 18, 15, 12]"),
+            PointSystem(id=2, _point_system="[1]"),
+            TeamRole(id=1, name="driver"),
+            Championship(id=1, name="Championship", start=START, tag="RTI1"),
+            Circuit(id=1, name="Monza", abbreviated_name="Monza", game_id=1),
+            CircuitConfiguration(id=1, circuit_id=1, name="GP"),
+            Team(id=1, name="Team 1", credits=0),
+            Team(id=2, name="Team 2", credits=0),
+            TeamChampionship(team_id=1, championship_id=1, joined_on=START),
+            TeamChampionship(team_id=2, championship_id=1, joined_on=START),
+            Category(
+                id=1,
+                name="Category",
+                tag="C1",
+                display_order=1,
+                game_id=1,
+                championship_id=1,
+            ),
+        ]
+    )
+    for driver_id in range(1, DRIVERS + 1):
+        db.add_all(
+            [
+                Driver(
+                    id=driver_id,
+                    name=f"Name{driver_id}",
+                    surname=f"Surname{driver_id}",
+                    psn_id=f"psn{driver_id}",
+                    hashed_password="",
+                    mu=25,
+                    sigma=25 / 3,
+                ),
+                DriverContract(
+                    id=driver_id,
+                    driver_id=driver_id,
+                    team_id=driver_id % 2 + 1,
+                    start=START,
+                    role_id=1,
+                ),
+                DriverCategory(
+                    driver_id=driver_id,
+                    category_id=1,
+                    race_number=driver_id,
+                    position=driver_id,
+                    joined_on=START,
+                ),
+            ]
+        )
+
+    ids = itertools.count(1)
+    rounds = []
+    for number in (1, 2):
+        rnd = Round(
+            id=number,
+            number=number,
+            date=START + datetime.timedelta(weeks=number),
+            is_completed=False,
+            category_id=1,
+            championship_id=1,
+            circuit_id=1,
+            configuration_id=1,
+        )
+        for name in ("Qualifica", "Gara 1", "Gara 2"):
+            rnd.sessions.append(
+                Session(
+                    id=next(ids),
+                    name=name,
+                    fuel_consumption=1,
+                    tyre_degradation=1,
+                    time_of_day="12:00",
+                    laps=10,
+                    point_system_id=2 if name == "Qualifica" else 1,
+                    fastest_lap_points=0 if name == "Qualifica" else 1,
+                )
+            )
+        db.add(rnd)
+        rounds.append(rnd)
+    db.commit()
+    return rounds
+
+
+def save_round(db: DBSession, rnd: Round, laptime: int, with_laps: bool) -> None:
+    """Saves the results of the round, won by driver 1 in qualifying and by driver 2
+    in the races, where driver 3 sets the fastest lap. Results without laps are saved
+    like the ones read from screenshots, which don't contain lap times."""
+
+    # SQLite only autoincrements INTEGER primary keys, so IDs are given explicitly.
+    ids = itertools.count(rnd.id * 100)
+    qualifying_results = []
+    races: dict[Session, list[RaceResult]] = {}
+    for session in rnd.sessions:
+        for position in range(1, DRIVERS + 1):
+            driver_id = position if session.is_quali else position % DRIVERS + 1
+            result = dict(
+                id=next(ids),
+                position=position,
+                status=SessionCompletionStatus.finished,
+                driver=db.get(Driver, driver_id),
+                category=rnd.category,
+                round=rnd,
+                session=session,
+            )
+            if session.is_quali:
+                qualifying_results.append(
+                    QualifyingResult(
+                        laptime=laptime + position * 100,
+                        gap_to_first=(position - 1) * 100,
+                        **result,
+                    )
+                )
+                continue
+
+            best_laptime = laptime + 500 if driver_id == 3 else laptime + 1000
+            races.setdefault(session, []).append(
+                RaceResult(
+                    total_racetime=laptime * 10 + position * 1000,
+                    gap_to_first=(position - 1) * 1000,
+                    fastest_lap=driver_id == 3,
+                    best_laptime=best_laptime if with_laps else None,
+                    **result,
+                )
+            )
+
+    rnd.is_completed = True
+    save_results(db, qualifying_results, races)
+
+
+def records(db: DBSession) -> list[tuple]:
+    """Returns the laptime, holder and round of the qualifying and race records."""
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(
+                CircuitRecord.quali_laptime,
+                CircuitRecord.quali_driver_id,
+                CircuitRecord.quali_round_id,
+                CircuitRecord.race_laptime,
+                CircuitRecord.race_driver_id,
+                CircuitRecord.race_round_id,
+            )
+        ).all()
+    ]
+
+
+def check_circuit_records() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        first_round, second_round = create_rounds(db)
+
+        # Results read from screenshots only set the qualifying record.
+        save_round(db, first_round, 90000, with_laps=False)
+        if records(db) != [(90100, 1, 1, None, None, None)]:
+            raise RuntimeError(f"Wrong records after the first round: {records(db)}")
+
+        # The RaceRoom results are slower in qualifying, but set the race record.
+        save_round(db, second_round, 91000, with_laps=True)
+        expected = [(90100, 1, 1, 91500, 3, 2)]
+        if records(db) != expected:
+            raise RuntimeError(f"Wrong records after the second round: {records(db)}")
+
+        update_circuit_records(db)
+        db.commit()
+        if records(db) != expected:
+            raise RuntimeError("Rebuilding the records changed them.")
+
+    print("Circuit records match the results, race records come from lap times.")
+
+
+if __name__ == "__main__":
+    check_circuit_records()
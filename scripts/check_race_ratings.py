@@ -0,0 +1,72 @@
+"""
+This module is for checking that rate_race gives the same ratings as TrueSkillEnv.rate,
+on randomly generated races with fields of every size the championship has.
+It can be run from any directory.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# The repository root, where the ratings module is.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ratings import TrueSkillEnv, rate_race  # noqa: E402
+
+TOLERANCE = 1e-4
+
+
+def library_ratings(mu: np.ndarray, sigma: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Rates the race with the trueskill library, one driver per team."""
+    rated = TrueSkillEnv.rate(
+        [(TrueSkillEnv.create_rating(m, s),) for m, s in zip(mu, sigma)],
+        list(range(1, len(mu) + 1)),
+    )
+    return (
+        np.array([rating.mu for (rating,) in rated]),
+        np.array([rating.sigma for (rating,) in rated]),
+    )
+
+
+def random_race(rng: random.Random, drivers: int) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the ratings of a random field, in finishing order. Ratings range from
+    newcomers to drivers who have raced for several seasons."""
+    mu = np.array([rng.uniform(10, 40) for _ in range(drivers)])
+    sigma = np.array([rng.uniform(0.8, TrueSkillEnv.sigma) for _ in range(drivers)])
+    return mu, sigma
+
+
+def check_race_ratings(races: int = 2000, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    worst = 0.0
+    skipped = 0
+    for _ in range(races):
+        mu, sigma = random_race(rng, rng.randint(2, 30))
+        try:
+            expected_mu, expected_sigma = library_ratings(mu, sigma)
+        except FloatingPointError:
+            skipped += 1
+            continue
+        new_mu, new_sigma = rate_race(mu, sigma)
+
+        error = max(
+            np.abs(new_mu - expected_mu).max(), np.abs(new_sigma - expected_sigma).max()
+        )
+        worst = max(worst, error)
+        if error > TOLERANCE:
+            raise RuntimeError(f"Ratings differ by {error} with {len(mu)} drivers.")
+
+        # The winner can only gain, the last driver can only lose, and every result
+        # makes the ratings more certain than they were before the race.
+        if new_mu[0] < mu[0] or new_mu[-1] > mu[-1]:
+            raise RuntimeError("Winner lost rating or last driver gained it.")
+        if np.any(new_sigma > np.sqrt(sigma**2 + TrueSkillEnv.tau**2)):
+            raise RuntimeError("A rating became less certain.")
+
+    print(f"{races - skipped} races checked, largest difference: {worst:.2e}")
+
+
+if __name__ == "__main__":
+    check_race_ratings()
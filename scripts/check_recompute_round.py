@@ -0,0 +1,233 @@
+"""
+This module is for checking that applying and reversing time penalties only reorders
+the races they were given in, keeping lapped drivers behind the drivers on the lead lap
+and the gaps recorded at import. The round is generated in an in-memory SQLite
+database, so no real data is needed. It can be run from any directory.
+"""
+
+import datetime
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session as DBSession
+from sqlalchemy.orm import sessionmaker
+
+# The repository root, where the models and queries modules are.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import (  # noqa: E402
+    Base,
+    Category,
+    Championship,
+    Circuit,
+    CircuitConfiguration,
+    Driver,
+    DriverCategory,
+    DriverContract,
+    Game,
+    Penalty,
+    PointSystem,
+    Protest,
+    RaceResult,
+    Round,
+    Session,
+    SessionCompletionStatus,
+    Team,
+    TeamChampionship,
+    TeamRole,
+)
+from queries import reverse_penalty, save_and_apply_penalty  # noqa: E402
+
+START = datetime.date(2024, 1, 1)
+LAP_TIME = 180000
+LAPS = 10
+
+# Laps completed and gap recorded of each driver, in finishing order. The last driver
+# finished a lap down, so their gap only covers the laps they completed.
+RESULTS = [(10, 0), (10, 1000), (10, 2000), (10, 8000), (10, 12000), (9, 20000)]
+
+
+def create_round(db: DBSession) -> Round:
+    """Creates a completed round with two races, both won by driver 1 and with driver 6
+    finishing a lap down."""
+
+    db.add_all(
+        [
+            Game(id=1, name="gt7"),
+            PointSystem(id=1, _point_system="[25, 18, 15, 12, 10, 8]"),
+            PointSystem(id=2, _point_system="[1]"),
+            TeamRole(id=1, name="driver"),
+            Championship(id=1, name="Championship", start=START, tag="RTI1"),
+            Circuit(id=1, name="Monza", abbreviated_name="Monza", game_id=1),
+            CircuitConfiguration(id=1, circuit_id=1, name="GP"),
+            Team(id=1, name="Team 1", credits=0),
+            Team(id=2, name="Team 2", credits=0),
+            TeamChampionship(team_id=1, championship_id=1, joined_on=START),
+            TeamChampionship(team_id=2, championship_id=1, joined_on=START),
+            Category(
+                id=1,
+                name="Category",
+                tag="C1",
+                display_order=1,
+                game_id=1,
+                championship_id=1,
+            ),
+        ]
+    )
+    for driver_id in range(1, len(RESULTS) + 1):
+        db.add_all(
+            [
+                Driver(
+                    id=driver_id,
+                    name=f"Name{driver_id}",
+                    surname=f"Surname{driver_id}",
+                    psn_id=f"psn{driver_id}",
+                    hashed_password="",
+                    mu=25,
+                    sigma=25 / 3,
+                ),
+                DriverContract(
+                    id=driver_id,
+                    driver_id=driver_id,
+                    team_id=driver_id % 2 + 1,
+                    start=START,
+                    role_id=1,
+                ),
+                DriverCategory(
+                    driver_id=driver_id,
+                    category_id=1,
+                    race_number=driver_id,
+                    position=driver_id,
+                    joined_on=START,
+                ),
+            ]
+        )
+
+    rnd = Round(
+        id=1,
+        number=1,
+        date=START + datetime.timedelta(weeks=1),
+        is_completed=True,
+        category_id=1,
+        championship_id=1,
+        circuit_id=1,
+        configuration_id=1,
+    )
+    for session_id, name in enumerate(("Gara 1", "Gara 2"), start=1):
+        session = Session(
+            id=session_id,
+            name=name,
+            fuel_consumption=1,
+            tyre_degradation=1,
+            time_of_day="12:00",
+            laps=LAPS,
+            point_system_id=1,
+            fastest_lap_points=0,
+        )
+        rnd.sessions.append(session)
+        for position, (laps, gap) in enumerate(RESULTS, start=1):
+            db.add(
+                RaceResult(
+                    position=position,
+                    gap_to_first=gap,
+                    total_racetime=laps * LAP_TIME + gap,
+                    fastest_lap=position == 1,
+                    status=SessionCompletionStatus.finished,
+                    driver_id=position,
+                    category_id=1,
+                    round=rnd,
+                    session=session,
+                )
+            )
+    db.add(rnd)
+    db.add(
+        Protest(
+            id=1,
+            number=1,
+            incident_time="00:00",
+            reason="",
+            is_reviewed=True,
+            protested_driver_id=1,
+            protesting_driver_id=2,
+            protested_team_id=2,
+            protesting_team_id=1,
+            category_id=1,
+            round=rnd,
+            session=rnd.sessions[0],
+        )
+    )
+    db.commit()
+    return rnd
+
+
+def session_results(db: DBSession, session_id: int) -> list[tuple[int, int, int]]:
+    """Returns the driver ID, position and gap of each result in the session."""
+    return [
+        tuple(row)  # type: ignore
+        for row in db.execute(
+            select(RaceResult.driver_id, RaceResult.position, RaceResult.gap_to_first)
+            .where(RaceResult.session_id == session_id)
+            .order_by(RaceResult.position)
+        ).all()
+    ]
+
+
+def penalise_winner(db: DBSession, rnd: Round, time_penalty: int) -> Penalty:
+    """Gives the winner of Gara 1 a time penalty and applies it."""
+    penalty = Penalty(
+        time_penalty=time_penalty,
+        licence_points=0,
+        warnings=0,
+        points=0,
+        number=1,
+        category=rnd.category,
+        round=rnd,
+        session=rnd.sessions[0],
+        driver=db.get(Driver, 1),
+        team=db.get(Team, 2),
+        protest=db.get(Protest, 1),
+    )
+    save_and_apply_penalty(db, penalty)
+    return penalty
+
+
+def check_recompute_round() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        rnd = create_round(db)
+        first_race = session_results(db, 1)
+        second_race = session_results(db, 2)
+
+        # The winner of Gara 1 is given 5 seconds, dropping behind the driver 2 seconds
+        # back but staying ahead of the one 8 seconds back.
+        penalty = penalise_winner(db, rnd, 5000)
+
+        expected = [(2, 1, 0), (3, 2, 1000), (1, 3, 4000), (4, 4, 7000)]
+        expected += [(5, 5, 11000), (6, 6, 19000)]
+        if session_results(db, 1) != expected:
+            raise RuntimeError(f"Gara 1 wasn't reordered: {session_results(db, 1)}")
+        if session_results(db, 2) != second_race:
+            raise RuntimeError("Gara 2 changed without any penalty given in it.")
+
+        reverse_penalty(db, penalty)
+        if session_results(db, 1) != first_race:
+            raise RuntimeError("Reversing the penalty didn't restore Gara 1.")
+
+        # A penalty larger than the lapped driver's gap still leaves the winner ahead
+        # of them, on the lead lap.
+        penalty = penalise_winner(db, rnd, 30000)
+        order = [driver_id for driver_id, _, _ in session_results(db, 1)]
+        if order != [2, 3, 4, 5, 1, 6]:
+            raise RuntimeError(f"The lapped driver moved up: {order}")
+
+        reverse_penalty(db, penalty)
+        if session_results(db, 1) != first_race:
+            raise RuntimeError("Reversing the penalty didn't restore Gara 1.")
+
+    print("Penalties only reorder the lead lap of the race they were given in.")
+
+
+if __name__ == "__main__":
+    check_recompute_round()
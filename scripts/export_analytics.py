@@ -0,0 +1,36 @@
+"""
+This module is for rebuilding the analytics file from scratch, mirroring the results,
+sessions, rounds, drivers and penalties of every completed round into it.
+The file is written to ANALYTICS_DB_PATH.
+"""
+
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from analytics import analytics_enabled, export_analytics
+
+DB_URL = os.environ.get("DB_URL")
+if not DB_URL:
+    raise RuntimeError("DB_URL not found.")
+
+if not analytics_enabled():
+    raise RuntimeError("ANALYTICS_DB_PATH not found, or duckdb isn't installed.")
+
+engine = create_engine(DB_URL)
+
+DBSession = sessionmaker(bind=engine, autoflush=False)
+
+
+def main():
+    sqla_session = DBSession()
+    try:
+        export_analytics(sqla_session)
+    finally:
+        sqla_session.close()
+    print(f"Analytics exported to {os.environ.get('ANALYTICS_DB_PATH')}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+This module is for rebuilding the race results, the points ledger, the points tallies,
+the standings snapshots, the drivers' stats and the head-to-head records of every
+category in the database, and the circuit records.
+"""
+
+import os
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from models import Category
+from queries import (
+    recompute_round,
+    refresh_category_points,
+    update_circuit_records,
+    update_head_to_head,
+)
+
+DB_URL = os.environ.get("DB_URL")
+if not DB_URL:
+    raise RuntimeError("DB_URL not found.")
+
+engine = create_engine(DB_URL)
+
+DBSession = sessionmaker(bind=engine, autoflush=False)
+
+
+def rebuild_standings():
+    """Brings the results of every round up to date with the time penalties given in
+    it, brings the points ledger of every category up to date with them, then
+    rebuilds totals, standings snapshots, drivers' stats and head-to-head records from
+    it. Circuit records are rebuilt last."""
+    sqla_session = DBSession()
+
+    for category in sqla_session.execute(select(Category)).scalars():
+        for rnd in category.rounds:
+            recompute_round(sqla_session, rnd)
+        refresh_category_points(sqla_session, category)
+        update_head_to_head(sqla_session, category)
+        print(f"{category.name}: {len(category.rounds)} rounds")
+
+    update_circuit_records(sqla_session)
+    sqla_session.commit()
+    sqla_session.close()
+
+
+if __name__ == "__main__":
+    rebuild_standings()
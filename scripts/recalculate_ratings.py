@@ -4,14 +4,21 @@ This module contains the driver ranking function.
 
 from decimal import Decimal
 import os
+import time
 
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 import trueskill as ts  # type: ignore
 
-from models import Driver, RaceResult, SessionCompletionStatus
-from queries import get_championship, get_drivers
+from models import Driver, Game, RaceResult, SessionCompletionStatus
+from queries import (
+    RATINGS_CACHE_KEY,
+    bump_cache_version,
+    fetch_championship,
+    fetch_top_drivers,
+)
+from ratings import replay_ratings
 
 TrueSkillEnv = ts.TrueSkill(
     draw_probability=0,
@@ -52,7 +59,7 @@ DBSession = sessionmaker(bind=engine, autoflush=False)
 def recalculate_ratings():
     """Only used to recalculate all the ratings in the last championship."""
     sqla_session = DBSession()
-    championship = get_championship(sqla_session, championship_id=1)
+    championship = fetch_championship(sqla_session, championship_id=1)
 
     if not championship:
         return
@@ -94,7 +101,7 @@ def recalculate_ratings():
     sqla_session.commit()
     sqla_session.expire_all()
 
-    championship = get_championship(sqla_session)
+    championship = fetch_championship(sqla_session)
 
     if not championship:
         return
@@ -107,66 +114,27 @@ def recalculate_ratings():
         print(f"{driver.psn_id_or_full_name}: {driver.mu} - {driver.sigma}")
 
 
-def recalculate_all_ratings():
-    """Only used to recalculate all the ratings in the last championship."""
+def recalculate_all_ratings(game_id: int | None = None):
+    """Recalculates the ratings of every driver from their whole race history, in the
+    rating pool of the given game, or in every one if no game is given."""
     sqla_session = DBSession()
 
-    drivers = get_drivers(sqla_session)
-    for driver in drivers:
-        driver.mu = 25
-        driver.sigma = 25 / 3
+    start = time.perf_counter()
+    sessions = replay_ratings(sqla_session, workers=os.cpu_count(), game_id=game_id)
+    bump_cache_version(sqla_session, RATINGS_CACHE_KEY)
     sqla_session.commit()
-
-    for i in range(1, 6):
-        championship = get_championship(sqla_session, championship_id=i)
-        for category in championship.categories:
-            for round in category.rounds:
-                for session in round.sessions:
-                    if session.is_quali:
-                        continue
-
-                    initial_ratings: list[tuple[ts.Rating]] = []
-                    finishing_positions: list[int] = []
-                    race_results: list[RaceResult] = []
-                    for result in session.race_results:
-                        if result.status == SessionCompletionStatus.finished:
-                            rtg = (
-                                ts.Rating(
-                                    mu=float(result.driver.mu),
-                                    sigma=float(result.driver.sigma),
-                                ),
-                            )
-                            initial_ratings.append(rtg)
-                            finishing_positions.append(result.position)
-                            race_results.append(result)
-                            result.mu = rtg[0].mu
-                            result.sigma = rtg[0].sigma
-                    print(initial_ratings)
-                    print(finishing_positions)
-                    if initial_ratings:
-                        new_ratings = ts.rate(initial_ratings, finishing_positions)
-                        for i, result in enumerate(race_results):
-                            result.driver.mu = Decimal.from_float(
-                                new_ratings[i][0].mu
-                            ).quantize(Decimal("1.000000"))
-                            result.driver.sigma = Decimal.from_float(
-                                new_ratings[i][0].sigma
-                            ).quantize(Decimal("1.000000"))
-
-        sqla_session.commit()
-        sqla_session.expire_all()
-
-        championship = get_championship(sqla_session)
-
-        if not championship:
-            return
-
-        drivers = championship.driver_list
-
-        drivers.sort(key=lambda x: x.rating if x.rating else 0, reverse=True)
-
-        for driver in drivers:
-            print(f"{driver.psn_id_or_abbreviated_name}: {driver.mu} - {driver.sigma}")
+    print(f"{sessions} sessions replayed in {time.perf_counter() - start:.2f}s")
+
+    games = sqla_session.execute(select(Game).order_by(Game.id)).scalars().all()
+    for game in games:
+        if game_id is not None and game.id != game_id:
+            continue
+
+        print(f"\n{game.name}")
+        for driver, _, _, rating in fetch_top_drivers(
+            sqla_session, limit=1000, game_id=game.id
+        ):
+            print(f"{driver.psn_id_or_abbreviated_name}: {round(rating, 3)}")
 
 
 if __name__ == "__main__":
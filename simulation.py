@@ -0,0 +1,676 @@
+"""
+This module contains the what-if simulator, which calculates how the standings of a
+category (and the constructors' standings of its championship) would change if
+hypothetical penalties were given, and the championship forecast, which estimates the
+probability of each outcome of the remaining rounds by simulating them many times.
+Neither of them reads from or writes to the database.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Sequence
+
+import numpy as np
+
+from points import CompiledPointSystem, compile_point_system, score
+from standings import StandingsTable
+
+
+@dataclass(frozen=True)
+class CategoryResults:
+    """Detached, read-only copy of the results and penalties of a category.
+
+    Result attributes are parallel arrays with one element for each race and
+    qualifying result. Arrays are never modified: scenarios copy the ones they change.
+
+    Attributes:
+        round_ids (np.ndarray): IDs of the completed rounds, in chronological order.
+        driver_ids (np.ndarray): IDs of the drivers who are part of the category.
+        result_round_ids (np.ndarray): ID of the round of each result.
+        session_ids (np.ndarray): ID of the session of each result.
+        result_driver_ids (np.ndarray): ID of the driver of each result.
+        team_ids (np.ndarray): ID of the team the driver of each result was racing for.
+            (-1 if unknown)
+        is_quali (np.ndarray): True if the result was obtained in a qualifying session.
+        positions (np.ndarray): Finishing position of each result. (0 if not classified)
+        finished (np.ndarray): True if the result has the finished status.
+        times (np.ndarray): Total race time or qualifying laptime of each result.
+            (NaN if not available)
+        fastest_laps (np.ndarray): True if the result scored the fastest lap.
+        fastest_lap_points (np.ndarray): Points given for the fastest lap in the session
+            of each result.
+        point_systems (tuple[CompiledPointSystem, ...]): Point systems used by the results.
+        point_system_indexes (np.ndarray): Index in point_systems of the point system
+            used by each result.
+        deduction_round_ids (np.ndarray): ID of the round of each points deduction.
+        deduction_driver_ids (np.ndarray): ID of the driver of each points deduction.
+        deduction_team_ids (np.ndarray): ID of the team of each points deduction.
+        deductions (np.ndarray): Points deducted by each penalty.
+        long_races (dict[int, int]): Long race session ID of each round, by the ID of
+            its "Gara 1" session. Time penalties are deferred to it when the driver
+            didn't finish the first race.
+        team_points (dict[int, float]): Points tally of each team in the championship.
+    """
+
+    round_ids: np.ndarray
+    driver_ids: np.ndarray
+    result_round_ids: np.ndarray
+    session_ids: np.ndarray
+    result_driver_ids: np.ndarray
+    team_ids: np.ndarray
+    is_quali: np.ndarray
+    positions: np.ndarray
+    finished: np.ndarray
+    times: np.ndarray
+    fastest_laps: np.ndarray
+    fastest_lap_points: np.ndarray
+    point_systems: tuple[CompiledPointSystem, ...]
+    point_system_indexes: np.ndarray
+    deduction_round_ids: np.ndarray
+    deduction_driver_ids: np.ndarray
+    deduction_team_ids: np.ndarray
+    deductions: np.ndarray
+    long_races: dict[int, int] = field(default_factory=dict)
+    team_points: dict[int, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    @classmethod
+    def from_rows(
+        cls,
+        round_ids: Sequence[int],
+        driver_ids: Sequence[int],
+        rows: Sequence[Sequence[Any]],
+        deductions: Sequence[Sequence[Any]],
+        long_races: dict[int, int],
+        team_points: dict[int, float],
+    ) -> CategoryResults:
+        """Builds the structure from the rows returned by the database.
+
+        Args:
+            round_ids (Sequence[int]): IDs of the completed rounds, in chronological order.
+            driver_ids (Sequence[int]): IDs of the drivers who are part of the category.
+            rows (Sequence[Sequence[Any]]): Rows containing, in order: round_id,
+                session_id, driver_id, team_id, is_quali, position, finished, time,
+                fastest_lap, fastest_lap_points, point_system_id and point_system.
+            deductions (Sequence[Sequence[Any]]): Rows containing, in order: round_id,
+                driver_id, team_id and points of each penalty.
+            long_races (dict[int, int]): Long race session ID by "Gara 1" session ID.
+            team_points (dict[int, float]): Points tally of each team in the championship.
+
+        Returns:
+            CategoryResults: The detached results.
+        """
+        point_systems: dict[int, int] = {}
+        compiled: list[CompiledPointSystem] = []
+        for row in rows:
+            if row[10] not in point_systems:
+                point_systems[row[10]] = len(compiled)
+                compiled.append(compile_point_system(row[10], row[11]))
+
+        columns = list(zip(*rows)) if rows else [()] * 12
+        penalties = list(zip(*deductions)) if deductions else [()] * 4
+        return cls(
+            round_ids=np.array(round_ids, dtype=np.int64),
+            driver_ids=np.array(driver_ids, dtype=np.int64),
+            result_round_ids=np.array(columns[0], dtype=np.int64),
+            session_ids=np.array(columns[1], dtype=np.int64),
+            result_driver_ids=np.array(columns[2], dtype=np.int64),
+            team_ids=np.array([t or -1 for t in columns[3]], dtype=np.int64),
+            is_quali=np.array(columns[4], dtype=bool),
+            positions=np.array([p or 0 for p in columns[5]], dtype=np.int64),
+            finished=np.array(columns[6], dtype=bool),
+            times=np.array(
+                [np.nan if t is None else t for t in columns[7]], dtype=float
+            ),
+            fastest_laps=np.array(columns[8], dtype=bool),
+            fastest_lap_points=np.array([p or 0 for p in columns[9]], dtype=float),
+            point_systems=tuple(compiled),
+            point_system_indexes=np.fromiter(
+                (point_systems[i] for i in columns[10]), dtype=np.intp, count=len(rows)
+            ),
+            deduction_round_ids=np.array(penalties[0], dtype=np.int64),
+            deduction_driver_ids=np.array(penalties[1], dtype=np.int64),
+            deduction_team_ids=np.array(
+                [t or -1 for t in penalties[2]], dtype=np.int64
+            ),
+            deductions=np.array(penalties[3], dtype=float),
+            long_races=long_races,
+            team_points=team_points,
+        )
+
+    @cached_property
+    def _current(self) -> tuple[StandingsTable, dict[int, float]]:
+        return Scenario(self)._standings()
+
+    def scenario(self) -> Scenario:
+        """Returns a new scenario to apply hypothetical penalties to."""
+        return Scenario(self)
+
+
+@dataclass(frozen=True)
+class StandingsChange:
+    """Position and points of a driver or team before and after a scenario is applied.
+
+    Attributes:
+        id (int): ID of the driver or team.
+        position_before (int | None): Current position. (None if not in the standings)
+        position_after (int | None): Position in the scenario.
+        points_before (float): Current points tally.
+        points_after (float): Points tally in the scenario.
+    """
+
+    id: int
+    position_before: int | None
+    position_after: int | None
+    points_before: float
+    points_after: float
+
+    @property
+    def changed(self) -> bool:
+        return (
+            self.position_before != self.position_after
+            or abs(self.points_before - self.points_after) > 1e-6
+        )
+
+
+@dataclass(frozen=True)
+class WhatIfOutcome:
+    """Standings of the drivers in the category and of the teams in the championship,
+    before and after a scenario is applied. Both are ordered by position after it."""
+
+    drivers: list[StandingsChange]
+    teams: list[StandingsChange]
+
+    def changed_drivers(self) -> list[StandingsChange]:
+        return [change for change in self.drivers if change.changed]
+
+    def changed_teams(self) -> list[StandingsChange]:
+        return [change for change in self.teams if change.changed]
+
+
+class Scenario:
+    """Hypothetical changes to a category's results.
+
+    Result arrays are shared with the CategoryResults the scenario was created from and
+    are only copied the first time they are modified, so creating a scenario is free.
+    """
+
+    def __init__(self, results: CategoryResults) -> None:
+        self.results = results
+        self._arrays: dict[str, np.ndarray] = {}
+        self._deductions: list[tuple[int, int, int, float]] = []
+        self._sessions_to_reorder: set[int] = set()
+
+    def _array(self, name: str) -> np.ndarray:
+        return self._arrays.get(name, getattr(self.results, name))
+
+    def _writable(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = getattr(self.results, name).copy()
+        return self._arrays[name]
+
+    def _rows(self, driver_id: int, session_id: int) -> np.ndarray:
+        return np.flatnonzero(
+            (self.results.result_driver_ids == driver_id)
+            & (self.results.session_ids == session_id)
+            & self._array("finished")
+        )
+
+    def add_time_penalty(
+        self, driver_id: int, session_id: int, time_penalty: float
+    ) -> Scenario:
+        """Adds a time penalty to the driver's race result, exactly as applying a Penalty
+        would: it is deferred to the long race if the driver didn't finish "Gara 1",
+        and ignored in qualifying sessions.
+
+        Args:
+            driver_id (int): ID of the penalised driver.
+            session_id (int): ID of the session the penalty was given in.
+            time_penalty (float): Time to add to the driver's total race time.
+
+        Returns:
+            Scenario: The scenario itself, so that changes can be chained.
+        """
+        rows = self._rows(driver_id, session_id)
+        rows = rows[~self.results.is_quali[rows]]
+        if not len(rows) and session_id in self.results.long_races:
+            session_id = self.results.long_races[session_id]
+            rows = self._rows(driver_id, session_id)
+
+        if len(rows):
+            self._writable("times")[rows] += time_penalty
+            self._sessions_to_reorder.add(session_id)
+        return self
+
+    def deduct_points(
+        self, driver_id: int, round_id: int, points: float, team_id: int | None = None
+    ) -> Scenario:
+        """Deducts points from the driver, and from their team, in the given round.
+
+        Args:
+            driver_id (int): ID of the penalised driver.
+            round_id (int): ID of the round the penalty was given in.
+            points (float): Points to deduct.
+            team_id (int | None): ID of the team to deduct the points from. Defaults to
+                the team the driver raced for in the round.
+
+        Returns:
+            Scenario: The scenario itself, so that changes can be chained.
+        """
+        if team_id is None:
+            rows = np.flatnonzero(
+                (self.results.result_driver_ids == driver_id)
+                & (self.results.result_round_ids == round_id)
+            )
+            team_id = int(self.results.team_ids[rows[0]]) if len(rows) else -1
+
+        self._deductions.append((round_id, driver_id, team_id, points))
+        return self
+
+    def disqualify(self, driver_id: int, session_id: int) -> Scenario:
+        """Disqualifies the driver from the given session, promoting the drivers behind.
+
+        Args:
+            driver_id (int): ID of the disqualified driver.
+            session_id (int): ID of the session to disqualify the driver from.
+
+        Returns:
+            Scenario: The scenario itself, so that changes can be chained.
+        """
+        rows = self._rows(driver_id, session_id)
+        if len(rows):
+            self._writable("finished")[rows] = False
+            self._sessions_to_reorder.add(session_id)
+        return self
+
+    def _reorder(self) -> np.ndarray:
+        """Returns the finishing positions after reordering the modified sessions."""
+        if not self._sessions_to_reorder:
+            return self.results.positions
+
+        positions = self.results.positions.copy()
+        finished = self._array("finished")
+        times = self._array("times")
+        for session_id in self._sessions_to_reorder:
+            session = self.results.session_ids == session_id
+            positions[session] = 0
+
+            rows = np.flatnonzero(session & finished)
+            # Ties keep the order the results were originally in.
+            order = rows[np.lexsort((self.results.positions[rows], times[rows]))]
+            positions[order] = np.arange(1, len(order) + 1)
+        return positions
+
+    def _standings(self) -> tuple[StandingsTable, dict[int, float]]:
+        """Returns the drivers' standings and the points earned by each team."""
+        results = self.results
+        points, _ = score(
+            results.point_systems,
+            results.point_system_indexes,
+            self._reorder(),
+            self._array("finished"),
+            results.fastest_laps,
+            results.fastest_lap_points,
+        )
+
+        round_ids = results.result_round_ids.tolist()
+        driver_ids = results.result_driver_ids.tolist()
+        team_ids = results.team_ids.tolist()
+        points = points.tolist()
+        for round_id, driver_id, team_id, deduction in (
+            *zip(
+                results.deduction_round_ids.tolist(),
+                results.deduction_driver_ids.tolist(),
+                results.deduction_team_ids.tolist(),
+                results.deductions.tolist(),
+            ),
+            *self._deductions,
+        ):
+            round_ids.append(round_id)
+            driver_ids.append(driver_id)
+            team_ids.append(team_id)
+            points.append(-deduction)
+
+        team_points: dict[int, float] = {}
+        for team_id, entry_points in zip(team_ids, points):
+            team_points[team_id] = team_points.get(team_id, 0) + entry_points
+
+        # Drivers who aren't part of the category anymore are still ranked from the
+        # first round they earned (or lost) points in.
+        rounds = {round_id: i for i, round_id in enumerate(results.round_ids.tolist())}
+        drivers = {
+            driver_id: i for i, driver_id in enumerate(results.driver_ids.tolist())
+        }
+        joined = [0] * len(drivers)
+        entries = sorted(
+            (rounds[round_id], driver_id, entry_points)
+            for round_id, driver_id, entry_points in zip(round_ids, driver_ids, points)
+            if round_id in rounds
+        )
+        for round_index, driver_id, _ in entries:
+            if driver_id not in drivers:
+                drivers[driver_id] = len(drivers)
+                joined.append(round_index)
+
+        matrix = np.zeros((len(rounds), len(drivers)))
+        for round_index, driver_id, entry_points in entries:
+            matrix[round_index, drivers[driver_id]] += entry_points
+
+        standings_table = StandingsTable.from_points(
+            list(drivers), results.round_ids, matrix, np.array(joined, dtype=np.intp)
+        )
+        return standings_table, team_points
+
+    def outcome(self) -> WhatIfOutcome:
+        """Calculates the standings resulting from the changes in the scenario."""
+        before, team_points_before = self.results._current
+        after, team_points_after = self._standings()
+
+        drivers_before = {
+            driver_id: (position, points)
+            for position, (driver_id, points, _) in enumerate(before.standings(), 1)
+        }
+        drivers = [
+            StandingsChange(
+                id=driver_id,
+                position_before=drivers_before.get(driver_id, (None, 0))[0],
+                position_after=position,
+                points_before=drivers_before.get(driver_id, (None, 0))[1],
+                points_after=points,
+            )
+            for position, (driver_id, points, _) in enumerate(after.standings(), 1)
+        ]
+
+        # Teams' tallies include the points earned in the other categories of the
+        # championship, which the scenario doesn't affect.
+        teams_before = self.results.team_points
+        teams_after = {
+            team_id: points
+            + team_points_after.get(team_id, 0)
+            - team_points_before.get(team_id, 0)
+            for team_id, points in teams_before.items()
+        }
+        positions_before = _rank(teams_before)
+        positions_after = _rank(teams_after)
+        teams = sorted(
+            (
+                StandingsChange(
+                    id=team_id,
+                    position_before=positions_before[team_id],
+                    position_after=positions_after[team_id],
+                    points_before=teams_before[team_id],
+                    points_after=teams_after[team_id],
+                )
+                for team_id in teams_before
+            ),
+            key=lambda change: change.position_after,  # type: ignore
+        )
+        return WhatIfOutcome(drivers=drivers, teams=teams)
+
+
+def _rank(points: dict[int, float]) -> dict[int, int]:
+    """Returns the position of each team, ties broken by ID."""
+    order = sorted(points, key=lambda team_id: (-points[team_id], team_id))
+    return {team_id: position for position, team_id in enumerate(order, 1)}
+
+
+SIMULATIONS_PER_CHUNK = 5000
+
+
+@dataclass(frozen=True)
+class RemainingSeason:
+    """Detached, read-only copy of what is left of a category's season.
+
+    Attributes:
+        category_id (int): ID of the category.
+        driver_ids (np.ndarray): IDs of the drivers who are part of the category.
+        team_indexes (np.ndarray): Index in the championship's teams of the team each
+            driver is racing for. (-1 if unknown)
+        points (np.ndarray): Current points tally of each driver.
+        racing (np.ndarray): True if the driver is still competing in the category.
+        mu (np.ndarray): Mean of each driver's skill in the category's game.
+        sigma (np.ndarray): Standard deviation of each driver's skill.
+        point_systems (tuple[CompiledPointSystem, ...]): Point system of each of the
+            sessions left to be held.
+        fastest_lap_points (np.ndarray): Points given for the fastest lap in each of the
+            sessions left to be held.
+    """
+
+    category_id: int
+    driver_ids: np.ndarray
+    team_indexes: np.ndarray
+    points: np.ndarray
+    racing: np.ndarray
+    mu: np.ndarray
+    sigma: np.ndarray
+    point_systems: tuple[CompiledPointSystem, ...]
+    fastest_lap_points: np.ndarray
+
+    def __post_init__(self) -> None:
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    def simulate(
+        self, rng: np.random.Generator, simulations: int, beta: float
+    ) -> np.ndarray:
+        """Simulates the remaining sessions of the category.
+
+        Each simulated season draws the drivers' skills once from their ratings, then
+        each session draws their performances around them, as TrueSkill models a race.
+        The order of the performances is the finishing order, the best one of a
+        separate draw is the fastest lap, and every driver still in the category is
+        classified.
+
+        Args:
+            rng (np.random.Generator): Generator to draw the samples from.
+            simulations (int): Number of seasons to simulate.
+            beta (float): Standard deviation of a performance around the skill.
+
+        Returns:
+            np.ndarray: Points tally of each driver (columns) at the end of each
+                simulated season (rows).
+        """
+        totals = np.tile(self.points, (simulations, 1))
+        racing = np.flatnonzero(self.racing)
+        if not len(racing):
+            return totals
+
+        skills = self.mu[racing] + self.sigma[racing] * rng.standard_normal(
+            (simulations, len(racing))
+        )
+        rows = np.arange(simulations)[:, np.newaxis]
+        for point_system, fastest_lap_points in zip(
+            self.point_systems, self.fastest_lap_points.tolist()
+        ):
+            # Positions outside of the point system are mapped to the zero-filled end.
+            table = np.zeros(len(racing) + 1)
+            scoring = min(len(point_system.table), len(table))
+            table[:scoring] = point_system.table[:scoring]
+
+            performances = skills + beta * rng.standard_normal(skills.shape)
+            order = np.argsort(-performances, axis=1)
+            totals[rows, racing[order]] += table[1:]
+
+            if fastest_lap_points:
+                fastest = np.argmax(
+                    skills + beta * rng.standard_normal(skills.shape), axis=1
+                )
+                totals[rows[:, 0], racing[fastest]] += fastest_lap_points
+        return totals
+
+
+@dataclass(frozen=True)
+class ChampionshipForecast:
+    """Outcome probabilities of a category's drivers' championship and of the
+    constructors' championship it contributes to.
+
+    Ties in the final standings are broken at random.
+
+    Attributes:
+        simulations (int): Number of seasons simulated.
+        driver_ids (np.ndarray): IDs of the drivers who are part of the category.
+        points (np.ndarray): Current points tally of each driver.
+        title (np.ndarray): Probability of each driver winning the championship.
+        podium (np.ndarray): Probability of each driver finishing in the top three.
+        expected_points (np.ndarray): Average final points tally of each driver.
+        expected_position (np.ndarray): Average final position of each driver.
+        team_ids (np.ndarray): IDs of the teams taking part in the championship.
+        team_points (np.ndarray): Current points tally of each team.
+        team_title (np.ndarray): Probability of each team winning the constructors'
+            championship.
+        team_expected_points (np.ndarray): Average final points tally of each team.
+    """
+
+    simulations: int
+    driver_ids: np.ndarray
+    points: np.ndarray
+    title: np.ndarray
+    podium: np.ndarray
+    expected_points: np.ndarray
+    expected_position: np.ndarray
+    team_ids: np.ndarray
+    team_points: np.ndarray
+    team_title: np.ndarray
+    team_expected_points: np.ndarray
+
+    def __post_init__(self) -> None:
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    def driver_order(self) -> list[int]:
+        """Returns the indexes of the drivers, ordered by expected final position."""
+        return np.lexsort((-self.title, self.expected_position)).tolist()
+
+    def team_order(self) -> list[int]:
+        """Returns the indexes of the teams, ordered by expected final points tally."""
+        return np.lexsort((-self.team_title, -self.team_expected_points)).tolist()
+
+
+def _ranks(totals: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Returns the 0-based position of each column in each row, ties broken at random."""
+    order = np.lexsort((rng.random(totals.shape), -totals), axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(totals.shape[1]), axis=1)
+    return ranks
+
+
+def _simulate_chunk(
+    seasons: Sequence[RemainingSeason],
+    category: int,
+    team_points: np.ndarray,
+    beta: float,
+    simulations: int,
+    seed: np.random.SeedSequence,
+) -> tuple[np.ndarray, ...]:
+    rng = np.random.default_rng(seed)
+    team_totals = np.tile(team_points, (simulations, 1))
+    for i, season in enumerate(seasons):
+        totals = season.simulate(rng, simulations, beta)
+        if i == category:
+            driver_totals = totals
+
+        # Teams earn the points their drivers earn from now on.
+        teams = np.zeros((len(season.driver_ids), len(team_points)))
+        known = np.flatnonzero(season.team_indexes >= 0)
+        teams[known, season.team_indexes[known]] = 1
+        team_totals += (totals - season.points) @ teams
+
+    ranks = _ranks(driver_totals, rng)
+    team_ranks = _ranks(team_totals, rng)
+    return (
+        (ranks == 0).sum(axis=0),
+        (ranks < 3).sum(axis=0),
+        driver_totals.sum(axis=0),
+        ranks.sum(axis=0) + simulations,
+        (team_ranks == 0).sum(axis=0),
+        team_totals.sum(axis=0),
+    )
+
+
+def forecast_championship(
+    seasons: Sequence[RemainingSeason],
+    category_id: int,
+    team_ids: Sequence[int],
+    team_points: Sequence[float],
+    beta: float,
+    simulations: int = 20000,
+    workers: int | None = None,
+    seed: int | None = None,
+) -> ChampionshipForecast:
+    """Estimates the outcome probabilities of the rest of a championship by simulating
+    it many times.
+
+    Seasons are simulated in chunks of SIMULATIONS_PER_CHUNK, each one with its own
+    random stream, so given a seed the forecast is the same whatever the number of
+    workers is.
+
+    Args:
+        seasons (Sequence[RemainingSeason]): What is left of the season of each of the
+            categories in the championship.
+        category_id (int): ID of the category to forecast the drivers' championship of.
+        team_ids (Sequence[int]): IDs of the teams taking part in the championship.
+        team_points (Sequence[float]): Current points tally of each team.
+        beta (float): Standard deviation of a performance around the skill.
+        simulations (int): Number of seasons to simulate.
+        workers (int | None): Number of processes to simulate seasons with. Seasons
+            are simulated in this process by default.
+        seed (int | None): Seed of the random number generator.
+
+    Raises:
+        ValueError: If none of the seasons belongs to the given category, or if less
+            than one season is to be simulated.
+
+    Returns:
+        ChampionshipForecast: The outcome probabilities.
+    """
+    category = next(
+        (i for i, season in enumerate(seasons) if season.category_id == category_id),
+        None,
+    )
+    if category is None:
+        raise ValueError(f"No season was given for category {category_id}.")
+    if simulations < 1:
+        raise ValueError("At least one season must be simulated.")
+
+    points = np.array(team_points, dtype=float)
+    sizes = [
+        min(SIMULATIONS_PER_CHUNK, simulations - start)
+        for start in range(0, simulations, SIMULATIONS_PER_CHUNK)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [
+        (seasons, category, points, beta, size, chunk_seed)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+    if workers and workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            chunks = list(executor.map(_simulate_chunk, *zip(*args)))
+    else:
+        chunks = [_simulate_chunk(*chunk_args) for chunk_args in args]
+
+    title, podium, total_points, total_positions, team_title, team_total_points = (
+        np.sum(counts, axis=0) for counts in zip(*chunks)
+    )
+    season = seasons[category]
+    return ChampionshipForecast(
+        simulations=simulations,
+        driver_ids=season.driver_ids.copy(),
+        points=season.points.copy(),
+        title=title / simulations,
+        podium=podium / simulations,
+        expected_points=total_points / simulations,
+        expected_position=total_positions / simulations,
+        team_ids=np.array(team_ids, dtype=np.int64),
+        team_points=points,
+        team_title=team_title / simulations,
+        team_expected_points=team_total_points / simulations,
+    )
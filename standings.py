@@ -0,0 +1,177 @@
+"""
+This module contains the StandingsTable, an array-backed representation of a category's
+standings after each of its completed rounds.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class StandingsTable:
+    """Standings of a category after each completed round.
+
+    Rows of the matrices correspond to rounds (in the order they were held), columns
+    correspond to drivers.
+
+    Attributes:
+        driver_ids (np.ndarray): IDs of the drivers in the standings.
+        round_ids (np.ndarray): IDs of the completed rounds, in chronological order.
+        points (np.ndarray): Points earned by each driver in each round, penalty points
+            already subtracted.
+        cumulative (np.ndarray): Points tally of each driver after each round.
+        positions (np.ndarray): Position of each driver after each round.
+            (0 if the driver wasn't part of the standings yet)
+        deltas (np.ndarray): Number of positions lost (negative if gained) by each
+            driver in each round.
+    """
+
+    driver_ids: np.ndarray
+    round_ids: np.ndarray
+    points: np.ndarray
+    cumulative: np.ndarray
+    positions: np.ndarray
+    deltas: np.ndarray
+
+    @classmethod
+    def from_points(
+        cls,
+        driver_ids: Sequence[int],
+        round_ids: Sequence[int],
+        points: np.ndarray,
+        joined: np.ndarray | None = None,
+    ) -> StandingsTable:
+        """Ranks the drivers after each round, given the points they earned in each one.
+
+        Ties are broken by the position held after the previous round, then by driver ID.
+        Drivers who weren't ranked after the previous round lose ties.
+
+        Args:
+            driver_ids (Sequence[int]): IDs of the drivers, one for each column of points.
+            round_ids (Sequence[int]): IDs of the rounds, one for each row of points.
+            points (np.ndarray): Points earned by each driver in each round.
+            joined (np.ndarray | None): Index of the round each driver entered the
+                standings in. Defaults to every driver being there from the first round.
+
+        Returns:
+            StandingsTable: The ranked standings.
+        """
+        driver_ids = np.asarray(driver_ids, dtype=np.int64)
+        round_ids = np.asarray(round_ids, dtype=np.int64)
+        points = np.asarray(points, dtype=np.float64).reshape(
+            len(round_ids), len(driver_ids)
+        )
+        if joined is None:
+            joined = np.zeros(len(driver_ids), dtype=np.intp)
+
+        cumulative = np.cumsum(points, axis=0)
+        positions = np.zeros(points.shape, dtype=np.int64)
+        deltas = np.zeros(points.shape, dtype=np.int64)
+
+        previous = np.zeros(len(driver_ids), dtype=np.int64)
+        for i in range(len(round_ids)):
+            # Drivers without a previous position lose ties to those who had one.
+            tie_break = np.where(previous > 0, previous, len(driver_ids) + 1)
+            # np.lexsort uses the last key as the primary one.
+            order = np.lexsort((driver_ids, tie_break, -cumulative[i]))
+            order = order[joined[order] <= i]
+            positions[i, order] = np.arange(1, len(order) + 1)
+            deltas[i] = np.where(previous > 0, positions[i] - previous, 0)
+            previous = positions[i]
+
+        return cls(driver_ids, round_ids, points, cumulative, positions, deltas)
+
+    @classmethod
+    def from_snapshots(
+        cls, round_ids: Sequence[int], rows: Sequence[Sequence[Any]]
+    ) -> StandingsTable:
+        """Builds the table from saved standings snapshots.
+
+        Args:
+            round_ids (Sequence[int]): IDs of the rounds, in chronological order.
+            rows (Sequence[Sequence[Any]]): Rows containing, in order: round_id,
+                driver_id, points, position and delta.
+
+        Returns:
+            StandingsTable: The standings stored in the snapshots.
+        """
+        rounds = {round_id: i for i, round_id in enumerate(round_ids)}
+        columns = list(zip(*rows)) if rows else [()] * 5
+        driver_ids = np.unique(np.asarray(columns[1], dtype=np.int64))
+
+        round_index = np.fromiter(
+            (rounds[round_id] for round_id in columns[0]),
+            dtype=np.intp,
+            count=len(rows),
+        )
+        driver_index = np.searchsorted(
+            driver_ids, np.asarray(columns[1], dtype=np.int64)
+        )
+
+        # Drivers missing from a snapshot hadn't entered the standings yet,
+        # so they are left with 0 points and no position.
+        shape = (len(rounds), len(driver_ids))
+        cumulative = np.zeros(shape)
+        positions = np.zeros(shape, dtype=np.int64)
+        deltas = np.zeros(shape, dtype=np.int64)
+        cumulative[round_index, driver_index] = columns[2]
+        positions[round_index, driver_index] = columns[3]
+        deltas[round_index, driver_index] = columns[4]
+        points = np.diff(cumulative, axis=0, prepend=0)
+
+        round_ids = np.asarray(round_ids, dtype=np.int64)
+        return cls(driver_ids, round_ids, points, cumulative, positions, deltas)
+
+    def __len__(self) -> int:
+        return len(self.round_ids)
+
+    def standings(self, n: int = 0) -> list[tuple[int, float, int]]:
+        """Returns the standings after one of the completed rounds.
+
+        Args:
+            n (int): Number of completed rounds to go back. (Must be 0 or negative)
+
+        Returns:
+            list[tuple[int, float, int]]: Driver ID, points tally and number of positions
+                lost (negative if gained) in the round, for each driver ordered by
+                championship position.
+        """
+        index = len(self.round_ids) - 1 + n
+        if index < 0:
+            return [(driver_id, 0, 0) for driver_id in self.driver_ids.tolist()]
+
+        order = np.argsort(self.positions[index], kind="stable")
+        order = order[self.positions[index][order] > 0]
+        return list(
+            zip(
+                self.driver_ids[order].tolist(),
+                self.cumulative[index][order].tolist(),
+                self.deltas[index][order].tolist(),
+            )
+        )
+
+    def snapshot_rows(self, category_id: int) -> list[dict[str, Any]]:
+        """Returns the rows to save as StandingsSnapshots, one for each driver
+        who is part of the standings after each round."""
+        round_index, driver_index = np.nonzero(self.positions)
+        return [
+            {
+                "round_id": round_id,
+                "driver_id": driver_id,
+                "category_id": category_id,
+                "points": points,
+                "position": position,
+                "delta": delta,
+            }
+            for round_id, driver_id, points, position, delta in zip(
+                self.round_ids[round_index].tolist(),
+                self.driver_ids[driver_index].tolist(),
+                self.cumulative[round_index, driver_index].tolist(),
+                self.positions[round_index, driver_index].tolist(),
+                self.deltas[round_index, driver_index].tolist(),
+            )
+        ]